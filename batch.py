@@ -0,0 +1,385 @@
+"""
+IPP projekt 2023, časť 2
+
+Dávkové spúšťanie interprétu nad mnohými dvojicami (program, vstup)
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import contextlib
+import getopt
+import io
+import json
+import multiprocessing
+import os
+import shlex
+import sys
+import time
+from collections import OrderedDict
+import xml.etree.ElementTree as ET  # skipcq: BAN-B405
+from interpret import error_code, format_err, load_program
+from lib_interpret.ippc_interpreter import ENGINES, RETCODE
+from lib_interpret.ippc_utils import InputCursor, OutputWriter
+from lib_interpret.ippc_source import SOURCE_FORMATS, SourceError
+
+# Počet overených programov, ktoré si jeden pracovný proces pamätá
+PROGRAM_CACHE_SIZE = 64
+
+# Koľko úloh naraz dostane pracovný proces (úlohy sú zoradené podľa
+# programu, susedné úlohy teda zvyčajne zdieľajú načítaný program)
+CHUNKS_PER_WORKER = 4
+
+# Najviac znakov zachyteného výstupu v súhrne (pri neúspešnej úlohe)
+SUMMARY_CAPTURE = 4096
+
+# Návratový kód, ak niektorá úloha nezodpovedá očakávaniu
+EFAIL = 1
+
+# Overené programy pracovného procesu: kľúč -> (interpret, chyba)
+_programs: OrderedDict = OrderedDict()
+
+"""
+Pomocné funkcie
+    @func print_help(): vypíše nápovedu na stdout a ukončí program
+    @func parse_args(): spracuje argumenty programu
+    @func read_manifest(str): načíta zoznam úloh zo súboru
+    @func expected_files(dict): doplní k úlohe očakávaný výstup a návratový kód
+    @func get_program(tuple): vráti overený program (raz na pracovný proces)
+    @func run_job(tuple): vykoná jednu úlohu a porovná výsledok s očakávaním
+    @func summarize(list, float): textový súhrn výsledkov
+"""
+
+
+def print_help():
+    help_msg = (
+        "Usage: python3[.10] batch.py [OPTIONS] <manifest>\n\n"
+        " Runs many (program, input) jobs on a pool of worker processes.\n"
+        " Each manifest line describes one job (shell-like quoting, # comments):\n\n"
+        "     <source> [<input>|- [<expected output>|- [<expected code>]]]\n\n"
+        " Paths are relative to the manifest. Without explicit expectations,\n"
+        " <stem>.out and <stem>.rc next to the input (or the source when there\n"
+        " is no input) are used when they exist; a missing .rc means 0.\n"
+        " Output is compared only when the expected code is 0.\n\n"
+        "  --help              Prints this help message and exits.\n"
+        "  --workers=<n>       Number of worker processes (default: CPU count).\n"
+        "  --summary=<file>    Writes per-job results as JSON.\n"
+        "  --capture-dir=<dir> Stores stdout, stderr and exit code of every job.\n"
+        "  --source-format=<name>\n"
+        "                      Source format: xml (default) or ippc.\n"
+        "  --engine=<name>     Execution engine: interpret (default) or compile.\n"
+        "  --peephole          Fuses common instruction sequences."
+    )
+    print(help_msg)
+    sys.exit(RETCODE.get("OK"))
+
+
+def parse_args():
+    arguments = {
+        "manifest": None,
+        "workers": os.cpu_count() or 1,
+        "summary": None,
+        "capture_dir": None,
+        "source_format": "xml",
+        "engine": "interpret",
+        "peephole": False,
+    }
+
+    try:
+        opts, args = getopt.getopt(
+            sys.argv[1:],
+            "h",
+            [
+                "help",
+                "workers=",
+                "summary=",
+                "capture-dir=",
+                "source-format=",
+                "engine=",
+                "peephole",
+            ],
+        )
+        for opt, arg in opts:
+            if opt in ("--help", "-h"):
+                print_help()
+            elif opt == "--workers":
+                arguments["workers"] = int(arg)
+                if arguments["workers"] < 1:
+                    raise ValueError("--workers must be at least 1")
+            elif opt == "--summary":
+                arguments["summary"] = arg
+            elif opt == "--capture-dir":
+                arguments["capture_dir"] = arg
+            elif opt == "--source-format":
+                if arg not in SOURCE_FORMATS:
+                    raise ValueError(f"Unknown source format {arg}")
+                arguments["source_format"] = arg
+            elif opt == "--engine":
+                if arg not in ENGINES:
+                    raise ValueError(f"Unknown engine {arg}")
+                arguments["engine"] = arg
+            elif opt == "--peephole":
+                arguments["peephole"] = True
+        if len(args) != 1:
+            raise ValueError("Exactly one manifest required")
+    except (getopt.GetoptError, ValueError) as error:
+        print(format_err("EPARAM", str(error)), file=sys.stderr)
+        sys.exit(RETCODE["EPARAM"])
+
+    arguments["manifest"] = args[0]
+    return arguments
+
+
+def read_manifest(path):
+    """Načíta úlohy z manifestu, vráti zoznam slovníkov (cesty sú absolútne)"""
+    base = os.path.dirname(os.path.abspath(path))
+
+    def resolve(field):
+        return None if field == "-" else os.path.join(base, field)
+
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            fields = shlex.split(line, comments=True)
+            if not fields:
+                continue
+            if len(fields) > 4:
+                raise ValueError(f"Line {lineno}: too many fields")
+            fields += ["-"] * (3 - len(fields))
+            job = {
+                "name": " ".join(fields[:2]) if fields[1] != "-" else fields[0],
+                "source": resolve(fields[0]),
+                "input": resolve(fields[1]),
+                "expected_output": resolve(fields[2]),
+                "expected_code": int(fields[3]) if len(fields) == 4 else None,
+            }
+            if len(fields) < 4 and fields[2] == "-":
+                expected_files(job)
+            elif job["expected_code"] is None:
+                job["expected_code"] = 0
+            jobs.append(job)
+    return jobs
+
+
+def expected_files(job):
+    """Doplní očakávania podľa súborov <stem>.out a <stem>.rc (ak existujú)"""
+    stem = os.path.splitext(job["input"] or job["source"])[0]
+    if os.path.isfile(stem + ".out"):
+        job["expected_output"] = stem + ".out"
+    if os.path.isfile(stem + ".rc"):
+        with open(stem + ".rc", encoding="utf-8") as f:
+            job["expected_code"] = int(f.read().strip() or 0)
+    elif job["expected_output"] is not None:
+        job["expected_code"] = 0
+
+
+def get_program(key):
+    """
+    Vráti (interpret, chyba) pre program (cesta, formát, jadro, peephole).
+    Načítaný a overený program si pracovný proces pamätá a pri ďalšej úlohe
+    ho len vráti do počiatočného stavu (Interpreter.reset()); zapamätá si
+    aj chybu načítania, ktorá sa pri každom behu zopakuje rovnako.
+    """
+    if key in _programs:
+        _programs.move_to_end(key)
+        return _programs[key]
+
+    source, source_format, engine, peephole = key
+    interpret, error = None, None
+    try:
+        with open(source, "rb") as source_file:
+            interpret = load_program(
+                {"source_format": source_format, "pipeline": False},
+                source_file,
+                "",
+                None,
+            )
+    except FileNotFoundError as exception:
+        error = ("ENOENT", exception.args[1])
+    except ET.ParseError as exception:
+        error = ("EXML", str(exception))
+    except SourceError as exception:
+        error = (exception.ecode, str(exception))
+    except Exception as exception:  # skipcq: PYL-W0703
+        error = ("ESTRUC", str(exception))
+    if error is None:
+        interpret.use_engine(engine)
+        try:
+            interpret.verify()
+            if peephole:
+                interpret.peephole()
+        except Exception as exception:  # skipcq: PYL-W0703
+            error = (error_code(interpret, exception), str(exception))
+    if error is not None:
+        interpret = None
+
+    _programs[key] = (interpret, error)
+    if len(_programs) > PROGRAM_CACHE_SIZE:
+        _programs.popitem(last=False)
+    return interpret, error
+
+
+def execute(job, key):
+    """Vykoná program úlohy, vráti (návratový kód, stdout v bajtoch, stderr)"""
+    stdout = io.BytesIO()
+    stderr = io.StringIO()
+    stream = io.TextIOWrapper(
+        stdout, encoding=sys.stdout.encoding, errors=sys.stdout.errors
+    )
+    output = OutputWriter(stream)
+    with contextlib.redirect_stderr(stderr):
+        try:
+            input_cursor = (
+                InputCursor.from_text("")
+                if job["input"] is None
+                else InputCursor.open(job["input"])
+            )
+        except FileNotFoundError as exception:
+            print(format_err("ENOENT", exception.args[1]), file=stderr)
+            return RETCODE["ENOENT"], b"", stderr.getvalue()
+
+        interpret, error = get_program(key)
+        try:
+            if error is not None:
+                print(format_err(*error), file=stderr)
+                return RETCODE[error[0]], b"", stderr.getvalue()
+            interpret.reset(input_cursor, output)
+            try:
+                returncode = interpret.run() or RETCODE["OK"]
+            except Exception as exception:  # skipcq: PYL-W0703
+                output.flush()
+                ecode = error_code(interpret, exception)
+                instr = interpret.peek_instruction()
+                print(format_err(ecode, str(exception), instr), file=stderr)
+                returncode = RETCODE.get(ecode)
+            output.flush()
+        finally:
+            input_cursor.close()
+    return returncode, stdout.getvalue(), stderr.getvalue()
+
+
+def run_job(task):
+    """Vykoná úlohu (index, úloha, voľby) a vráti slovník s výsledkom"""
+    index, job, options = task
+    key = (job["source"], options["source_format"], options["engine"], options["peephole"])
+    start = time.perf_counter()
+    returncode, stdout, stderr = execute(job, key)
+    elapsed = time.perf_counter() - start
+
+    status, reason = "ran", None
+    if job["expected_code"] is not None:
+        status = "pass"
+        if returncode != job["expected_code"]:
+            status = "fail"
+            reason = f"exit code {returncode}, expected {job['expected_code']}"
+        elif returncode == 0 and job["expected_output"] is not None:
+            try:
+                with open(job["expected_output"], "rb") as f:
+                    expected = f.read()
+            except OSError as exception:
+                status, reason = "fail", f"cannot read expected output: {exception}"
+            else:
+                if stdout != expected:
+                    status, reason = "fail", "output differs"
+
+    if options["capture_dir"] is not None:
+        stem = os.path.join(options["capture_dir"], f"{index:06d}")
+        with open(stem + ".stdout", "wb") as f:
+            f.write(stdout)
+        with open(stem + ".stderr", "w", encoding="utf-8") as f:
+            f.write(stderr)
+        with open(stem + ".rc", "w", encoding="utf-8") as f:
+            f.write(f"{returncode}\n")
+
+    result = {
+        "index": index,
+        "name": job["name"],
+        "status": status,
+        "returncode": returncode,
+        "expected_code": job["expected_code"],
+        "time": elapsed,
+        "worker": os.getpid(),
+    }
+    if status == "fail":
+        result["reason"] = reason
+        result["stdout"] = stdout[:SUMMARY_CAPTURE].decode("utf-8", "replace")
+        result["stderr"] = stderr[:SUMMARY_CAPTURE]
+    return result
+
+
+def summarize(results, elapsed):
+    """Textový súhrn (neúspešné úlohy a počty podľa stavu)"""
+    counts = {"pass": 0, "fail": 0, "ran": 0}
+    lines = []
+    for result in results:
+        counts[result["status"]] += 1
+        if result["status"] == "fail":
+            lines.append(f"FAIL {result['name']}: {result['reason']}")
+    lines.append(
+        f"passed: {counts['pass']}, failed: {counts['fail']},"
+        f" without expectations: {counts['ran']}, total: {len(results)}"
+    )
+    lines.append(
+        f"time: {elapsed:.2f} s ({len(results) / elapsed if elapsed else 0:.1f} jobs/s)"
+    )
+    return "\n".join(lines)
+
+
+"""
+Hlavná časť programu
+"""
+
+
+def main():
+    arguments = parse_args()
+    try:
+        jobs = read_manifest(arguments["manifest"])
+    except FileNotFoundError as error:
+        print(format_err("ENOENT", error.args[1]), file=sys.stderr)
+        sys.exit(RETCODE["ENOENT"])
+    except ValueError as error:
+        print(format_err("EPARAM", str(error)), file=sys.stderr)
+        sys.exit(RETCODE["EPARAM"])
+    if arguments["capture_dir"] is not None:
+        os.makedirs(arguments["capture_dir"], exist_ok=True)
+
+    options = {
+        key: arguments[key]
+        for key in ("source_format", "engine", "peephole", "capture_dir")
+    }
+    # Úlohy s rovnakým programom idú za sebou (program sa načíta raz na proces)
+    tasks = sorted(
+        ((index, job, options) for index, job in enumerate(jobs)),
+        key=lambda task: task[1]["source"],
+    )
+
+    start = time.perf_counter()
+    workers = min(arguments["workers"], len(tasks)) or 1
+    if workers == 1:
+        results = [run_job(task) for task in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (workers * CHUNKS_PER_WORKER))
+        with multiprocessing.Pool(workers) as pool:
+            results = list(pool.imap_unordered(run_job, tasks, chunksize))
+    elapsed = time.perf_counter() - start
+    results.sort(key=lambda result: result["index"])
+
+    if arguments["summary"] is not None:
+        summary = {
+            "workers": workers,
+            "time": elapsed,
+            "jobs": results,
+        }
+        try:
+            with open(arguments["summary"], "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+                f.write("\n")
+        except OSError as error:
+            print(format_err("EWRITE", str(error)), file=sys.stderr)
+            sys.exit(RETCODE["EWRITE"])
+
+    print(summarize(results, elapsed))
+    failed = any(result["status"] == "fail" for result in results)
+    sys.exit(EFAIL if failed else RETCODE["OK"])
+
+
+if __name__ == "__main__":
+    main()
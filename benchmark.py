@@ -0,0 +1,314 @@
+"""
+IPP projekt 2023, časť 2
+
+Výkonnostné testy interprétu nad ukážkovými programami (examples/)
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import getopt
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from interpret import format_err
+from lib_interpret.ippc_utils import RETCODE
+
+# Adresár so skriptom (interpret.py a examples/)
+ROOT = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES = os.path.join(ROOT, "examples")
+INTERPRET = os.path.join(ROOT, "interpret.py")
+
+# Výkonnostné testy: názov -> (zdrojový súbor v examples/, vstup programu)
+# Vstupy sú zväčšené tak, aby beh trval rádovo stovky milisekúnd. Programy,
+# ktorých dĺžku behu vstup nezväčší (deg2rad2deg, square, stackarith,
+# triarith bez vstupu, faktorial obmedzený dĺžkou vypísaného čísla), by
+# merali len štart interprétu; ten meria prázdny program (EMPTY_PROGRAM)
+BENCHMARKS = {
+    "mandelbrot": ("mandelbrot.ippc", ""),
+    "conwaylife": ("conwaylife.ippc", "2\n69420\n"),
+    "gcd": ("gcd.ippc", "10007\n7001\n"),
+    "fibonacci": ("fibonacci.ippc", "10000\n"),
+    "palindrom": ("palindrom.ippc", "ab" * 30000 + "a" + "ba" * 30000 + "\n"),
+    "pow": ("pow.ippc", "1\n100000\n"),
+}
+
+# Program na meranie času štartu interprétu
+EMPTY_PROGRAM = ".IPPcode23\n"
+
+# Návratový kód pri zistenej regresii (v porovnaní so základom)
+EREGRESS = 1
+
+"""
+Pomocné funkcie
+    @func print_help(): vypíše nápovedu na stdout a ukončí program
+    @func parse_args(): spracuje argumenty programu
+    @func run_once(str, str, list): spustí interprét, vráti čas, pamäť a výstup
+    @func count_instructions(str, str): počet vykonaných inštrukcií (--profile)
+    @func measure(str, str, list, dict): opakované meranie jedného programu
+    @func compare(dict, dict, float): porovná výsledky so základom
+    @func report(dict, list): textový prehľad výsledkov
+"""
+
+
+def print_help():
+    help_msg = (
+        "Usage: python3[.10] benchmark.py [OPTIONS] [-- INTERPRET OPTIONS]\n\n"
+        " Measures the interpreter on the bundled example programs.\n\n"
+        "  --help              Prints this help message and exits.\n"
+        "  --warmup=<n>        Unmeasured runs before each benchmark (default 1).\n"
+        "  --repeat=<n>        Measured runs of each benchmark (default 5).\n"
+        "  --only=<names>      Comma-separated benchmarks to run (default all).\n"
+        "  --output=<file>     Writes the results as JSON.\n"
+        "  --baseline=<file>   Compares the results with stored JSON results and\n"
+        "                      fails if any benchmark regressed.\n"
+        "  --threshold=<ratio> Allowed slowdown/growth against the baseline\n"
+        "                      (default 0.10, i.e. 10 %).\n\n"
+        "   Options after -- are passed to interpret.py (e.g. --engine=compile)."
+    )
+    print(help_msg)
+    sys.exit(RETCODE["OK"])
+
+
+def parse_args():
+    arguments = {
+        "warmup": 1,
+        "repeat": 5,
+        "only": list(BENCHMARKS),
+        "output": None,
+        "baseline": None,
+        "threshold": 0.10,
+        "interpret_args": [],
+    }
+
+    try:
+        opts, args = getopt.getopt(
+            sys.argv[1:],
+            "h",
+            ["help", "warmup=", "repeat=", "only=", "output=", "baseline=", "threshold="],
+        )
+        for opt, arg in opts:
+            if opt in ("--help", "-h"):
+                print_help()
+            elif opt == "--warmup":
+                arguments["warmup"] = int(arg)
+            elif opt == "--repeat":
+                arguments["repeat"] = int(arg)
+                if arguments["repeat"] < 1:
+                    raise ValueError("--repeat must be at least 1")
+            elif opt == "--only":
+                arguments["only"] = arg.split(",")
+                for name in arguments["only"]:
+                    if name not in BENCHMARKS:
+                        raise ValueError(f"Unknown benchmark {name}")
+            elif opt == "--output":
+                arguments["output"] = arg
+            elif opt == "--baseline":
+                arguments["baseline"] = arg
+            elif opt == "--threshold":
+                arguments["threshold"] = float(arg)
+    except (getopt.GetoptError, ValueError) as error:
+        print(format_err("EPARAM", str(error)), file=sys.stderr)
+        sys.exit(RETCODE["EPARAM"])
+
+    arguments["interpret_args"] = args
+    return arguments
+
+
+def run_once(source, program_input, interpret_args, profile=None):
+    """
+    Spustí interprét a vráti (čas behu v s, maximálna RSS v KiB,
+    návratový kód, SHA-256 výstupu). RSS sa zisťuje cez os.wait4()
+    priamo pre spustený proces.
+    """
+    command = [sys.executable, INTERPRET, f"--source={source}", "--source-format=ippc"]
+    if profile is not None:
+        command.append(f"--profile={profile}")
+    with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stdout:
+        stdin.write(program_input.encode("utf-8"))
+        stdin.seek(0)
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            command + interpret_args,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=subprocess.DEVNULL,
+        )
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stdout.seek(0)
+        digest = hashlib.sha256(stdout.read()).hexdigest()
+    return elapsed, usage.ru_maxrss, process.returncode, digest
+
+
+def count_instructions(source, program_input):
+    """Počet vykonaných inštrukcií programu (samostatný profilovaný beh)"""
+    with tempfile.TemporaryDirectory() as directory:
+        profile = os.path.join(directory, "profile.json")
+        run_once(source, program_input, [], profile)
+        try:
+            with open(profile) as f:
+                return json.load(f)["instructions_executed"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def measure(source, program_input, interpret_args, arguments):
+    """Zahrievacie a merané behy programu, vráti slovník s výsledkami"""
+    for _ in range(arguments["warmup"]):
+        run_once(source, program_input, interpret_args)
+
+    times, rss, returncodes, digests = [], [], set(), set()
+    for _ in range(arguments["repeat"]):
+        elapsed, peak, returncode, digest = run_once(
+            source, program_input, interpret_args
+        )
+        times.append(elapsed)
+        rss.append(peak)
+        returncodes.add(returncode)
+        digests.add(digest)
+
+    return {
+        "wall_times": times,
+        "wall_min": min(times),
+        "wall_median": statistics.median(times),
+        "wall_mean": statistics.fmean(times),
+        "wall_stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "peak_rss_kb": max(rss),
+        "returncode": returncodes.pop() if len(returncodes) == 1 else None,
+        "output_sha256": digests.pop() if len(digests) == 1 else None,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Porovná výsledky so základom, vráti zoznam zistených regresií"""
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        ratio = current["wall_median"] / previous["wall_median"]
+        current["baseline_ratio"] = ratio
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: wall time x{ratio:.2f}")
+        if current["peak_rss_kb"] > previous["peak_rss_kb"] * (1 + threshold):
+            regressions.append(
+                f"{name}: peak RSS {previous['peak_rss_kb']} -> "
+                f"{current['peak_rss_kb']} KiB"
+            )
+        if current["output_sha256"] != previous["output_sha256"]:
+            regressions.append(f"{name}: output changed")
+        if current["returncode"] != previous["returncode"]:
+            regressions.append(
+                f"{name}: return code {previous['returncode']} -> "
+                f"{current['returncode']}"
+            )
+    previous = baseline.get("startup")
+    if previous is not None:
+        ratio = results["startup"]["wall_median"] / previous["wall_median"]
+        results["startup"]["baseline_ratio"] = ratio
+        if ratio > 1 + threshold:
+            regressions.append(f"startup: wall time x{ratio:.2f}")
+    return regressions
+
+
+def report(results, regressions):
+    """Textový prehľad výsledkov"""
+    startup = results["startup"]
+    lines = [
+        f"startup: {1000 * startup['wall_median']:.1f} ms"
+        f" (peak RSS {startup['peak_rss_kb']} KiB)",
+        "",
+        f"{'benchmark':<12} {'instr':>10} {'instr/s':>10} {'median ms':>10}"
+        f" {'stdev ms':>9} {'RSS KiB':>9} {'rc':>3} {'vs base':>8}",
+    ]
+    for name, stats in results["benchmarks"].items():
+        ratio = stats.get("baseline_ratio")
+        lines.append(
+            f"{name:<12} {stats['instructions'] or '-':>10}"
+            f" {stats['instructions_per_second'] or 0:>10.0f}"
+            f" {1000 * stats['wall_median']:>10.1f}"
+            f" {1000 * stats['wall_stdev']:>9.1f}"
+            f" {stats['peak_rss_kb']:>9}"
+            f" {stats['returncode'] if stats['returncode'] is not None else '?':>3}"
+            f" {f'x{ratio:.2f}' if ratio is not None else '-':>8}"
+        )
+    if regressions:
+        lines.append("")
+        lines.append("REGRESSIONS:")
+        lines.extend(f"  {regression}" for regression in regressions)
+    return "\n".join(lines)
+
+
+"""
+Hlavná časť programu
+"""
+
+
+def main():
+    arguments = parse_args()
+    interpret_args = arguments["interpret_args"]
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "interpret_args": interpret_args,
+        "warmup": arguments["warmup"],
+        "repeat": arguments["repeat"],
+        "startup": None,
+        "benchmarks": {},
+    }
+
+    # Čas štartu (prázdny program)
+    with tempfile.NamedTemporaryFile("w", suffix=".ippc") as empty:
+        empty.write(EMPTY_PROGRAM)
+        empty.flush()
+        results["startup"] = measure(empty.name, "", interpret_args, arguments)
+
+    for name in arguments["only"]:
+        filename, program_input = BENCHMARKS[name]
+        source = os.path.join(EXAMPLES, filename)
+        stats = measure(source, program_input, interpret_args, arguments)
+        # Počet inštrukcií nezávisí od volieb interprétu (meria sa bez nich)
+        stats["instructions"] = count_instructions(source, program_input)
+        # Čas vykonávania programu bez štartu interprétu (prázdny program)
+        executing = stats["wall_median"] - results["startup"]["wall_median"]
+        stats["instructions_per_second"] = (
+            stats["instructions"] / executing
+            if stats["instructions"] is not None and executing > 0
+            else None
+        )
+        results["benchmarks"][name] = stats
+        print(f"{name}: {1000 * stats['wall_median']:.1f} ms", file=sys.stderr)
+
+    regressions = []
+    if arguments["baseline"] is not None:
+        try:
+            with open(arguments["baseline"]) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as error:
+            print(format_err("ENOENT", str(error)), file=sys.stderr)
+            sys.exit(RETCODE["ENOENT"])
+        regressions = compare(results, baseline, arguments["threshold"])
+        results["baseline"] = arguments["baseline"]
+        results["regressions"] = regressions
+
+    if arguments["output"] is not None:
+        try:
+            with open(arguments["output"], "w") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+        except OSError as error:
+            print(format_err("EWRITE", str(error)), file=sys.stderr)
+            sys.exit(RETCODE["EWRITE"])
+
+    print(report(results, regressions))
+    sys.exit(EREGRESS if regressions else RETCODE["OK"])
+
+
+if __name__ == "__main__":
+    main()
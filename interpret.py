@@ -5,17 +5,36 @@ Interprét XML reprezentácie programu v jazyku IPPcode23
 @author: Onegen Something <xkrame00@vutbr.cz>
 """
 
+import io
+import os
 import sys
 import getopt
+import resource
 import xml.etree.ElementTree as ET  # skipcq: BAN-B405
-from lib_interpret.ippc_interpreter import EXCEPTMAP, RETCODE, Interpreter
+from lib_interpret.ippc_interpreter import EXCEPTMAP, RETCODE, ENGINES, Interpreter
+from lib_interpret.ippc_utils import InputCursor, OutputWriter
+from lib_interpret.ippc_bytecode import ProgramCache, source_digest
+from lib_interpret.ippc_source import SOURCE_FORMATS, SourceError, SourceParser
+from lib_interpret.ippc_server import Server
+from lib_interpret.ippc_conformance import EFAIL, TestSuite, discover_cases
 
 """
 Pomocné funkcie
     @func print_help(): vypíše nápovedu na stdout a ukončí program
     @func parse_args(): spracuje argumenty programu
-    @func read_file_content(str): načíta obsah súboru
-    @func throw_err(str, str): vypíše chybovú hlášku na stderr a ukončí program
+    @func parse_interval(str): spracuje interval kontrolných bodov (--checkpoint-every)
+    @func apply_limits(dict): nastaví limity procesu (--time-limit, --memory-limit)
+    @func open_source(str): otvorí zdrojový súbor (None -> stdin) na binárne čítanie
+    @func error_code(Interpreter, Exception): určí chybový kód výnimky z behu
+    @func load_program(dict, ...): vytvorí interpret s programom v zvolenom formáte
+    @func load_cached(dict, ...): vytvorí interpret cez úložisko preložených programov
+    @func resume_run(dict, Interpreter): obnoví beh z kontrolného bodu (--resume)
+    @func run_tests(dict, Interpreter): spustí program nad prípadmi v adresári (--test)
+    @func write_profile(dict, Profiler): zapíše výsledky profilovania do súborov
+    @func write_report(str, ...): zapíše prehľad optimalizácie (report()) do súboru
+    @func format_err(str, str): zostaví chybovú hlášku
+    @func throw_err(str, str): zapíše výstup programu, vypíše chybovú hlášku
+                               na stderr a ukončí program
 """
 
 
@@ -25,7 +44,74 @@ def print_help():
         " Interprets the XML representation of a IPPcode23 program.\n\n"
         "  --help              Prints this help message and exits.\n"
         "  --source=<file>     Specifies the source file to be interpreted.\n"
-        "  --input=<file>      Specifies the input file to be used.\n\n"
+        "  --input=<file>      Specifies the input file to be used.\n"
+        "  --source-format=<name>\n"
+        "                      Source format: xml (default) or ippc (IPPcode23\n"
+        "                      source code, parsed without parse.php).\n"
+        "  --engine=<name>     Execution engine: interpret (default) or compile\n"
+        "                      (translates basic blocks into Python functions).\n"
+        "  -O                  Optimises the program before running it (constant\n"
+        "                      folding, copy propagation, removal of unreachable\n"
+        "                      code and of dead stores to GF temporaries).\n"
+        "  --optimize-report=<file>\n"
+        "                      Writes per-pass optimisation statistics to a file\n"
+        "                      (implies -O).\n"
+        "  --peephole          Fuses common instruction sequences into\n"
+        "                      superinstructions (interpret engine only).\n"
+        "  --peephole-report=<file>\n"
+        "                      Writes applied fusions to a file (implies --peephole).\n"
+        "  --memoize           Caches results of pure subroutines (CALL targets\n"
+        "                      that touch only their stack arguments, LF and TF)\n"
+        "                      in a bounded LRU cache (interpret engine only).\n"
+        "  --memoize-report=<file>\n"
+        "                      Writes accepted and rejected subroutines and cache\n"
+        "                      hit rates to a file after the run (implies --memoize).\n"
+        "  --output-buffer=<n> Flushes program output after n buffered characters.\n"
+        "  --flush-interval=<seconds>\n"
+        "                      Flushes program output at least this often.\n"
+        "  --sync-streams      Keeps DPRINT output ordered relative to WRITE output.\n"
+        "  --pipeline          Starts executing while the rest of the program is\n"
+        "                      still being loaded. Instruction orders must ascend\n"
+        "                      and errors in the unloaded part surface only once\n"
+        "                      it is loaded (interpret engine only).\n"
+        "  --cache-dir=<dir>   Stores compiled programs in a directory keyed by\n"
+        "                      the source hash; a cached program skips XML parsing.\n"
+        "  --cache-stats       Reports the cache lookup result on standard error.\n"
+        "  --profile=<file>    Writes per-opcode, per-instruction, per-label and\n"
+        "                      per-call execution counts and times as JSON\n"
+        "                      (runs on the interpret engine).\n"
+        "  --profile-summary=<file>\n"
+        "                      Writes a text summary of the profile sorted by time.\n"
+        "  --checkpoint-every=<n>|<seconds>s\n"
+        "                      Atomically writes a snapshot of the whole machine\n"
+        "                      state every n instructions or every given number\n"
+        "                      of seconds (e.g. 30s); runs on the interpret engine.\n"
+        "  --checkpoint-file=<file>\n"
+        "                      Snapshot file (defaults to the --resume file).\n"
+        "  --resume=<file>     Resumes the run from a snapshot of the same program\n"
+        "                      (and -O setting), skipping the input lines already\n"
+        "                      read. If standard output is the regular file of the\n"
+        "                      interrupted run, output written after the snapshot\n"
+        "                      is discarded. With --checkpoint-every, a missing\n"
+        "                      file starts the program from the beginning.\n"
+        "  --test=<dir>        Runs the program once per case in a directory of\n"
+        "                      <name>.in, <name>.out and <name>.rc files on a\n"
+        "                      pool of workers, comparing output as it is written\n"
+        "                      and stopping a case at the first differing byte.\n"
+        "                      Output is compared only when the expected code is 0;\n"
+        "                      a missing .rc means 0. Exits with 1 on any failure.\n"
+        "  --workers=<n>       Number of --test worker processes (default: CPU\n"
+        "                      count).\n"
+        "  --test-json=<file>  Writes per-case --test results as JSON.\n"
+        "  --test-junit=<file> Writes per-case --test results as JUnit XML.\n"
+        "  --time-limit=<seconds>\n"
+        "                      Limits the CPU time of the run.\n"
+        "  --memory-limit=<MiB> Limits the address space of the run.\n"
+        "  --call-depth=<n>    Fails with code 99 when a CALL would nest deeper\n"
+        "                      than n calls (default: unlimited).\n"
+        "  --serve=<socket>    Runs a server that executes jobs sent by\n"
+        "                      interpret_client.py (same options as this script),\n"
+        "                      each in a forked child with modules preloaded.\n\n"
         "   At least one of the options above must be specified.\n"
         "   Aside from --help, the unspecified option of the two\n"
         "   will be expected on standard input."
@@ -35,11 +121,76 @@ def print_help():
 
 
 def parse_args():
-    arguments = {"source": None, "input": None, "debug_print": False, "fancier": False}
+    arguments = {
+        "source": None,
+        "input": None,
+        "debug_print": False,
+        "fancier": False,
+        "engine": "interpret",
+        "optimize": False,
+        "optimize_report": None,
+        "peephole": False,
+        "peephole_report": None,
+        "memoize": False,
+        "memoize_report": None,
+        "output_buffer": 1 << 16,
+        "flush_interval": None,
+        "sync_streams": False,
+        "pipeline": False,
+        "cache_dir": None,
+        "cache_stats": False,
+        "source_format": "xml",
+        "profile": None,
+        "profile_summary": None,
+        "checkpoint_every": None,
+        "checkpoint_file": None,
+        "resume": None,
+        "test": None,
+        "workers": os.cpu_count() or 1,
+        "test_json": None,
+        "test_junit": None,
+        "time_limit": None,
+        "memory_limit": None,
+        "call_depth": None,
+        "serve": None,
+    }
 
     try:
         opts, _ = getopt.getopt(
-            sys.argv[1:], "hd", ["help", "fancier", "source=", "input="]
+            sys.argv[1:],
+            "hdO",
+            [
+                "help",
+                "fancier",
+                "source=",
+                "input=",
+                "engine=",
+                "optimize-report=",
+                "peephole",
+                "peephole-report=",
+                "memoize",
+                "memoize-report=",
+                "output-buffer=",
+                "flush-interval=",
+                "sync-streams",
+                "pipeline",
+                "cache-dir=",
+                "cache-stats",
+                "source-format=",
+                "profile=",
+                "profile-summary=",
+                "checkpoint-every=",
+                "checkpoint-file=",
+                "resume=",
+                "test=",
+                "workers=",
+                "test-json=",
+                "test-junit=",
+                "time-limit=",
+                "memory-limit=",
+                "call-depth=",
+                "serve=",
+            ],
         )
     except getopt.GetoptError as error:
         throw_err("EPARAM", str(error))
@@ -56,21 +207,264 @@ def parse_args():
             arguments["input"] = arg
         elif opt == "--fancier":
             arguments["fancier"] = True
+        elif opt == "--engine":
+            if arg not in ENGINES:
+                throw_err("EPARAM", f"Unknown engine {arg}")
+            arguments["engine"] = arg
+        elif opt == "-O":
+            arguments["optimize"] = True
+        elif opt == "--optimize-report":
+            arguments["optimize"] = True
+            arguments["optimize_report"] = arg
+        elif opt == "--peephole":
+            arguments["peephole"] = True
+        elif opt == "--peephole-report":
+            arguments["peephole"] = True
+            arguments["peephole_report"] = arg
+        elif opt == "--memoize":
+            arguments["memoize"] = True
+        elif opt == "--memoize-report":
+            arguments["memoize"] = True
+            arguments["memoize_report"] = arg
+        elif opt == "--output-buffer":
+            if not arg.isdigit():
+                throw_err("EPARAM", f"Invalid output buffer size {arg}")
+            arguments["output_buffer"] = int(arg)
+        elif opt == "--flush-interval":
+            try:
+                arguments["flush_interval"] = float(arg)
+            except ValueError:
+                throw_err("EPARAM", f"Invalid flush interval {arg}")
+        elif opt == "--sync-streams":
+            arguments["sync_streams"] = True
+        elif opt == "--pipeline":
+            arguments["pipeline"] = True
+        elif opt == "--cache-dir":
+            arguments["cache_dir"] = arg
+        elif opt == "--cache-stats":
+            arguments["cache_stats"] = True
+        elif opt == "--source-format":
+            if arg not in SOURCE_FORMATS:
+                throw_err("EPARAM", f"Unknown source format {arg}")
+            arguments["source_format"] = arg
+        elif opt == "--profile":
+            arguments["profile"] = arg
+        elif opt == "--profile-summary":
+            arguments["profile_summary"] = arg
+        elif opt == "--checkpoint-every":
+            arguments["checkpoint_every"] = parse_interval(arg)
+        elif opt == "--checkpoint-file":
+            arguments["checkpoint_file"] = arg
+        elif opt == "--resume":
+            arguments["resume"] = arg
+        elif opt == "--test":
+            arguments["test"] = arg
+        elif opt == "--workers":
+            if not arg.isdigit() or int(arg) == 0:
+                throw_err("EPARAM", f"Invalid number of workers {arg}")
+            arguments["workers"] = int(arg)
+        elif opt == "--test-json":
+            arguments["test_json"] = arg
+        elif opt == "--test-junit":
+            arguments["test_junit"] = arg
+        elif opt == "--time-limit":
+            if not arg.isdigit() or int(arg) == 0:
+                throw_err("EPARAM", f"Invalid time limit {arg}")
+            arguments["time_limit"] = int(arg)
+        elif opt == "--memory-limit":
+            if not arg.isdigit() or int(arg) == 0:
+                throw_err("EPARAM", f"Invalid memory limit {arg}")
+            arguments["memory_limit"] = int(arg)
+        elif opt == "--call-depth":
+            if not arg.isdigit() or int(arg) == 0:
+                throw_err("EPARAM", f"Invalid call depth limit {arg}")
+            arguments["call_depth"] = int(arg)
+        elif opt == "--serve":
+            arguments["serve"] = arg
 
+    if arguments["pipeline"] and arguments["engine"] != "interpret":
+        throw_err("EPARAM", "--pipeline requires the interpret engine")
+    if arguments["pipeline"] and arguments["source_format"] != "xml":
+        throw_err("EPARAM", "--pipeline requires the xml source format")
+    if arguments["pipeline"] and arguments["cache_dir"] is not None:
+        throw_err("EPARAM", "--pipeline cannot be combined with --cache-dir")
+    if arguments["pipeline"] and arguments["optimize"]:
+        throw_err("EPARAM", "--pipeline cannot be combined with -O")
+    checkpoints = arguments["checkpoint_every"] is not None
+    if checkpoints and arguments["checkpoint_file"] is None:
+        if arguments["resume"] is None:
+            throw_err(
+                "EPARAM", "--checkpoint-every requires --checkpoint-file or --resume"
+            )
+        arguments["checkpoint_file"] = arguments["resume"]
+    if arguments["checkpoint_file"] is not None and not checkpoints:
+        throw_err("EPARAM", "--checkpoint-file requires --checkpoint-every")
+    if arguments["pipeline"] and (checkpoints or arguments["resume"] is not None):
+        throw_err(
+            "EPARAM", "--pipeline cannot be combined with --checkpoint-every or --resume"
+        )
+    profiling = arguments["profile"] or arguments["profile_summary"]
+    if checkpoints and profiling is not None:
+        throw_err("EPARAM", "--checkpoint-every cannot be combined with --profile")
+    if arguments["test"] is not None:
+        conflicts = (
+            ("--input", arguments["input"] is not None),
+            ("-d", arguments["debug_print"]),
+            ("--pipeline", arguments["pipeline"]),
+            ("--profile", profiling is not None),
+            ("--checkpoint-every", checkpoints),
+            ("--resume", arguments["resume"] is not None),
+        )
+        for option, given in conflicts:
+            if given:
+                throw_err("EPARAM", f"{option} cannot be combined with --test")
+        return arguments
+    if arguments["test_json"] is not None or arguments["test_junit"] is not None:
+        throw_err("EPARAM", "--test-json and --test-junit require --test")
+    if arguments["serve"] is not None:
+        return arguments
     if arguments["source"] is None and arguments["input"] is None:
         throw_err("EPARAM", "--source or --input required")
 
     return arguments
 
 
-def read_file_content(file_path):
+def parse_interval(arg):
+    # Počet inštrukcií (n) alebo sekúnd (n s) medzi kontrolnými bodmi
+    try:
+        if arg.endswith("s"):
+            seconds = float(arg[:-1])
+            if seconds > 0:
+                return None, seconds
+        elif arg.isdigit() and int(arg) > 0:
+            return int(arg), None
+    except ValueError:
+        pass
+    throw_err("EPARAM", f"Invalid checkpoint interval {arg}")
+
+
+def apply_limits(arguments):
+    # Prekročenie času ukončí proces signálom SIGXCPU, pamäte MemoryError
+    if arguments["time_limit"] is not None:
+        seconds = arguments["time_limit"]
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        seconds += int(used.ru_utime + used.ru_stime)
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+    if arguments["memory_limit"] is not None:
+        limit = arguments["memory_limit"] << 20
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def open_source(file_path):
     if file_path is None:
-        return sys.stdin.read()
-    with open(file_path, "r") as f:
-        return f.read()
+        return sys.stdin.buffer
+    return open(file_path, "rb")
+
+
+def error_code(interpret, error):
+    # Chyba postupného načítania programu má kód ako pri načítaní vopred
+    if error is interpret.load_error:
+        return "EXML" if isinstance(error, ET.ParseError) else "ESTRUC"
+    if error is interpret.checkpoint_error:
+        return "EWRITE"
+    # Nedostatok pamäte (--memory-limit) nie je chyba rámca programu
+    if type(error) is MemoryError and not error.args:
+        return "EINT"
+    return EXCEPTMAP.get(type(error), "EINT")
+
+
+def load_program(arguments, source, input_cursor, output):
+    if arguments["source_format"] == "ippc":
+        interpret = Interpreter(None, input_cursor, output)
+        parser = SourceParser(interpret.constants)
+        interpret.load_program(*parser.parse(source.read().decode("utf-8")))
+        return interpret
+    return Interpreter(source, input_cursor, output, pipelined=arguments["pipeline"])
+
+
+def load_cached(arguments, source_file, input_cursor, output):
+    source = source_file.read()
+    digest = source_digest(source, arguments["source_format"])
+    cache = ProgramCache(arguments["cache_dir"])
+    program = cache.load(digest)
+    if program is None:
+        interpret = load_program(arguments, io.BytesIO(source), input_cursor, output)
+        stored = cache.store(digest, interpret.instructions, interpret.labels)
+    else:
+        interpret = Interpreter(None, input_cursor, output)
+        interpret.load_program(*program)
+        stored = True
+    if arguments["cache_stats"]:
+        note = "" if stored else " (not stored)"
+        print(f"cache {cache.status}: {cache.path(digest)}{note}", file=sys.stderr)
+    return interpret
+
+
+def resume_run(arguments, interpret, colour=False):
+    try:
+        with open(arguments["resume"], "rb") as f:
+            snapshot = f.read()
+    except FileNotFoundError as error:
+        if arguments["checkpoint_every"] is not None:
+            return  # Prvé spustenie úlohy, kontrolný bod ešte neexistuje
+        throw_err("ENOENT", error.args[1], colour=colour)
+    except OSError as error:
+        throw_err("ENOENT", str(error), colour=colour)
+    try:
+        interpret.restore(snapshot)
+    except (LookupError, ValueError) as error:
+        throw_err("EPARAM", f"Invalid snapshot: {error}", colour=colour)
+    except OSError as error:
+        throw_err("EWRITE", str(error), colour=colour)
+
+
+def run_tests(arguments, interpret, colour=False):
+    try:
+        cases = discover_cases(arguments["test"])
+    except OSError as error:
+        throw_err("ENOENT", str(error), colour=colour)
+    except ValueError as error:
+        throw_err("EPARAM", str(error), colour=colour)
+    name = os.path.splitext(os.path.basename(arguments["source"] or "stdin"))[0]
+    suite = TestSuite(interpret, cases, error_code, name)
+    suite.run(arguments["workers"])
+    reports = (
+        (arguments["test_json"], suite.to_json),
+        (arguments["test_junit"], suite.to_junit),
+    )
+    for path, report in reports:
+        if path is None:
+            continue
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(report())
+        except OSError as error:
+            throw_err("EWRITE", str(error), colour=colour)
+    print(suite.summary(), end="")
+    sys.exit(EFAIL if suite.failed() else RETCODE.get("OK"))
 
 
-def throw_err(ecode, msg, instr=None, colour=False):
+def write_profile(arguments, profiler, colour=False):
+    try:
+        if arguments["profile"] is not None:
+            with open(arguments["profile"], "w") as f:
+                f.write(profiler.to_json())
+        if arguments["profile_summary"] is not None:
+            with open(arguments["profile_summary"], "w") as f:
+                f.write(profiler.summary())
+    except OSError as error:
+        throw_err("EWRITE", str(error), colour=colour)
+
+
+def write_report(path, optimizer, colour=False):
+    try:
+        with open(path, "w") as f:
+            f.write(optimizer.report())
+    except OSError as error:
+        throw_err("EWRITE", str(error), colour=colour)
+
+
+def format_err(ecode, msg, instr=None, colour=False):
     err_prefix = "ERR!"
     code_label = "code"
     instr_label = "instr"
@@ -84,8 +478,18 @@ def throw_err(ecode, msg, instr=None, colour=False):
     if instr is not None:
         err_str += f"\n{err_prefix} {instr_label} {instr}"
     err_str += f"\n{err_prefix} {err_msg}"
+    return err_str
 
-    print(err_str, file=sys.stderr)
+
+def throw_err(ecode, msg, instr=None, colour=False, output=None):
+    # Výstup programu vypísaný pred chybou sa nesmie stratiť
+    if output is not None:
+        try:
+            output.flush()
+        except Exception:  # skipcq: PYL-W0703
+            pass
+
+    print(format_err(ecode, msg, instr, colour), file=sys.stderr)
     sys.exit(RETCODE.get(ecode))
 
 
@@ -98,11 +502,18 @@ def main():
     # Spracovanie parametrov
     arguments = parse_args()
     colout = arguments["fancier"]
+    if arguments["serve"] is not None:
+        try:
+            Server(arguments["serve"], main, os.path.abspath(__file__)).serve()
+        except OSError as error:
+            throw_err("EWRITE", str(error), colour=colout)
+        sys.exit(RETCODE.get("OK"))
+    apply_limits(arguments)
 
-    # Načítanie zdrojového kódu a vstupu
+    # Načítanie zdrojového kódu a otvorenie vstupu (číta sa až pri READ)
     try:
-        source_cont = read_file_content(arguments["source"])
-        input_cont = read_file_content(arguments["input"])
+        source_file = open_source(arguments["source"])
+        input_cursor = InputCursor.open(arguments["input"])
     except KeyboardInterrupt:
         throw_err("EINT", "Interrupted by user", colour=colout)
         sys.exit(RETCODE.get("EINT"))
@@ -112,10 +523,20 @@ def main():
 
     # Inicializácia interpréta
     try:
-        interpret = Interpreter(source_cont, input_cont)
+        output = OutputWriter(
+            limit=arguments["output_buffer"],
+            interval=arguments["flush_interval"],
+            sync=arguments["sync_streams"],
+        )
+        if arguments["cache_dir"] is None:
+            interpret = load_program(arguments, source_file, input_cursor, output)
+        else:
+            interpret = load_cached(arguments, source_file, input_cursor, output)
     except ET.ParseError as error:
         throw_err("EXML", str(error), colour=colout)
         sys.exit(RETCODE.get("EXML"))
+    except SourceError as error:
+        throw_err(error.ecode, str(error), colour=colout)
     except KeyboardInterrupt:
         throw_err("EINT", "Interrupted by user", colour=colout)
         sys.exit(RETCODE.get("EINT"))
@@ -124,21 +545,70 @@ def main():
         sys.exit(RETCODE.get("ESTRUC"))
     if arguments["debug_print"]:
         interpret.make_verbose()
+    interpret.use_engine(arguments["engine"])
+    if arguments["call_depth"] is not None:
+        interpret.call_limit = arguments["call_depth"]
+    profiler = None
+    if arguments["profile"] is not None or arguments["profile_summary"] is not None:
+        profiler = interpret.use_profiler()
 
-    # Hlavný cyklus behu
-    returncode = None
-    while True:
-        next_instruction = interpret.peek_instruction()
-        if next_instruction is None or returncode is not None:
-            break
-        try:
-            returncode = interpret.execute_next()
-        except KeyboardInterrupt:
-            throw_err("EINT", "Interrupted by user", colour=colout)
-        except Exception as error:  # skipcq: PYL-W0703
-            error_code = EXCEPTMAP.get(type(error), "EINT")
-            throw_err(error_code, str(error), next_instruction, colout)
+    # Statická kontrola programu pred jeho behom
+    try:
+        interpret.verify()
+    except Exception as error:  # skipcq: PYL-W0703
+        throw_err(error_code(interpret, error), str(error), colour=colout)
+
+    # Optimalizácia programu, spájanie inštrukcií a memoizácia čistých funkcií
+    if arguments["optimize"]:
+        optimizer = interpret.optimize()
+        if arguments["optimize_report"] is not None:
+            write_report(arguments["optimize_report"], optimizer, colout)
+    if arguments["peephole"]:
+        optimizer = interpret.peephole()
+        if arguments["peephole_report"] is not None:
+            write_report(arguments["peephole_report"], optimizer, colout)
+    memoizer = None
+    if arguments["memoize"]:
+        memoizer = interpret.memoize()
 
+    # Testovací režim: overený program nad všetkými prípadmi adresára
+    if arguments["test"] is not None:
+        run_tests(arguments, interpret, colout)
+
+    # Kontrolné body behu a pokračovanie z uloženého kontrolného bodu
+    if arguments["checkpoint_every"] is not None:
+        instructions, seconds = arguments["checkpoint_every"]
+        interpret.use_checkpoints(arguments["checkpoint_file"], instructions, seconds)
+    if arguments["resume"] is not None:
+        resume_run(arguments, interpret, colout)
+
+    # Beh programu (jediná hranica výnimiek pre celý program)
+    try:
+        returncode = interpret.run()
+    except KeyboardInterrupt:
+        throw_err("EINT", "Interrupted by user", colour=colout, output=output)
+    except Exception as error:  # skipcq: PYL-W0703
+        instr = None
+        if error not in (
+            interpret.load_error,
+            interpret.verify_error,
+            interpret.checkpoint_error,
+        ):
+            instr = interpret.peek_instruction()
+        if profiler is not None:
+            write_profile(arguments, profiler, colout)
+        if memoizer is not None and arguments["memoize_report"] is not None:
+            write_report(arguments["memoize_report"], memoizer, colout)
+        throw_err(error_code(interpret, error), str(error), instr, colout, output)
+
+    try:
+        output.flush()
+    except Exception as error:  # skipcq: PYL-W0703
+        throw_err("EWRITE", str(error), colour=colout)
+    if profiler is not None:
+        write_profile(arguments, profiler, colout)
+    if memoizer is not None and arguments["memoize_report"] is not None:
+        write_report(arguments["memoize_report"], memoizer, colout)
     sys.exit(returncode or RETCODE.get("OK"))
 
 
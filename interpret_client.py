@@ -0,0 +1,78 @@
+"""
+IPP projekt 2023, časť 2
+
+Tenký klient servera interprétu (interpret.py --serve=<socket>). Prijíma
+rovnaké voľby ako interpret.py, úlohu odošle serveru spolu so svojím
+stdin, stdout a stderr a skončí s návratovým kódom úlohy. Cesta k soketu
+sa zadáva voľbou --connect=<socket> alebo premennou prostredia IPPC_SOCKET;
+ak server nie je dostupný, spustí interpret.py priamo.
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import json
+import os
+import socket
+import sys
+
+# Premenná prostredia s cestou k soketu servera
+SOCKET_ENV = "IPPC_SOCKET"
+
+# Návratový kód pri chybe spojenia so serverom (EINT)
+EINT = 99
+
+
+def split_args(argv):
+    """Oddelí voľbu --connect od volieb interprétu, vráti (soket, voľby)"""
+    path, args = os.environ.get(SOCKET_ENV), []
+    for arg in argv:
+        if arg.startswith("--connect="):
+            path = arg[len("--connect=") :]
+        else:
+            args.append(arg)
+    return path, args
+
+
+def run_locally(args):
+    """Spustí interpret.py v tomto procese (server nie je dostupný)"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "interpret.py")
+    os.execv(sys.executable, [sys.executable, script, *args])
+
+
+def main():
+    path, args = split_args(sys.argv[1:])
+    if path is None:
+        run_locally(args)
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except OSError:
+        conn.close()
+        run_locally(args)
+
+    try:
+        request = json.dumps({"argv": args, "cwd": os.getcwd()}).encode() + b"\n"
+        socket.send_fds(conn, [request], [0, 1, 2])
+        response = b""
+        while not response.endswith(b"\n"):
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("Server closed the connection")
+            response += chunk
+        result = json.loads(response)
+    except (OSError, ValueError) as error:
+        print(f"ERR! code EINT\nERR! {error}", file=sys.stderr)
+        sys.exit(EINT)
+    finally:
+        conn.close()
+
+    if result["signal"] is not None:
+        print(
+            f"ERR! code EINT\nERR! Job terminated by signal {result['signal']}",
+            file=sys.stderr,
+        )
+    sys.exit(result["returncode"])
+
+
+if __name__ == "__main__":
+    main()
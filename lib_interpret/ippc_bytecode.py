@@ -0,0 +1,298 @@
+"""
+Binárny formát preloženého programu a jeho diskové úložisko (--cache-dir).
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from lib_interpret.ippc_utils import *
+
+"""
+Formát súboru (little endian):
+    hlavička (HEADER): magické číslo, verzia formátu, SHA-256 zdroja,
+        CRC-32 zvyšku súboru a počty položiek jednotlivých tabuliek
+    tabuľka reťazcov: posuny (u32) do bloku UTF-8 reťazcov a blok samotný
+    konštanty (CONSTANT): typ a reťazec s hodnotou v kanonickom tvare
+    operandy (OPERAND): druh (konštanta/premenná/náveštie), index do
+        tabuľky konštánt, resp. reťazcov a pri konštante aj pôvodný zápis
+        zo zdroja (index reťazca + 1, 0 = bez zápisu)
+    inštrukcie (INSTRUCTION): číslo inštrukcie (OPCODES), počet operandov
+        a index prvého z nich v tabuľke operandov
+    náveštia (LABEL): názov a index inštrukcie (prepojené náveštia)
+"""
+
+MAGIC = b"IPPC23BC"
+FORMAT_VERSION = 2
+
+HEADER = struct.Struct("<8sH32sIIIIII")
+CONSTANT = struct.Struct("<BI")
+OPERAND = struct.Struct("<BII")
+INSTRUCTION = struct.Struct("<HHI")
+LABEL = struct.Struct("<II")
+OFFSET = struct.Struct("<I")
+
+# Čísla inštrukcií (index v tabuľke)
+OPCODES = tuple(INSTRUCTIONS)
+OPCODE_IDS = {opcode: index for index, opcode in enumerate(OPCODES)}
+
+# Typy konštánt, príznak NO_CONTENT značí hodnotu bez obsahu (prázdny element)
+CONSTANT_TYPES = ("int", "bool", "float", "string", "type", "nil")
+NO_CONTENT = 0x80
+
+# Druhy operandov
+OPERAND_CONSTANT, OPERAND_VARIABLE, OPERAND_LABEL = range(3)
+
+# Prípona súborov v úložisku
+CACHE_SUFFIX = ".ippcbc"
+
+
+def source_digest(source: bytes, source_format: str = "xml") -> bytes:
+    """Odtlačok zdroja programu v danom formáte (kľúč v úložisku)"""
+    return hashlib.sha256(source_format.encode() + b"\0" + source).digest()
+
+
+def constant_type(value: Value) -> int:
+    """Číslo typu konštanty (CONSTANT_TYPES), prípadne s príznakom NO_CONTENT"""
+    type_id = CONSTANT_TYPES.index(value.type)
+    if value.content is None and value.type != "nil":
+        type_id |= NO_CONTENT
+    return type_id
+
+
+def constant_text(value: Value) -> str:
+    """Kanonický textový tvar obsahu konštanty"""
+    if value.type == "float":
+        return value.content.hex()
+    if value.type == "bool":
+        return "true" if value.content else "false"
+    if value.type == "nil":
+        return ""
+    return str(value.content)
+
+
+def constant_value(type_id: int, text: str) -> Value:
+    """Vytvorí konštantu z jej kanonického tvaru (bez dekódovania escape)"""
+    value_type = CONSTANT_TYPES[type_id & ~NO_CONTENT]
+    if type_id & NO_CONTENT:
+        return Value(value_type, None)
+    if value_type == "int":
+        return Value("int", int(text))
+    if value_type == "bool":
+        return TRUE if text == "true" else FALSE
+    if value_type == "float":
+        return Value("float", float.fromhex(text))
+    if value_type == "nil":
+        return NIL
+    return Value(value_type, text)
+
+
+def dump_program(digest: bytes, instructions: list, labels: dict) -> bytes:
+    """
+    Zapíše program (inštrukcie a náveštia z XML) do binárneho formátu
+
+    Vyvolá:
+        KeyError: program obsahuje neznámu inštrukciu (nedá sa uložiť)
+    """
+    strings: dict[str, int] = {}
+    constants: dict[tuple, int] = {}
+    constant_table = bytearray()
+    operand_table = bytearray()
+    instruction_table = bytearray()
+    label_table = bytearray()
+
+    def string_index(text: str) -> int:
+        return strings.setdefault(text, len(strings))
+
+    def constant_index(value: Value) -> int:
+        type_id = constant_type(value)
+        key = (type_id, constant_text(value))
+        if key not in constants:
+            constants[key] = len(constants)
+            constant_table.extend(CONSTANT.pack(type_id, string_index(key[1])))
+        return constants[key]
+
+    operand_count = 0
+    for instr in instructions:
+        instruction_table.extend(
+            INSTRUCTION.pack(OPCODE_IDS[instr.opcode], len(instr.operands), operand_count)
+        )
+        for operand, spelling in zip(instr.operands, instr.spelling):
+            if isinstance(operand, Value):
+                spelling = 0 if spelling is None else string_index(spelling) + 1
+                entry = (OPERAND_CONSTANT, constant_index(operand), spelling)
+            elif isinstance(operand, UnresolvedVariable):
+                entry = (OPERAND_VARIABLE, string_index(repr(operand)), 0)
+            else:
+                entry = (OPERAND_LABEL, string_index(operand.name), 0)
+            operand_table.extend(OPERAND.pack(*entry))
+            operand_count += 1
+    for name, index in labels.items():
+        label_table.extend(LABEL.pack(string_index(name), index))
+
+    blob = bytearray()
+    offsets = bytearray()
+    for text in strings:
+        offsets.extend(OFFSET.pack(len(blob)))
+        blob.extend(text.encode("utf-8", "surrogatepass"))
+    offsets.extend(OFFSET.pack(len(blob)))
+
+    body = b"".join(
+        (offsets, blob, constant_table, operand_table, instruction_table, label_table)
+    )
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        digest,
+        zlib.crc32(body),
+        len(strings),
+        len(constants),
+        operand_count,
+        len(instructions),
+        len(labels),
+    )
+    return header + body
+
+
+def load_program(buffer, digest: bytes):
+    """
+    Načíta program z binárneho formátu, vráti (inštrukcie, náveštia)
+
+    Vyvolá:
+        LookupError: súbor je z inej verzie formátu alebo iného zdroja (zastaraný)
+        ValueError: súbor je poškodený
+    """
+    with memoryview(buffer) as view:
+        return _read_program(view, digest)
+
+
+def _read_program(view: memoryview, digest: bytes):
+    """Načíta program z pohľadu na binárny formát (viď load_program())"""
+    try:
+        magic, version, stored_digest, crc, *counts = HEADER.unpack_from(view)
+    except struct.error as error:
+        raise ValueError("Truncated header") from error
+    if magic != MAGIC:
+        raise ValueError("Not a compiled program")
+    if version != FORMAT_VERSION or stored_digest != digest:
+        raise LookupError("Compiled program is out of date")
+    if zlib.crc32(view[HEADER.size :]) != crc:
+        raise ValueError("Checksum mismatch")
+    n_strings, n_constants, n_operands, n_instructions, n_labels = counts
+
+    try:
+        position = HEADER.size
+
+        def table(record: struct.Struct, count: int):
+            nonlocal position
+            start, position = position, position + record.size * count
+            if position > len(view):
+                raise ValueError("Truncated table")
+            return list(record.iter_unpack(view[start:position]))
+
+        offsets = [offset for (offset,) in table(OFFSET, n_strings + 1)]
+        blob = bytes(view[position : position + offsets[-1]])
+        position += offsets[-1]
+        strings = [
+            blob[start:stop].decode("utf-8", "surrogatepass")
+            for start, stop in zip(offsets, offsets[1:])
+        ]
+        constants = [
+            constant_value(type_id, strings[text])
+            for type_id, text in table(CONSTANT, n_constants)
+        ]
+
+        variables: dict[int, UnresolvedVariable] = {}
+        label_args: dict[int, LabelArg] = {}
+        operands = []
+        spellings = []
+        for kind, index, spelling in table(OPERAND, n_operands):
+            spellings.append(strings[spelling - 1] if spelling else None)
+            if kind == OPERAND_CONSTANT:
+                operands.append(constants[index])
+            elif kind == OPERAND_VARIABLE:
+                if index not in variables:
+                    variables[index] = UnresolvedVariable(strings[index])
+                operands.append(variables[index])
+            else:
+                if index not in label_args:
+                    label_args[index] = LabelArg(strings[index])
+                operands.append(label_args[index])
+
+        instructions = [
+            Instruction(
+                OPCODES[opcode],
+                operands[first : first + count],
+                spellings[first : first + count],
+            )
+            for opcode, count, first in table(INSTRUCTION, n_instructions)
+        ]
+        labels = {strings[name]: index for name, index in table(LABEL, n_labels)}
+    except (IndexError, UnicodeDecodeError, RuntimeError) as error:
+        raise ValueError(f"Malformed compiled program: {error}") from error
+    return instructions, labels
+
+
+class ProgramCache:
+    """
+    Úložisko preložených programov v adresári, kľúčom je odtlačok
+    (SHA-256) zdroja. Záznam sa načítava cez mmap, zastaraný alebo
+    poškodený záznam sa pri ďalšom uložení prepíše.
+
+    Atribúty:
+        directory (str): adresár úložiska
+        status (str): výsledok posledného hľadania (hit, miss, stale, corrupt)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.status = "miss"
+
+    def path(self, digest: bytes) -> str:
+        """Cesta k záznamu programu s daným odtlačkom"""
+        return os.path.join(self.directory, digest.hex() + CACHE_SUFFIX)
+
+    def load(self, digest: bytes):
+        """Vráti (inštrukcie, náveštia) z úložiska alebo None (viď status)"""
+        try:
+            with open(self.path(digest), "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with gc_paused():
+                        program = load_program(mapped, digest)
+        except FileNotFoundError:
+            self.status = "miss"
+            return None
+        except LookupError:
+            self.status = "stale"
+            return None
+        except (OSError, ValueError):
+            self.status = "corrupt"
+            return None
+        self.status = "hit"
+        return program
+
+    def store(self, digest: bytes, instructions: list, labels: dict) -> bool:
+        """
+        Atomicky uloží program do úložiska, vráti False, ak to nie je možné
+        (neznáma inštrukcia, chyba zápisu)
+        """
+        try:
+            data = dump_program(digest, instructions, labels)
+        except KeyError:
+            return False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    file.write(data)
+                os.replace(temp_path, self.path(digest))
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,423 @@
+"""
+Prekladač IPPcode23 do Python funkcií po základných blokoch (--engine=compile).
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import sys
+from lib_interpret.ippc_utils import *
+
+# Inštrukcie, ktoré ukončujú základný blok (po nich začína nový)
+BLOCK_ENDS = (
+    "JUMP",
+    "JUMPIFEQ",
+    "JUMPIFNEQ",
+    "JUMPIFEQS",
+    "JUMPIFNEQS",
+    "CALL",
+    "RETURN",
+    "EXIT",
+)
+
+# Binárne operácie nad hodnotami (Value) a ich Python operátor
+BINARY_OPS = {
+    "ADD": "+",
+    "SUB": "-",
+    "MUL": "*",
+    "DIV": "/",
+    "IDIV": "//",
+    "LT": "<",
+    "GT": ">",
+    "EQ": "==",
+}
+
+# Operácie, pre ktoré sa generuje rýchla vetva pre dvojicu int operandov
+INT_FAST_OPS = {
+    "ADD": 'Value("int", {a}.content + {b}.content)',
+    "SUB": 'Value("int", {a}.content - {b}.content)',
+    "MUL": 'Value("int", {a}.content * {b}.content)',
+    "LT": "TRUE if {a}.content < {b}.content else FALSE",
+    "GT": "TRUE if {a}.content > {b}.content else FALSE",
+    "EQ": "TRUE if {a}.content == {b}.content else FALSE",
+}
+
+# Zásobníkové inštrukcie s dvoma operandmi a ich Python operátor
+STACK_OPS = {
+    "ADDS": "+",
+    "SUBS": "-",
+    "MULS": "*",
+    "DIVS": "/",
+    "IDIVS": "//",
+    "LTS": "<",
+    "GTS": ">",
+    "EQS": "==",
+    "ANDS": "&",
+    "ORS": "|",
+}
+
+# Zásobníkové inštrukcie s rýchlou vetvou pre int operandy (viď INT_FAST_OPS)
+STACK_FAST_OPS = {
+    "ADDS": "ADD",
+    "SUBS": "SUB",
+    "MULS": "MUL",
+    "LTS": "LT",
+    "GTS": "GT",
+    "EQS": "EQ",
+}
+
+# Zásobníkové konverzie: typ operandu a cieľový typ
+STACK_CONVERSIONS = {
+    "INT2FLOATS": ("int", "float"),
+    "FLOAT2INTS": ("float", "int"),
+    "INT2CHARS": ("int", "string"),
+}
+
+# Inštrukcie, pred ktorými musí byť dátový zásobník úplný (virtuálny zapísaný)
+STACK_OBSERVERS = (
+    "BREAK",
+    "JUMP",
+    "JUMPIFEQ",
+    "JUMPIFNEQ",
+    "CALL",
+    "RETURN",
+    "EXIT",
+)
+
+
+class BlockCompiler:
+    """
+    Prekladá overený program (Interpreter.verify()) do Python funkcií,
+    jednej pre každý základný blok. Blok vráti index inštrukcie, ktorou
+    program pokračuje, alebo ~kód pri inštrukcii EXIT (záporné číslo).
+    Sémantika (vrátane chýb a ich poradia) zodpovedá obsluhám execute_*,
+    menej časté inštrukcie blok priamo volá cez ich dekódovanú obsluhu.
+
+    Hodnoty zásobníkových inštrukcií ostávajú v rámci bloku v lokálnych
+    premenných (virtuálny zásobník); do dátového zásobníka sa zapíšu až
+    na konci bloku, pred inštrukciou, ktorá ho môže vidieť (STACK_OBSERVERS,
+    JUMPIFEQS/JUMPIFNEQS), a pred každým volaním obsluhy. CLEARS virtuálny
+    zásobník len zahodí. Chyba behu program ukončí, rozpracovaný virtuálny
+    zásobník teda pozorovať nemožno.
+
+    Atribúty:
+        interpreter (Interpreter): overený interpret, ktorého stav blok mení
+        source (str): vygenerovaný Python kód
+    """
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.source: str = ""
+        self._lines: list[str] = []
+        self._namespace: dict = {}
+        self._tmp = 0
+        self._stack: list[str] = []
+
+    def leaders(self, entry: int = 0) -> list[int]:
+        """Vráti zoradené indexy inštrukcií, ktorými začínajú základné bloky"""
+        leaders = {entry}
+        for index, instr in enumerate(self.interpreter.instructions):
+            if instr.opcode == "LABEL":
+                leaders.add(index)
+            elif instr.opcode in BLOCK_ENDS:
+                leaders.add(index + 1)
+        end = len(self.interpreter.instructions)
+        return sorted(leader for leader in leaders if leader < end)
+
+    def compile(self, entry: int = 0) -> list:
+        """
+        Preloží program a vráti zoznam funkcií blokov indexovaný indexom
+        inštrukcie (None pre inštrukcie, ktoré blok nezačínajú)
+        """
+        end = len(self.interpreter.instructions)
+        leaders = self.leaders(entry)
+        blocks = self.compile_ranges(zip(leaders, leaders[1:] + [end]))
+        return [blocks.get(index) for index in range(end)]
+
+    def compile_ranges(self, ranges) -> dict:
+        """
+        Preloží úseky programu (start, stop) bez náveští vo vnútri, každý
+        ako jeden blok, a vráti slovník start -> funkcia bloku
+        """
+        interp = self.interpreter
+        ranges = list(ranges)
+        self._lines = ["def make_blocks(I, G, D, C, FS, F, write):"]
+        self._namespace = {
+            "Value": Value,
+            "TRUE": TRUE,
+            "FALSE": FALSE,
+            "UNDEFINED": UNDEFINED,
+            "SB": StringBuffer,
+            "CT": interp._check_type,
+        }
+        for start, stop in ranges:
+            self._compile_block(start, stop)
+        self._emit(1, "return {%s}" % ", ".join(f"{i}: b{i}" for i, _ in ranges))
+        self.source = "\n".join(self._lines) + "\n"
+
+        code = compile(self.source, "<ippcode23>", "exec")
+        exec(code, self._namespace)  # skipcq: PYL-W0122
+        return self._namespace["make_blocks"](
+            interp,
+            interp.frames["global"].values,
+            interp.data_stack.items,
+            interp.call_stack.items,
+            interp.frame_stack.items,
+            interp.frames,
+            interp.output.write,
+        )
+
+    def _emit(self, depth: int, line: str):
+        self._lines.append("    " * depth + line)
+
+    def _name(self, prefix: str, obj) -> str:
+        """Sprístupní objekt generovanému kódu pod jedinečným menom"""
+        name = f"{prefix}{len(self._namespace)}"
+        self._namespace[name] = obj
+        return name
+
+    def _temp(self) -> str:
+        self._tmp += 1
+        return f"t{self._tmp}"
+
+    def _compile_block(self, start: int, stop: int):
+        interp = self.interpreter
+        instructions = interp.instructions[start:stop]
+        uses_lf = any(
+            isinstance(operand, UnresolvedVariable) and operand.frame == "LF"
+            for instr in instructions
+            for operand in instr.operands
+        )
+
+        self._emit(1, f"def b{start}():")
+        if uses_lf:
+            self._emit(2, "L = FS[-1].values if FS else None")
+        self._emit(2, f"p = {start}")
+        self._emit(2, "try:")
+        self._stack = []
+        terminated = False
+        for index in range(start, stop):
+            instr = interp.instructions[index]
+            if instr.opcode == "LABEL":
+                continue
+            if index != start:
+                self._emit(3, f"p = {index}")
+            terminated = self._compile_instruction(index, instr, uses_lf)
+        if not terminated:
+            self._flush_stack()
+            self._emit(3, f"return {stop}")
+        self._emit(2, "except BaseException:")
+        self._emit(3, "I.program_counter = p")
+        self._emit(3, "raise")
+
+    def _read(self, operand, expected_type: str = None) -> str:
+        """Vygeneruje čítanie symbolu, vráti výraz s jeho hodnotou"""
+        if isinstance(operand, Value):
+            return self._name("K", operand)
+
+        var = self._name("V", operand)
+        tmp = self._temp()
+        if operand.frame == "GF":
+            self._emit(3, f"{tmp} = G[{operand.slot}]")
+        elif operand.frame == "LF":
+            self._emit(3, f"{tmp} = L[{operand.slot}] if L is not None else None")
+        else:
+            self._emit(3, 'T = F["temporary"]')
+            self._emit(3, f"{tmp} = T.values[{operand.slot}] if T is not None else None")
+        # Chybu (nedefinovaná/neinicializovaná premenná, chýbajúci rámec)
+        # vyvolá prístupová funkcia premennej
+        self._emit(3, f"if {tmp}.__class__ is not Value: {tmp} = {var}.get()")
+        if expected_type is not None:
+            self._emit(3, f'CT({tmp}, "{expected_type}")')
+        return tmp
+
+    def _share(self, operand, expr: str):
+        """Vygeneruje označenie reťazcového buffera hodnoty ako zdieľaného"""
+        if isinstance(operand, UnresolvedVariable):
+            self._emit(3, f"if {expr}.content.__class__ is SB:")
+            self._emit(4, f"{expr}.content.shared = True")
+
+    def _write(self, operand, expr: str):
+        """Vygeneruje zápis hodnoty výrazu do premennej"""
+        var = self._name("V", operand)
+        slot = operand.slot
+        if operand.frame == "GF":
+            values, guard = "G", f"G[{slot}] is UNDEFINED"
+        elif operand.frame == "LF":
+            values, guard = "L", f"L is None or L[{slot}] is UNDEFINED"
+        else:
+            self._emit(3, 'T = F["temporary"]')
+            values, guard = "T.values", f"T is None or T.values[{slot}] is UNDEFINED"
+        self._emit(3, f"if {guard}: {var}.set({expr})")
+        self._emit(3, f"else: {values}[{slot}] = {expr}")
+
+    def _stack_check(self, size: int):
+        self._emit(3, f'if len(D) < {size}: raise IndexError("Stack underflow")')
+
+    def _push(self, expr: str):
+        """Vloží hodnotu výrazu na virtuálny zásobník"""
+        self._stack.append(expr)
+
+    def _pop(self, count: int) -> list[str]:
+        """
+        Odoberie count hodnôt (vrchol prvý) z virtuálneho zásobníka, chýbajúce
+        z dátového zásobníka (s kontrolou jeho veľkosti ako _check_stacklen())
+        """
+        missing = count - len(self._stack)
+        if missing > 0:
+            self._stack_check(missing)
+        values = []
+        for _ in range(count):
+            if self._stack:
+                values.append(self._stack.pop())
+            else:
+                tmp = self._temp()
+                self._emit(3, f"{tmp} = D.pop()")
+                values.append(tmp)
+        return values
+
+    def _flush_stack(self):
+        """Zapíše virtuálny zásobník do dátového zásobníka"""
+        if len(self._stack) == 1:
+            self._emit(3, f"D.append({self._stack[0]})")
+        elif self._stack:
+            self._emit(3, f"D.extend(({', '.join(self._stack)}))")
+        self._stack = []
+
+    def _compile_instruction(self, index: int, instr: Instruction, uses_lf: bool) -> bool:
+        """Vygeneruje kód inštrukcie, vráti True, ak inštrukcia ukončila blok"""
+        opcode = instr.opcode
+        handler, operands = self.interpreter._code[index]
+        if handler == self.interpreter.execute_INVALID:
+            opcode = "INVALID"  # Chyba operandu z verify(), vyvolá ju obsluha
+        if opcode in STACK_OBSERVERS:
+            self._flush_stack()
+
+        if opcode == "MOVE":
+            val = self._read(operands[1])
+            self._share(operands[1], val)
+            self._write(operands[0], val)
+        elif opcode in BINARY_OPS:
+            targ, val1, val2 = operands[:3]
+            a, b = self._read(val1), self._read(val2)
+            op = BINARY_OPS[opcode]
+            if opcode in INT_FAST_OPS:
+                fast = INT_FAST_OPS[opcode].format(a=a, b=b)
+                self._emit(3, f'if {a}.type == "int" == {b}.type: r = {fast}')
+                self._emit(3, f"else: r = {a} {op} {b}")
+            else:
+                self._emit(3, f"r = {a} {op} {b}")
+            self._write(targ, "r")
+        elif opcode in ("AND", "OR"):
+            targ, val1, val2 = operands
+            a, b = self._read(val1, "bool"), self._read(val2, "bool")
+            self._emit(3, f"r = {a} {'&' if opcode == 'AND' else '|'} {b}")
+            self._write(targ, "r")
+        elif opcode == "NOT":
+            self._write(operands[0], f"~{self._read(operands[1], 'bool')}")
+        elif opcode in ("INT2FLOAT", "FLOAT2INT", "INT2CHAR"):
+            source_type, target_type = {
+                "INT2FLOAT": ("int", "float"),
+                "FLOAT2INT": ("float", "int"),
+                "INT2CHAR": ("int", "string"),
+            }[opcode]
+            a = self._read(operands[1], source_type)
+            self._emit(3, f'r = {a}.to_type("{target_type}")')
+            self._write(operands[0], "r")
+        elif opcode == "STRI2INT":
+            idx = self._read(operands[2], "int")
+            a = self._read(operands[1], "string")
+            self._emit(3, f'r = {a}.to_type("int", {idx}.pyv())')
+            self._write(operands[0], "r")
+        elif opcode == "CONCAT" and operands[0] is not operands[1]:
+            # Pripájanie do tej istej premennej rieši obsluha (buffer na mieste)
+            a, b = self._read(operands[1], "string"), self._read(operands[2], "string")
+            self._emit(3, f'r = Value("string", {a}.content + {b}.content)')
+            self._write(operands[0], "r")
+        elif opcode == "STRLEN":
+            a = self._read(operands[1], "string")
+            self._write(operands[0], f'Value("int", len({a}.content))')
+        elif opcode == "GETCHAR":
+            a, b = self._read(operands[1], "string"), self._read(operands[2], "int")
+            self._emit(3, f'r = {a}.to_type("string", {b}.pyv())')
+            self._write(operands[0], "r")
+        elif opcode == "PUSHS":
+            val = self._read(operands[0])
+            self._share(operands[0], val)
+            self._push(val)
+        elif opcode == "POPS":
+            self._write(operands[0], self._pop(1)[0])
+        elif opcode == "CLEARS":
+            self._stack = []
+            self._emit(3, "D.clear()")
+        elif opcode in STACK_OPS:
+            b, a = self._pop(2)
+            tmp, op = self._temp(), STACK_OPS[opcode]
+            if opcode in STACK_FAST_OPS:
+                fast = INT_FAST_OPS[STACK_FAST_OPS[opcode]].format(a=a, b=b)
+                self._emit(3, f'if {a}.type == "int" == {b}.type: {tmp} = {fast}')
+                self._emit(3, f"else: {tmp} = {a} {op} {b}")
+            else:
+                self._emit(3, f"{tmp} = {a} {op} {b}")
+            self._push(tmp)
+        elif opcode == "NOTS":
+            tmp = self._temp()
+            self._emit(3, f"{tmp} = ~{self._pop(1)[0]}")
+            self._push(tmp)
+        elif opcode in STACK_CONVERSIONS:
+            source_type, target_type = STACK_CONVERSIONS[opcode]
+            (a,) = self._pop(1)
+            tmp = self._temp()
+            self._emit(3, f'CT({a}, "{source_type}")')
+            self._emit(3, f'{tmp} = {a}.to_type("{target_type}")')
+            self._push(tmp)
+        elif opcode == "STRI2INTS":
+            idx, a = self._pop(2)
+            tmp = self._temp()
+            self._emit(3, f'CT({a}, "string")')
+            self._emit(3, f'CT({idx}, "int")')
+            self._emit(3, f'{tmp} = {a}.to_type("int", {idx}.pyv())')
+            self._push(tmp)
+        elif opcode == "WRITE":
+            self._emit(3, f"write(str({self._read(operands[0])}))")
+        elif opcode == "JUMP":
+            self._emit(3, f"return {operands[0]}")
+            return True
+        elif opcode in ("JUMPIFEQ", "JUMPIFNEQ"):
+            target, val1, val2 = operands[:3]
+            a, b = self._read(val1), self._read(val2)
+            negate = "not " if opcode == "JUMPIFNEQ" else ""
+            self._emit(3, f"if {negate}{a}.equals({b}): return {target}")
+            self._emit(3, f"return {index + 1}")
+            return True
+        elif opcode in ("JUMPIFEQS", "JUMPIFNEQS"):
+            b, a = self._pop(2)
+            self._flush_stack()
+            negate = "not " if opcode == "JUMPIFNEQS" else ""
+            self._emit(3, f"if {negate}{b}.equals({a}): return {operands[0]}")
+            self._emit(3, f"return {index + 1}")
+            return True
+        elif opcode == "CALL":
+            limit = self.interpreter.call_limit
+            if limit < sys.maxsize:
+                self._emit(3, f"if len(C) >= {limit}:")
+                error = f'RecursionError("Call depth limit {limit} exceeded")'
+                self._emit(4, f"raise {error}")
+            self._emit(3, f"C.append({index + 1})")
+            self._emit(3, f"return {operands[0]}")
+            return True
+        elif opcode == "RETURN":
+            self._emit(3, "if not C:")
+            self._emit(4, 'raise IndexError("Empty call stack, nothing to return to")')
+            self._emit(3, "return C.pop()")
+            return True
+        else:
+            # Ostatné inštrukcie vykoná priamo ich obsluha (vidí celý zásobník)
+            self._flush_stack()
+            call = f"{self._name('H', handler)}(*{self._name('O', operands)})"
+            self._emit(3, f"I.program_counter = {index}")
+            if opcode == "EXIT":
+                self._emit(3, f"return ~{call}")
+                return True
+            self._emit(3, call)
+            if opcode in ("PUSHFRAME", "POPFRAME") and uses_lf:
+                self._emit(3, "L = FS[-1].values if FS else None")
+        return False
@@ -0,0 +1,311 @@
+"""
+Testovací režim (--test): jeden program overený raz a spustený nad adresárom
+prípadov *.in/*.out/*.rc na skupine pracovných procesov.
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET  # skipcq: BAN-B405
+from lib_interpret.ippc_utils import *
+
+# Prípony súborov prípadu (vstup, očakávaný výstup a návratový kód)
+CASE_SUFFIXES = (".in", ".out", ".rc")
+
+# Počet znakov výstupu, po ktorom sa výstup porovná s očakávaným
+COMPARE_CHUNK = 1 << 12
+
+# Koľko prípadov naraz dostane pracovný proces
+CHUNKS_PER_WORKER = 4
+
+# Najviac znakov zachyteného stderr v správe (pri neúspešnom prípade)
+REPORT_CAPTURE = 4096
+
+# Okolie prvého rozdielneho bajtu v dôvode neúspechu
+DIFF_CONTEXT = 16
+
+# Návratový kód, ak niektorý prípad neuspel
+EFAIL = 1
+
+# Spúšťaná sada (dedia ju pracovné procesy vytvorené cez fork)
+_suite = None
+
+
+def discover_cases(directory: str) -> list:
+    """
+    Nájde prípady v adresári: každý názov s aspoň jedným zo súborov
+    <názov>.in, <názov>.out, <názov>.rc. Chýbajúci vstup je prázdny,
+    chýbajúci .rc znamená 0 a bez .out sa výstup neporovnáva.
+
+    Vyvolá:
+        FileNotFoundError: adresár neexistuje
+        ValueError: .rc neobsahuje číslo
+    """
+    stems = sorted(
+        {
+            os.path.splitext(name)[0]
+            for name in os.listdir(directory)
+            if os.path.splitext(name)[1] in CASE_SUFFIXES
+        }
+    )
+    cases = []
+    for stem in stems:
+        path = os.path.join(directory, stem)
+        case = {"name": stem, "input": None, "expected_output": None}
+        if os.path.isfile(path + ".in"):
+            case["input"] = path + ".in"
+        if os.path.isfile(path + ".out"):
+            case["expected_output"] = path + ".out"
+        case["expected_code"] = 0
+        if os.path.isfile(path + ".rc"):
+            with open(path + ".rc", encoding="utf-8") as f:
+                text = f.read().strip()
+            try:
+                case["expected_code"] = int(text or 0)
+            except ValueError as error:
+                raise ValueError(f"Invalid return code in {stem}.rc") from error
+        cases.append(case)
+    return cases
+
+
+class OutputMismatch(Exception):
+    """
+    Výstup programu sa líši od očakávaného, beh prípadu sa preruší
+
+    Atribúty:
+        offset (int): index prvého rozdielneho bajtu
+        expected (bytes): očakávané bajty od rozdielu (DIFF_CONTEXT)
+        actual (bytes): skutočné bajty od rozdielu (DIFF_CONTEXT)
+    """
+
+    def __init__(self, offset: int, expected: bytes, actual: bytes):
+        super().__init__(f"Output differs at byte {offset}")
+        self.offset = offset
+        self.expected = expected
+        self.actual = actual
+
+    def reason(self) -> str:
+        """Dôvod neúspechu s okolím rozdielu"""
+        expected = repr(self.expected) if self.expected else "end of output"
+        actual = repr(self.actual) if self.actual else "end of output"
+        return f"output differs at byte {self.offset}: {actual}, expected {expected}"
+
+
+class StreamingDiff:
+    """
+    Prúd výstupu programu (pre OutputWriter), ktorý každý zapísaný úsek
+    hneď porovná s ďalšou časťou súboru s očakávaným výstupom; pri prvom
+    rozdielnom bajte vyvolá OutputMismatch. Bez súboru výstup len počíta.
+
+    Atribúty:
+        written (int): počet zapísaných bajtov
+    """
+
+    def __init__(self, path: str = None, encoding: str = "utf-8", errors="strict"):
+        self._expected = None if path is None else open(path, "rb")
+        self._encoding = encoding
+        self._errors = errors
+        self.written = 0
+
+    def isatty(self) -> bool:
+        return False
+
+    def write(self, text: str):
+        """Porovná úsek výstupu s očakávaným výstupom"""
+        data = text.encode(self._encoding, self._errors)
+        if self._expected is not None:
+            expected = self._expected.read(len(data))
+            if expected != data:
+                self._mismatch(expected, data)
+        self.written += len(data)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        """Overí, že skutočný výstup nie je kratší ako očakávaný"""
+        if self._expected is not None:
+            rest = self._expected.read(DIFF_CONTEXT)
+            if rest:
+                raise OutputMismatch(self.written, rest, b"")
+
+    def close(self):
+        if self._expected is not None:
+            self._expected.close()
+
+    def _mismatch(self, expected: bytes, actual: bytes):
+        index = 0
+        while index < len(expected) and expected[index] == actual[index]:
+            index += 1
+        expected += self._expected.read(DIFF_CONTEXT)
+        raise OutputMismatch(
+            self.written + index,
+            expected[index : index + DIFF_CONTEXT],
+            actual[index : index + DIFF_CONTEXT],
+        )
+
+
+class TestSuite:
+    """
+    Spustenie jedného overeného programu nad všetkými prípadmi. Každý
+    prípad dostane čistý stav interprétu (Interpreter.reset()), načítaný
+    a dekódovaný program zdieľajú pracovné procesy vytvorené cez fork().
+
+    Atribúty:
+        interpreter (Interpreter): overený (a prípadne optimalizovaný) interpret
+        cases (list): prípady (viď discover_cases())
+        classify (callable): chybový kód výnimky z behu (Interpreter, výnimka)
+        name (str): názov sady v správach (program)
+        results (list): výsledky prípadov v poradí cases (po run())
+        time (float): celkový čas behu sady v sekundách
+        workers (int): počet použitých pracovných procesov
+    """
+
+    def __init__(self, interpreter, cases: list, classify, name: str = "program"):
+        self.interpreter = interpreter
+        self.cases = cases
+        self.classify = classify
+        self.name = name
+        self.results: list[dict] = []
+        self.time = 0.0
+        self.workers = 1
+
+    def run(self, workers: int) -> list:
+        """Spustí všetky prípady (na workers procesoch) a vráti ich výsledky"""
+        global _suite
+        tasks = list(enumerate(self.cases))
+        self.workers = min(workers, len(tasks)) or 1
+        start = time.perf_counter()
+        if self.workers == 1:
+            results = [self.run_case(task) for task in tasks]
+        else:
+            _suite = self
+            chunksize = max(1, len(tasks) // (self.workers * CHUNKS_PER_WORKER))
+            try:
+                context = multiprocessing.get_context("fork")
+                with context.Pool(self.workers) as pool:
+                    results = list(pool.imap_unordered(_run_case, tasks, chunksize))
+            finally:
+                _suite = None
+        self.time = time.perf_counter() - start
+        self.results = sorted(results, key=lambda result: result["index"])
+        return self.results
+
+    def run_case(self, task: tuple) -> dict:
+        """Vykoná prípad (index, prípad) a vráti slovník s výsledkom"""
+        index, case = task
+        interp = self.interpreter
+        start = time.perf_counter()
+        stderr = io.StringIO()
+        compared = case["expected_code"] == 0  # Výstup len pri úspešnom behu
+        stream = StreamingDiff(
+            case["expected_output"] if compared else None,
+            sys.stdout.encoding or "utf-8",
+            sys.stdout.errors or "strict",
+        )
+        output = OutputWriter(stream, limit=COMPARE_CHUNK)
+        returncode, reason = None, None
+        if case["input"] is None:
+            input_cursor = InputCursor.from_text("")
+        else:
+            input_cursor = InputCursor.open(case["input"])
+        with contextlib.redirect_stderr(stderr):
+            try:
+                interp.reset(input_cursor, output)
+                try:
+                    returncode = interp.run() or RETCODE["OK"]
+                except OutputMismatch:
+                    raise
+                except Exception as error:  # skipcq: PYL-W0703
+                    ecode = self.classify(interp, error)
+                    print(f"ERR! code {ecode}\nERR! {error}", file=sys.stderr)
+                    returncode = RETCODE.get(ecode)
+                output.flush()
+                stream.finish()
+            except OutputMismatch as mismatch:
+                reason = mismatch.reason()
+            finally:
+                input_cursor.close()
+                stream.close()
+
+        if reason is None and returncode != case["expected_code"]:
+            reason = f"exit code {returncode}, expected {case['expected_code']}"
+        result = {
+            "index": index,
+            "name": case["name"],
+            "status": "fail" if reason is not None else "pass",
+            "returncode": returncode,
+            "expected_code": case["expected_code"],
+            "time": time.perf_counter() - start,
+            "output_bytes": stream.written,
+        }
+        if reason is not None:
+            result["reason"] = reason
+            result["stderr"] = stderr.getvalue()[:REPORT_CAPTURE]
+        return result
+
+    def failed(self) -> bool:
+        """Dotaz, či niektorý prípad neuspel"""
+        return any(result["status"] == "fail" for result in self.results)
+
+    def summary(self) -> str:
+        """Textový súhrn (neúspešné prípady a počty)"""
+        lines = [
+            f"FAIL {result['name']}: {result['reason']}"
+            for result in self.results
+            if result["status"] == "fail"
+        ]
+        failures = len(lines)
+        lines.append(
+            f"passed: {len(self.results) - failures}, failed: {failures},"
+            f" total: {len(self.results)}"
+        )
+        rate = len(self.results) / self.time if self.time else 0
+        lines.append(f"time: {self.time:.2f} s ({rate:.1f} cases/s)")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> str:
+        """Výsledky sady ako JSON"""
+        report = {
+            "suite": self.name,
+            "workers": self.workers,
+            "time": self.time,
+            "cases": self.results,
+        }
+        return json.dumps(report, indent=2) + "\n"
+
+    def to_junit(self) -> str:
+        """Výsledky sady vo formáte JUnit XML"""
+        failures = sum(1 for result in self.results if result["status"] == "fail")
+        suite = ET.Element(
+            "testsuite",
+            name=self.name,
+            tests=str(len(self.results)),
+            failures=str(failures),
+            errors="0",
+            time=f"{self.time:.6f}",
+        )
+        for result in self.results:
+            case = ET.SubElement(
+                suite,
+                "testcase",
+                classname=self.name,
+                name=result["name"],
+                time=f"{result['time']:.6f}",
+            )
+            if result["status"] == "fail":
+                ET.SubElement(case, "failure", message=result["reason"])
+                if result["stderr"]:
+                    ET.SubElement(case, "system-err").text = result["stderr"]
+        ET.indent(suite)
+        return ET.tostring(suite, encoding="unicode", xml_declaration=True) + "\n"
+
+
+def _run_case(task: tuple) -> dict:
+    """Vykoná prípad v pracovnom procese (viď TestSuite.run())"""
+    return _suite.run_case(task)
@@ -4,8 +4,29 @@ Implementácia triedy interprétu IPPcode23.
 """
 
 import sys
+import time
+from array import array
 import xml.etree.ElementTree as ET  # skipcq: BAN-B405
 from lib_interpret.ippc_utils import *
+from lib_interpret.ippc_compiler import BlockCompiler
+from lib_interpret.ippc_memoizer import Memoizer
+from lib_interpret.ippc_optimizer import Optimizer
+from lib_interpret.ippc_peephole import Peephole
+from lib_interpret.ippc_profiler import Profiler
+from lib_interpret.ippc_snapshot import Checkpointer, load_state, program_digest
+from lib_interpret.ippc_tracer import *
+
+# Dostupné vykonávacie jadrá (--engine)
+ENGINES = ("interpret", "compile")
+
+# Veľkosť časti XML podávanej parseru (znaky/bajty)
+XML_CHUNK = 1 << 16
+
+# Počet inštrukcií načítaných naraz pri postupnom načítaní (pipelined)
+PIPELINE_CHUNK = 1024
+
+# Predvolená najväčšia hĺbka volaní (bez obmedzenia, viď --call-depth)
+CALL_DEPTH_LIMIT = sys.maxsize
 
 
 class Interpreter:
@@ -17,25 +38,60 @@ class Interpreter:
         program_counter (int): počítadlo spracovaných inštrukcií
         frames (dict): slovník dátových rámcov
         frame_stack (Stack): zásobník dátových rámcov (vrchol = LF)
+        frame_pool (FramePool): uvoľnené rámce LF/TF na opätovné použitie
+        call_stack (Stack): zásobník návratových indexov (CALL)
+        call_limit (int): najväčšia hĺbka volaní, viac -> RecursionError
         data_stack (Stack): zásobník dátových hodnôt
-        input_queue (Queue): fronta vstupných hodnôt
+        input_cursor (InputCursor): vstup programu čítaný po riadkoch
+        output (OutputWriter): bufferovaný výstup programu
         labels (dict): slovník náveští
+        constants (ConstantPool): literály programu (dekódované pri načítaní)
+        _code (list): dekódované inštrukcie (obsluha, operandy), viď verify()
+        _local_frames (list): položky frame_stack pre priamy prístup obslúh
+        _return_indices (list): položky call_stack pre priamy prístup obslúh
+        _loader (generator): zvyšok programu pri postupnom načítaní (pipelined)
+        load_error (Exception): chyba postupného načítania XML programu
+        verify_error (Exception): chyba statickej kontroly postupne načítanej časti
+        profiler (Profiler): profiler behu (--profile), None = bez profilovania
+        tracer (Tracer): sledovanie behu (-d), None = bez sledovania
+        memoizer (Memoizer): memoizácia čistých funkcií, None = bez nej
+        checkpoints (Checkpointer): kontrolné body behu, None = bez nich
+        checkpoint_error (Exception): chyba zápisu kontrolného bodu
     """
 
-    def __init__(self, xml, in_txt):
+    def __init__(self, xml, program_input="", output=None, pipelined=False):
         self.instructions: list[Instruction] = []
         self.program_counter: int = 0
-        self.frames = {"global": Frame(), "temporary": None}
+        self._global_slots: dict[str, int] = {}
+        self._local_slots: dict[str, int] = {}
+        self.frames = {"global": Frame(self._global_slots), "temporary": None}
         self.call_stack = Stack()
         self.data_stack = Stack()
         self.frame_stack = Stack()
-        self.input_queue = Queue()
+        self.frame_pool = FramePool(self._local_slots)
+        self.call_limit = CALL_DEPTH_LIMIT
+        self._local_frames = self.frame_stack.items
+        self._return_indices = self.call_stack.items
+        if isinstance(program_input, str):
+            program_input = InputCursor.from_text(program_input)
+        self.input_cursor = program_input
+        self.output = OutputWriter() if output is None else output
         self.labels: dict[str, int] = {}
-        self._verbose = False
-        self.parse_xml(xml)
-
-        for line in in_txt.splitlines():
-            self.input_queue.enqueue(line)
+        self.constants = ConstantPool()
+        self._engine = "interpret"
+        self._code = None
+        self.load_error = None
+        self.verify_error = None
+        self.profiler = None
+        self.tracer = None
+        self.memoizer = None
+        self.checkpoints = None
+        self.checkpoint_error = None
+        self._loader = None
+        if pipelined:
+            self._loader = self._load_xml(xml, ascending_only=True)
+        elif xml is not None:
+            self.parse_xml(xml)
 
     def __repr__(self):
         lines = [
@@ -46,14 +102,14 @@ class Interpreter:
             f"  Frame stack size: {self.frame_stack.size()}",
             f"    TF exists: {self.frames['temporary'] is not None}",
             f"  Data stack size: {self.data_stack.size()}",
-            f"  Input queue size: {self.input_queue.size()}",
+            f"  Input lines read: {self.input_cursor.lines_read}",
             "",
             f"Global frame variables: ({self.frames['global'].size()})",
             f"{self.frames['global']}",
             f"Data stack: ({self.data_stack.size()})",
             f"{self.data_stack}",
-            f"Input queue: ({self.input_queue.size()})",
-            f"{self.input_queue}",
+            "Input remaining:",
+            f"{self.input_cursor}",
             f"Labels: ({len(self.labels)})",
             *(f"    {k} = {v}" for k, v in self.labels.items()),
             "",
@@ -69,26 +125,71 @@ class Interpreter:
 
         return "\n".join(lines)
 
-    def parse_xml(self, xml_str):
-        """Spracuje XML reprezentácie programu"""
+    def reset(self, program_input="", output=None):
+        """
+        Vráti interpret do stavu pred behom programu s novým vstupom a výstupom;
+        overený (dekódovaný) program sa tak dá vykonať opakovane bez jeho
+        opätovného načítania. Pole hodnôt GF sa vyprázdni na mieste, naň sú
+        naviazané prístupové funkcie premenných.
+        """
+        self.program_counter = 0
+        values = self.frames["global"].values
+        values[:] = [UNDEFINED] * len(values)
+        self.frames["temporary"] = None
+        self.call_stack.clear()
+        self.data_stack.clear()
+        self.frame_stack.clear()
+        if self.memoizer is not None:
+            self.memoizer.pending.clear()
+        if isinstance(program_input, str):
+            program_input = InputCursor.from_text(program_input)
+        self.input_cursor = program_input
+        self.output = OutputWriter() if output is None else output
+
+    def parse_xml(self, source):
+        """Spracuje celú XML reprezentáciu programu (reťazec/binárny súbor)"""
+        with gc_paused():
+            for _ in self._load_xml(source):
+                pass
+
+    def _load_xml(self, source, ascending_only=False):
+        """
+        Postupne načítava XML reprezentáciu programu (ET.XMLPullParser),
+        každý element uvoľní hneď po jeho spracovaní. Kým poradie inštrukcií
+        (order) rastie, pridáva ich rovno do programu a po každej vráti
+        riadenie (yield); inak ich zoradí až na konci dokumentu.
+
+        Vyvolá:
+            ET.ParseError: chybný formát XML
+            KeyError: chybná štruktúra XML (pri ascending_only aj neusporiadaný program)
+        """
+
+        def parse_variable(_, var_text):
+            """Rovnako zapísané premenné zdieľajú jeden objekt (viaže sa raz)"""
+            var = variables.get(var_text)
+            if var is None:
+                var = variables[var_text] = UnresolvedVariable(var_text)
+            return var
 
         def parse_operand(arg_elm):
-            type_mapping = {
-                "int": Value,
-                "string": Value,
-                "bool": Value,
-                "float": Value,
-                "type": Value,
-                "nil": Value,
-                "var": lambda _, v: UnresolvedVariable(v),
-                "label": lambda _, v: LabelArg(v),
-            }
             arg_type = arg_elm.attrib["type"]
             constructor = type_mapping.get(arg_type)
             if constructor is None:
                 raise KeyError(f"Invalid argument type {arg_type}")
             return constructor(arg_type, arg_elm.text)
 
+        constant = self.constants.get
+        type_mapping = {
+            "int": constant,
+            "string": constant,
+            "bool": constant,
+            "float": constant,
+            "type": constant,
+            "nil": constant,
+            "var": parse_variable,
+            "label": lambda _, v: LabelArg(v),
+        }
+
         def validate_xml_root(xml):
             if xml.tag != "program" or xml.attrib["language"] != "IPPcode23":
                 raise KeyError("Invalid XML root element")
@@ -102,7 +203,7 @@ class Interpreter:
                 raise KeyError("Invalid instruction order")
             opcode = instr_elm.attrib["opcode"].upper()
             operands_dict = {
-                int(arg_elm.tag[-1]): parse_operand(arg_elm)
+                int(arg_elm.tag[-1]): (parse_operand(arg_elm), arg_elm)
                 for arg_elm in instr_elm
                 if arg_elm.tag in ["arg1", "arg2", "arg3"]
             }
@@ -113,20 +214,32 @@ class Interpreter:
                 if i not in operands_dict:
                     raise KeyError(f"Missing argument {i}")
 
-            operands = [operands_dict[i] for i in sorted(operands_dict)]
-            return order, Instruction(opcode, operands)
-
-        xml = ET.fromstring(xml_str)  # skipcq: BAN-B314
-        validate_xml_root(xml)
-
-        temp_instructions = {}
-        for instr_elm in xml:
-            order, instruction = parse_xml_element(instr_elm)
-            if order in temp_instructions:
-                raise KeyError(f"Duplicate instruction order {order}")
-            temp_instructions[order] = instruction
-
-        for order, instruction in sorted(temp_instructions.items()):
+            operands, spelling = [], []
+            for i in sorted(operands_dict):
+                operand, arg_elm = operands_dict[i]
+                operands.append(operand)
+                spelling.append(
+                    f"{arg_elm.attrib['type']}@{arg_elm.text or ''}"
+                    if isinstance(operand, Value)
+                    else None
+                )
+            return order, Instruction(opcode, operands, spelling)
+
+        def read_chunks():
+            """Postupne vracia časti zdroja, na konci None (uzavretie parseru)"""
+            offset = 0
+            while True:
+                if isinstance(source, str):
+                    chunk = source[offset : offset + XML_CHUNK]
+                else:
+                    chunk = source.read(XML_CHUNK)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                yield chunk
+            yield None
+
+        def append_instruction(instruction):
             self.instructions.append(instruction)
             if instruction.opcode == "LABEL":
                 label_name = instruction.operands[0].name
@@ -134,6 +247,76 @@ class Interpreter:
                     raise KeyError(f"Duplicate label {label_name}")
                 self.labels[label_name] = len(self.instructions) - 1
 
+        depth = 0
+        root = None
+        variables: dict[str, UnresolvedVariable] = {}
+        orders = array("q")  # Poradie už pridaných inštrukcií (rastúce)
+        unordered = None  # Inštrukcie podľa poradia, ak poradie nerastie
+        parser = ET.XMLPullParser(events=("start", "end"))  # skipcq: BAN-B405
+        for chunk in read_chunks():
+            if chunk is None:
+                parser.close()
+            else:
+                parser.feed(chunk)
+            for event, elm in parser.read_events():
+                if event == "start":
+                    depth += 1
+                    if depth == 1:
+                        root = elm
+                        validate_xml_root(root)
+                    continue
+
+                depth -= 1
+                if depth != 1:
+                    continue
+                order, instruction = parse_xml_element(elm)
+                root.clear()  # Uvoľnenie spracovaného elementu
+
+                if unordered is None and (not orders or order > orders[-1]):
+                    orders.append(order)
+                    append_instruction(instruction)
+                    yield
+                    continue
+                if ascending_only:
+                    raise KeyError(
+                        "Instruction order must ascend for pipelined loading"
+                    )
+                if unordered is None:
+                    unordered = dict(zip(orders, self.instructions))
+                    self.instructions.clear()
+                    self.labels.clear()
+                if order in unordered:
+                    raise KeyError(f"Duplicate instruction order {order}")
+                unordered[order] = instruction
+
+        if unordered is not None:
+            for order in sorted(unordered):
+                append_instruction(unordered.pop(order))
+
+    def load_program(self, instructions: list, labels: dict):
+        """Použije už načítaný program (napr. z úložiska preložených programov)"""
+        self.instructions = instructions
+        self.labels = labels
+
+    def _pull(self, count: int = 1) -> bool:
+        """
+        Načíta (pri postupnom načítaní) ďalšie inštrukcie programu,
+        vráti False, ak už nie je čo načítať. Chybu načítania si zapamätá
+        v load_error, aby ju volajúci odlíšil od chyby behu programu.
+        """
+        if self._loader is None:
+            return False
+        try:
+            for _ in range(count):
+                next(self._loader)
+        except StopIteration:
+            self._loader = None
+        except Exception as error:
+            self._loader = None
+            self.load_error = error
+            raise
+        return True
+
     def peek_instruction(self):
         """Vráti inštrukciu, ktorá bude spracovaná ďalšia"""
         if len(self.instructions) <= self.program_counter:
@@ -141,8 +324,92 @@ class Interpreter:
         return self.instructions[self.program_counter]
 
     def make_verbose(self):
-        """Zapne výpisovanie všetkých inštrukcií"""
-        self._verbose = True
+        """Zapne výpisovanie všetkých inštrukcií (VerboseTracer)"""
+        self.use_tracer(VerboseTracer(self.output))
+
+    def use_tracer(self, tracer: Tracer):
+        """
+        Zaregistruje sledovanie behu: dekódované obsluhy nahradí obalenými
+        (viď _traced()). Sledovaný beh vždy používa tabuľku obslúh bez
+        superinštrukcií a optimalizácií, aby udalosti zodpovedali programu.
+        """
+        self.tracer = tracer
+        if self._code is not None:
+            self._code[:] = [
+                (self._traced(index, handler), operands)
+                for index, (handler, operands) in enumerate(self._code)
+            ]
+
+    def _traced(self, index: int, handler):
+        """Obalí obsluhu inštrukcie na indexe index udalosťami sledovania"""
+        interp, tracer = self, self.tracer
+        instr = self.instructions[index]
+        opcode = instr.opcode
+        writes = INSTRUCTIONS[opcode][:1] == ("var",)
+        stack = opcode in STACK_OPCODES
+        io = IO_OPCODES.get(opcode)
+
+        def traced(*operands):
+            tracer.before(index, instr)
+            retcode = handler(*operands)
+            if writes:
+                var = operands[0]
+                tracer.variable_write(var, None if opcode == "DEFVAR" else var.get())
+            if stack:
+                tracer.stack_change(interp.data_stack)
+            if io is not None:
+                value = operands[0].get()
+                tracer.io(io, value)
+            if opcode == "CALL":
+                tracer.call(index, interp.program_counter)
+            elif opcode == "RETURN":
+                tracer.returned(index, interp.program_counter + 1)
+            elif opcode in BRANCH_OPCODES:
+                tracer.branch(index, interp.program_counter != index)
+            elif retcode is not None:
+                tracer.exit(index, retcode)
+            tracer.after(index, instr)
+            return retcode
+
+        traced.__name__ = handler.__name__  # Názov pre profiler
+        return traced
+
+    def use_engine(self, engine: str):
+        """Zvolí vykonávacie jadro (interpret = tabuľka obslúh, compile = preklad blokov)"""
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine}")
+        self._engine = engine
+
+    def use_profiler(self) -> Profiler:
+        """
+        Zapne profilovanie behu (viď Profiler) a vráti profiler. Profilovaný
+        beh vždy používa tabuľku obslúh, neprofilovaný beh profiler nespomalí.
+        """
+        self.profiler = Profiler(self)
+        return self.profiler
+
+    def use_checkpoints(self, path: str, instructions=None, seconds=None):
+        """
+        Zapne pravidelné kontrolné body behu do súboru path (viď Checkpointer)
+        po danom počte inštrukcií alebo sekúnd a vráti ich. Beh s kontrolnými
+        bodmi vždy používa tabuľku obslúh, kontrolný bod sa zapisuje len
+        medzi dvoma inštrukciami.
+        """
+        self.checkpoints = Checkpointer(self, path, instructions, seconds)
+        return self.checkpoints
+
+    def restore(self, snapshot: bytes):
+        """
+        Obnoví stav behu z kontrolného bodu (viď load_state()); program musí
+        byť rovnaký ako pri jeho zápise, vrátane optimalizácie (-O)
+        """
+        if self._code is None:
+            self.verify()
+        if self.checkpoints is not None:
+            digest = self.checkpoints.digest
+        else:
+            digest = program_digest(self.instructions, self.labels)
+        load_state(self, snapshot, digest)
 
     def get_frame(self, name: str):
         """Vráti dátový rámec podľa názvu"""
@@ -155,9 +422,9 @@ class Interpreter:
             if frame is None:
                 raise MemoryError("Attempt to access non-existent TF")
         elif nameu == "LF":
-            frame = self.frame_stack.top()
-            if frame is None:
+            if not self._local_frames:
                 raise MemoryError("Attempt to access non-existent LF")
+            frame = self._local_frames[-1]
         else:
             raise AttributeError("Invalid frame name")
 
@@ -165,742 +432,795 @@ class Interpreter:
             raise AttributeError("Invalid frame name")
         return frame
 
-    def execute_next(self):
-        """Vykoná jednu inštrukciu a vráti jej prípadnú návratovú hodnotu"""
+    def _check_type(self, value: Value, expected_type: str) -> Value:
+        """Overí typ hodnoty získanej až počas behu (iný typ -> EOTYPE)"""
+        if value.type != expected_type:
+            raise TypeError(
+                f"Unexpected operand type {value.type}, {expected_type} expected"
+            )
+        return value
+
+    def _assign_slot(self, var: UnresolvedVariable):
+        """
+        Pridelí premennej index (slot) v poli hodnôt rámca; GF a LF/TF
+        (TF sa stáva LF) majú každý vlastný menný priestor slotov
+        """
+        slots = self._global_slots if var.frame == "GF" else self._local_slots
+        var.slot = slots.setdefault(var.name, len(slots))
+
+    def _bind_variable(self, var: UnresolvedVariable):
+        """
+        Naviaže na premennú prístupové funkcie get() a set(), ktoré
+        priamo indexujú pole hodnôt rámca podľa prideleného slotu
+
+        Vyvolá (pri prístupe):
+            KeyError: premenná v rámci nie je definovaná
+            MemoryError: rámec neexistuje
+            IndexError: čítanie neinicializovanej premennej
+        """
+        slot = var.slot
+
+        if var.frame == "GF":
+            values = self.frames["global"].values
+
+            def getter():
+                value = values[slot]
+                if value is None:
+                    raise IndexError(f"Invalid symbol {var}")
+                if value is UNDEFINED:
+                    raise KeyError(f"Couldn't access non-existant variable {var.name}")
+                return value
+
+            def setter(value):
+                if values[slot] is UNDEFINED:
+                    raise KeyError(f"Couldn't set non-existant variable {var.name}")
+                values[slot] = value
 
-        def validate_operand(operand, expected_type: str):
-            if operand is None:
-                raise RuntimeError(f"Unresolvable operand {operand}")
+        else:
+            current_frame = self._frame_getter(var.frame)
 
-            if isinstance(operand, Value):
-                if expected_type in ("value", "symb"):
-                    return operand
-                if operand.type != expected_type:
-                    raise TypeError(
-                        f"Unexpected operand type {operand.type}, {expected_type} expected"
-                    )
-                return operand
-            if isinstance(operand, UnresolvedVariable):
-                if expected_type not in ("var", "symb"):
-                    raise TypeError(
-                        f"Unexpected operand typ {operand.type}, {expected_type} expected"
-                    )
-                return operand
-            if isinstance(operand, LabelArg):
-                if expected_type != "label":
-                    raise TypeError(
-                        f"Unexpected operand type {operand.type}, {expected_type} expected"
-                    )
-                if operand.name not in self.labels:
-                    raise RuntimeError(f"Undefined label {operand.name}")
-                return operand
-            raise RuntimeError(f"Unresolvable operand {operand}")
-
-        def resolve_symb(symb, expected_type="value"):
-            result = None
-            if isinstance(symb, Value):
-                result = symb
-            if isinstance(symb, UnresolvedVariable):
-                frame = self.get_frame(symb.frame)
-                result = frame.get_variable(symb.name)
-            if result is None:
-                raise IndexError(f"Invalid symbol {symb}")
-            validate_operand(result, expected_type)
-            return result
-
-        def check_opcount(expected_count: int) -> bool:
-            if len(instr.operands) != expected_count:
-                raise RuntimeError(
-                    f"Wrong number of operands {len(instr.operands)}, {expected_count} expected"
-                )
-            return True
+            def getter():
+                value = current_frame().values[slot]
+                if value is None:
+                    raise IndexError(f"Invalid symbol {var}")
+                if value is UNDEFINED:
+                    raise KeyError(f"Couldn't access non-existant variable {var.name}")
+                return value
 
-        def check_stacklen(size: int) -> bool:
-            if self.data_stack.size() < size:
-                raise IndexError("Stack underflow")
-            return True
+            def setter(value):
+                values = current_frame().values
+                if values[slot] is UNDEFINED:
+                    raise KeyError(f"Couldn't set non-existant variable {var.name}")
+                values[slot] = value
 
-        def _dbgprint_variable(var, val):
-            if self._verbose:
-                print(
-                    f"    \033[32m{var.frame}@\033[0m{var.name} = \033[33m{val}\033[0m"
-                )
+        var.get, var.set = getter, setter
 
-        def _dbgprint_value(val):
-            if self._verbose:
-                print(f"    \033[33m{val}\033[0m")
+    def _frame_getter(self, name: str):
+        """Vráti funkciu, ktorá získa aktuálny LF alebo TF (neexistuje -> ENOFRM)"""
+        frames, local_frames = self.frames, self._local_frames
 
-        def _dbgprint_stacktop():
-            if self._verbose:
-                print(
-                    f"    {{\033[33m{self.data_stack.top().pyv() if not self.data_stack.is_empty() else  'NULL'}\033[0m}}"
-                )
+        if name == "TF":
 
-        if self.program_counter >= len(self.instructions):
-            return 0
+            def current_frame():
+                frame = frames["temporary"]
+                if frame is None:
+                    raise MemoryError("Attempt to access non-existent TF")
+                return frame
+
+        else:
 
-        instr: Instruction = self.instructions[self.program_counter]
-
-        if self._verbose:
-            print(f"  \033[90m{instr}\033[0m")
-
-        opcode_impl = {}
-
-        def execute_MOVE():
-            """MOVE (var)targ (symb)val"""
-            check_opcount(2)
-            targ, val = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val, "symb")
-            val = resolve_symb(val)
-            self.get_frame(targ.frame).set_variable(targ.name, val)
-            _dbgprint_variable(targ, val.pyv())
-
-        opcode_impl["MOVE"] = execute_MOVE
-
-        def execute_CREATEFRAME():
-            """CREATEFRAME"""
-            check_opcount(0)
-            self.frames["temporary"] = Frame()
-
-        opcode_impl["CREATEFRAME"] = execute_CREATEFRAME
-
-        def execute_PUSHFRAME():
-            """PUSHFRAME"""
-            check_opcount(0)
-            if self.frames["temporary"] is None:
-                raise MemoryError("Attempt to push non-existent TF")
-            self.frame_stack.push(self.frames["temporary"])
-            self.frames["temporary"] = None
-
-        opcode_impl["PUSHFRAME"] = execute_PUSHFRAME
-
-        def execute_POPFRAME():
-            """POPFRAME"""
-            check_opcount(0)
-            if self.frame_stack.is_empty():
-                raise MemoryError("Attempt to pop non-existent LF")
-            self.frames["temporary"] = self.frame_stack.pop()
-
-        opcode_impl["POPFRAME"] = execute_POPFRAME
-
-        def execute_DEFVAR():
-            """DEFVAR (var)var"""
-            check_opcount(1)
-            var = validate_operand(instr.operands[0], "var")
-            self.get_frame(var.frame).define_variable(var.name)
-            _dbgprint_variable(var, "[defined]")
-
-        opcode_impl["DEFVAR"] = execute_DEFVAR
-
-        def execute_CALL():
-            """CALL (label)label"""
-            check_opcount(1)
-            label = validate_operand(instr.operands[0], "label")
-            self.call_stack.push(self.program_counter + 1)
-            self.program_counter = self.labels[label.name]
-
-        opcode_impl["CALL"] = execute_CALL
-
-        def execute_RETURN():
-            """RETURN"""
-            check_opcount(0)
-            if self.call_stack.is_empty():
-                raise IndexError("Empty call stack, nothing to return to")
-            self.program_counter = self.call_stack.pop() - 1
-
-        opcode_impl["RETURN"] = execute_RETURN
-
-        def execute_PUSHS():
-            """PUSHS (symb)val"""
-            check_opcount(1)
-            val = validate_operand(instr.operands[0], "symb")
-            self.data_stack.push(resolve_symb(val))
-            _dbgprint_stacktop()
-
-        opcode_impl["PUSHS"] = execute_PUSHS
-
-        def execute_POPS():
-            """POPS (var)targ"""
-            check_opcount(1)
-            targ = validate_operand(instr.operands[0], "var")
-            check_stacklen(1)
-            val = self.data_stack.pop()
-            self.get_frame(targ.frame).set_variable(targ.name, val)
-            _dbgprint_variable(targ, val.pyv())
-            _dbgprint_stacktop()
-
-        opcode_impl["POPS"] = execute_POPS
-
-        def execute_CLEARS():
-            """CLEARS"""
-            check_opcount(0)
-            self.data_stack.clear()
-            _dbgprint_stacktop()
-
-        opcode_impl["CLEARS"] = execute_CLEARS
-
-        def execute_ADD():
-            """ADD (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = resolve_symb(val1) + resolve_symb(val2)
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["ADD"] = execute_ADD
-
-        def execute_SUB():
-            """SUB (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = resolve_symb(val1) - resolve_symb(val2)
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["SUB"] = execute_SUB
-
-        def execute_MUL():
-            """MUL (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = resolve_symb(val1) * resolve_symb(val2)
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["MUL"] = execute_MUL
-
-        def execute_DIV():
-            """DIV (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = resolve_symb(val1) / resolve_symb(val2)
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["DIV"] = execute_DIV
-
-        def execute_IDIV():
-            """IDIV (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(targ, "symb")
-            validate_operand(targ, "symb")
-            result = resolve_symb(val1) // resolve_symb(val2)
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["IDIV"] = execute_IDIV
-
-        def execute_ADDS():
-            """ADDS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 + val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["ADDS"] = execute_ADDS
-
-        def execute_SUBS():
-            """SUBS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 - val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["SUBS"] = execute_SUBS
-
-        def execute_MULS():
-            """MULS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 * val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["MULS"] = execute_MULS
-
-        def execute_DIVS():
-            """DIVS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 / val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["DIVS"] = execute_DIVS
-
-        def execute_IDIVS():
-            """IDIVS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 // val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["IDIVS"] = execute_IDIVS
-
-        def execute_LT():
-            """LT (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = resolve_symb(val1) < resolve_symb(val2)
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["LT"] = execute_LT
-
-        def execute_GT():
-            """GT (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = resolve_symb(val1) > resolve_symb(val2)
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["GT"] = execute_GT
-
-        def execute_EQ():
-            """EQ (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = resolve_symb(val1) == resolve_symb(val2)
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["EQ"] = execute_EQ
-
-        def execute_LTS():
-            """LTS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 < val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["LTS"] = execute_LTS
-
-        def execute_GTS():
-            """GTS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 > val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["GTS"] = execute_GTS
-
-        def execute_EQS():
-            """EQS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 == val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["EQS"] = execute_EQS
-
-        def execute_AND():
-            """AND (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = resolve_symb(val1, "bool") & resolve_symb(val2, "bool")
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["AND"] = execute_AND
-
-        def execute_OR():
-            """OR (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = resolve_symb(val1, "bool") | resolve_symb(val2, "bool")
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["OR"] = execute_OR
-
-        def execute_NOT():
-            """NOT (var)targ (symb)val"""
-            check_opcount(2)
-            targ, val = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val, "symb")
-            result = ~resolve_symb(val, "bool")
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, result.pyv())
-
-        opcode_impl["NOT"] = execute_NOT
-
-        def execute_ANDS():
-            """ANDS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 & val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["ANDS"] = execute_ANDS
-
-        def execute_ORS():
-            """ORS"""
-            check_opcount(0)
-            check_stacklen(2)
-            val2, val1 = self.data_stack.pop(), self.data_stack.pop()
-            self.data_stack.push(val1 | val2)
-            _dbgprint_stacktop()
-
-        opcode_impl["ORS"] = execute_ORS
-
-        def execute_NOTS():
-            """NOTS"""
-            check_opcount(0)
-            check_stacklen(1)
-            val = self.data_stack.pop()
-            self.data_stack.push(~val)
-            _dbgprint_stacktop()
-
-        opcode_impl["NOTS"] = execute_NOTS
-
-        def execute_INT2FLOAT():
-            """INT2FLOAT (var)targ (symb)val"""
-            check_opcount(2)
-            targ, val = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val, "symb")
-            val = resolve_symb(val, "int").to_type("float")
-            self.get_frame(targ.frame).set_variable(targ.name, val)
-            _dbgprint_variable(targ, val.pyv())
-
-        opcode_impl["INT2FLOAT"] = execute_INT2FLOAT
-
-        def execute_FLOAT2INT():
-            """FLOAT2INT (var)targ (symb)val"""
-            check_opcount(2)
-            targ, val = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val, "symb")
-            val = resolve_symb(val, "float").to_type("int")
-            self.get_frame(targ.frame).set_variable(targ.name, val)
-            _dbgprint_variable(targ, val.pyv())
-
-        opcode_impl["FLOAT2INT"] = execute_FLOAT2INT
-
-        def execute_INT2CHAR():
-            """INT2CHAR (var)targ (symb)val"""
-            check_opcount(2)
-            targ, val = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val, "symb")
-            val = resolve_symb(val, "int").to_type("string")
-            self.get_frame(targ.frame).set_variable(targ.name, val)
-            _dbgprint_variable(targ, val.pyv())
-
-        opcode_impl["INT2CHAR"] = execute_INT2CHAR
-
-        def execute_STRI2INT():
-            """STRI2INT (var)targ (symb)val (symb)idx"""
-            check_opcount(3)
-            targ, val, idx = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val, "symb")
-            validate_operand(idx, "symb")
-            idx = resolve_symb(idx, "int")
-            val = resolve_symb(val, "string").to_type("int", idx.pyv())
-            self.get_frame(targ.frame).set_variable(targ.name, val)
-            _dbgprint_variable(targ, val.pyv())
-
-        opcode_impl["STRI2INT"] = execute_STRI2INT
-
-        def execute_INT2FLOATS():
-            """INT2FLOATS"""
-            check_opcount(0)
-            check_stacklen(1)
-            val = self.data_stack.pop()
-            validate_operand(val, "int")
-            val = val.to_type("float")
-            self.data_stack.push(val)
-            _dbgprint_stacktop()
-
-        opcode_impl["INT2FLOATS"] = execute_INT2FLOATS
-
-        def execute_FLOAT2INTS():
-            """FLOAT2INTS"""
-            check_opcount(0)
-            check_stacklen(1)
-            val = self.data_stack.pop()
-            validate_operand(val, "float")
-            val = val.to_type("int")
-            self.data_stack.push(val)
-            _dbgprint_stacktop()
-
-        opcode_impl["FLOAT2INTS"] = execute_FLOAT2INTS
-
-        def execute_INT2CHARS():
-            """INT2CHARS"""
-            check_opcount(0)
-            check_stacklen(1)
-            val = self.data_stack.pop()
-            validate_operand(val, "int")
-            val = val.to_type("string")
-            self.data_stack.push(val)
-            _dbgprint_stacktop()
-
-        opcode_impl["INT2CHARS"] = execute_INT2CHARS
-
-        def execute_STRI2INTS():
-            """STRI2INTS"""
-            check_opcount(0)
-            check_stacklen(2)
-            idx, val = self.data_stack.pop(), self.data_stack.pop()
-            validate_operand(val, "string")
-            validate_operand(idx, "int")
-            val = val.to_type("int", idx.pyv())
-            self.data_stack.push(val)
-            _dbgprint_stacktop()
-
-        opcode_impl["STRI2INTS"] = execute_STRI2INTS
-
-        def execute_READ():
-            """READ (var)targ (type)ttype"""
-            check_opcount(2)
-            targ, ttype = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(ttype, "type")
+            def current_frame():
+                if not local_frames:
+                    raise MemoryError("Attempt to access non-existent LF")
+                return local_frames[-1]
+
+        return current_frame
+
+    def _check_stacklen(self, size: int) -> bool:
+        """Overí, že dátový zásobník obsahuje aspoň daný počet hodnôt"""
+        if self.data_stack.size() < size:
+            raise IndexError("Stack underflow")
+        return True
+
+    def verify(self):
+        """
+        Statická kontrola programu, vykonáva sa raz pred jeho behom:
+        overí inštrukcie, počty operandov a existenciu náveští, a dekóduje
+        program do tabuľky obslúh (skoky sú prepojené priamo na index
+        cieľového náveštia) a premenné na sloty v rámcoch. Chybný druh
+        operandu alebo typ konštanty sa zaznamená v obsluhe inštrukcie
+        a hlási sa až pri jej vykonaní (viď decode()).
+        """
+        self._code = []
+        self.frames["global"] = Frame(self._global_slots)
+        with gc_paused():
+            self._pull(PIPELINE_CHUNK)
+            self._decode_loaded()
+
+    def _decode_loaded(self):
+        """
+        Overí a dekóduje doteraz načítané, ešte nedekódované inštrukcie
+        a rozšíri existujúce rámce o novo pridelené sloty premenných
+        """
+        code, instructions = self._code, self.instructions
+        start = len(code)
+        while len(code) < len(instructions):
+            handler, operands = self.decode(instructions[len(code)])
+            if self.tracer is not None:
+                handler = self._traced(len(code), handler)
+            code.append((handler, operands))
+
+        for instr in instructions[start:]:
+            for operand in instr.operands:
+                if isinstance(operand, UnresolvedVariable) and operand.get is None:
+                    self._bind_variable(operand)
+        for frame in (
+            self.frames["global"],
+            self.frames["temporary"],
+            *self.frame_stack.items,
+        ):
+            if frame is not None:
+                frame.grow()
+        self.frame_pool.grow()
+
+    def _load_more(self) -> bool:
+        """Načíta a overí ďalšiu časť programu (pipelined), na konci vráti False"""
+        with gc_paused():
+            if not self._pull(PIPELINE_CHUNK):
+                return False
             try:
-                val = (
-                    Value("nil", "")
-                    if self.input_queue.is_empty()
-                    else Value(ttype.pyv(), str(self.input_queue.dequeue()))
-                )
-            except Exception:  # skipcq: PYL-W0703
-                val = Value("nil", "")
-            self.get_frame(targ.frame).set_variable(targ.name, val)
-            _dbgprint_variable(targ, val.pyv())
-
-        opcode_impl["READ"] = execute_READ
-
-        def execute_WRITE():
-            """WRITE (symb)val"""
-            check_opcount(1)
-            val = validate_operand(instr.operands[0], "symb")
-            print(str(resolve_symb(val)), end="")
-            if self._verbose:
-                print("")
-
-        opcode_impl["WRITE"] = execute_WRITE
-
-        def execute_CONCAT():
-            """CONCAT (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            result = str(resolve_symb(val1, "string")) + str(
-                resolve_symb(val2, "string")
+                self._decode_loaded()
+            except Exception as error:
+                if error is not self.load_error:
+                    self.verify_error = error
+                raise
+        return True
+
+    def optimize(self) -> Optimizer:
+        """
+        Optimalizuje celý overený program (viď Optimizer) a vráti optimalizátor
+        so štatistikou. Sledovanie behu (-d) sleduje pôvodný program, s ním
+        sa program nemení.
+        """
+        if self._code is None:
+            self.verify()
+        optimizer = Optimizer(self)
+        if self.tracer is None:
+            while self._load_more():
+                pass
+            optimizer.run()
+        return optimizer
+
+    def peephole(self) -> Peephole:
+        """
+        Spojí časté postupnosti inštrukcií do superinštrukcií (viď Peephole)
+        a vráti optimalizátor so štatistikou spojení. Týka sa len jadra
+        interpret bez sledovania behu (jadro compile prekladá inštrukcie).
+        """
+        if self._code is None:
+            self.verify()
+        optimizer = Peephole(self)
+        if self._engine == "interpret" and self.tracer is None:
+            optimizer.run()
+        return optimizer
+
+    def memoize(self) -> Memoizer:
+        """
+        Zapne memoizáciu volaní čistých funkcií (viď Memoizer) a vráti ju
+        s výsledkom analýzy funkcií. Týka sa len jadra interpret bez
+        sledovania a profilovania behu (tie pozorujú každé volanie).
+        """
+        if self._code is None:
+            self.verify()
+        memoizer = Memoizer(self)
+        observed = self.tracer is not None or self.profiler is not None
+        if self._engine == "interpret" and not observed:
+            while self._load_more():
+                pass
+            memoizer.run()
+            self.memoizer = memoizer
+        return memoizer
+
+    def decode(self, instr: Instruction):
+        """
+        Overí a dekóduje inštrukciu na dvojicu (obsluha, operandy), ktorú
+        stačí pri vykonaní už len zavolať (obsluha(*operandy)); aritmetické
+        a relačné inštrukcie dostanú navyše vlastnú InlineCache. Nepovolený
+        druh operandu alebo typ konštanty (TypeError) je chybou behu, takú
+        inštrukciu dekóduje na execute_INVALID, ktorá chybu vyvolá až pri
+        jej vykonaní.
+
+        Vyvolá:
+            RuntimeError: neznáma inštrukcia, zlý počet operandov, neexistujúce náveštie
+        """
+        signature = INSTRUCTIONS.get(instr.opcode)
+        if signature is None:
+            raise RuntimeError(f"Unrecognised instruction {instr.opcode}")
+        if len(instr.operands) != len(signature):
+            raise RuntimeError(
+                f"Wrong number of operands {len(instr.operands)}, {len(signature)} expected"
             )
-            self.get_frame(targ.frame).set_variable(
-                targ.name, Value("string", str(result))
-            )
-            _dbgprint_variable(targ, str(result))
-
-        opcode_impl["CONCAT"] = execute_CONCAT
-
-        def execute_STRLEN():
-            """STRLEN (var)targ (symb)val"""
-            check_opcount(2)
-            targ, val = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val, "symb")
-            result = Value("int", str(len(str(resolve_symb(val, "string")))))
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, str(result))
-
-        opcode_impl["STRLEN"] = execute_STRLEN
-
-        def execute_GETCHAR():
-            """GETCHAR (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            val1, val2 = resolve_symb(val1, "string"), resolve_symb(val2, "int")
-            result = val1.to_type("string", val2.pyv())
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, str(result))
-
-        opcode_impl["GETCHAR"] = execute_GETCHAR
-
-        def execute_SETCHAR():
-            """SETCHAR (var)targ (symb)val1 (symb)val2"""
-            check_opcount(3)
-            targ, val1, val2 = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            tval = resolve_symb(targ, "string")
-            val1, val2 = resolve_symb(val1, "int"), resolve_symb(val2, "string")
-            tval.to_type("string", val1.pyv())  # Overí index
-            try:
-                tlist = list(str(tval))
-                tlist[val1.pyv()] = str(val2)[0]
-                result = Value("string", "".join(tlist))
-            except Exception:  # skipcq: PYL-W0703
-                raise NameError("Invalid index")
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, str(result))
-
-        opcode_impl["SETCHAR"] = execute_SETCHAR
-
-        def execute_TYPE():
-            """TYPE (var)targ (symb)val"""
-            check_opcount(2)
-            targ, val = instr.operands
-            validate_operand(targ, "var")
-            validate_operand(val, "symb")
-            try:
-                val = resolve_symb(val)
-                result = Value("string", val.type)
-            except IndexError:
-                val = Value("nil", "")
-                result = Value("string", "")
-            self.get_frame(targ.frame).set_variable(targ.name, result)
-            _dbgprint_variable(targ, str(result))
-
-        opcode_impl["TYPE"] = execute_TYPE
-
-        def execute_LABEL():
-            """LABEL (label)label"""
-            check_opcount(1)  # Náveštie rieši XML parser
-
-        opcode_impl["LABEL"] = execute_LABEL
-
-        def execute_JUMP():
-            """JUMP (label)label"""
-            check_opcount(1)
-            label = instr.operands[0]
-            validate_operand(label, "label")
-            self.program_counter = self.labels[label.name]
-
-        opcode_impl["JUMP"] = execute_JUMP
-
-        def execute_JUMPIFEQ():
-            """JUMPIFEQ (label)label (symb)val1 (symb)val2"""
-            check_opcount(3)
-            label, val1, val2 = instr.operands
-            validate_operand(label, "label")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            val1, val2 = resolve_symb(val1), resolve_symb(val2)
-            dojump = (val1 == val2).pyv()
-            if dojump:
-                self.program_counter = self.labels[label.name]
-            _dbgprint_value(str(dojump).lower())
-
-        opcode_impl["JUMPIFEQ"] = execute_JUMPIFEQ
-
-        def execute_JUMPIFNEQ():
-            """JUMPIFNEQ (label)label (symb)val1 (symb)val2"""
-            check_opcount(3)
-            label, val1, val2 = instr.operands
-            validate_operand(label, "label")
-            validate_operand(val1, "symb")
-            validate_operand(val2, "symb")
-            val1, val2 = resolve_symb(val1), resolve_symb(val2)
-            dojump = (val1 != val2).pyv()
-            if dojump:
-                self.program_counter = self.labels[label.name]
-            _dbgprint_value(str(dojump).lower())
-
-        opcode_impl["JUMPIFNEQ"] = execute_JUMPIFNEQ
-
-        def execute_JUMPIFEQS():
-            """JUMPIFEQS (label)label"""
-            check_opcount(1)
-            label = validate_operand(instr.operands[0], "label")
-            check_stacklen(2)
-            dojump = (self.data_stack.pop() == self.data_stack.pop()).pyv()
-            if dojump:
-                self.program_counter = self.labels[label.name]
-            _dbgprint_value(str(dojump).lower())
-
-        opcode_impl["JUMPIFEQS"] = execute_JUMPIFEQS
-
-        def execute_JUMPIFNEQS():
-            """JUMPIFNEQS (label)label"""
-            check_opcount(1)
-            label = validate_operand(instr.operands[0], "label")
-            check_stacklen(2)
-            dojump = (self.data_stack.pop() != self.data_stack.pop()).pyv()
-            if dojump:
-                self.program_counter = self.labels[label.name]
-            _dbgprint_value(str(dojump).lower())
-
-        opcode_impl["JUMPIFNEQS"] = execute_JUMPIFNEQS
-
-        def execute_EXIT():
-            """EXIT (symb)val"""
-            check_opcount(1)
-            val = validate_operand(instr.operands[0], "symb")
-            val = resolve_symb(val, "int")
-            if 0 <= val.pyv() <= 49:
-                _dbgprint_value(val.pyv())
-                return val.content
-            raise ValueError("Invalid exit code")
-
-        opcode_impl["EXIT"] = execute_EXIT
-
-        def execute_DPRINT():
-            """DPRINT (symb)val"""
-            check_opcount(1)
-            val = validate_operand(instr.operands[0], "symb")
-            val = resolve_symb(val)
-            print(str(val), file=sys.stderr, end="")
-
-        opcode_impl["DPRINT"] = execute_DPRINT
-
-        def execute_BREAK():
-            """BREAK"""
-            check_opcount(0)
-            print(repr(self), file=sys.stderr)
-
-        opcode_impl["BREAK"] = execute_BREAK
-
-        iexecute = opcode_impl.get(instr.opcode)
-        if not iexecute:
-            raise RuntimeError("Unrecognised instruction")
-        retcode = iexecute()
+
+        operands, error = [], None
+        for operand, kind in zip(instr.operands, signature):
+            if kind == "label":
+                if not isinstance(operand, LabelArg):
+                    error = error or TypeError(
+                        f"Unexpected operand {operand}, label expected"
+                    )
+                    continue
+                while operand.name not in self.labels and self._pull():
+                    pass  # Náveštie môže byť v ešte nenačítanej časti programu
+                if operand.name not in self.labels:
+                    raise RuntimeError(f"Undefined label {operand.name}")
+                operand = self.labels[operand.name]
+            elif kind == "var":
+                if not isinstance(operand, UnresolvedVariable):
+                    error = error or TypeError(
+                        f"Unexpected operand {operand}, var expected"
+                    )
+                    continue
+                self._assign_slot(operand)
+            elif isinstance(operand, Value):
+                if kind not in ("symb", operand.type):
+                    error = error or TypeError(
+                        f"Unexpected operand type {operand.type}, {kind} expected"
+                    )
+            elif kind == "type" or not isinstance(operand, UnresolvedVariable):
+                error = error or TypeError(
+                    f"Unexpected operand {operand}, {kind} expected"
+                )
+                continue
+            else:
+                self._assign_slot(operand)
+            operands.append(operand)
+        if error is not None:
+            return self.execute_INVALID, (error,)
+        if instr.opcode in INLINE_CACHED:
+            operands.append(InlineCache(INLINE_CACHED[instr.opcode]))
+
+        return getattr(self, f"execute_{instr.opcode}"), tuple(operands)
+
+    def execute_next(self):
+        """Vykoná jednu inštrukciu a vráti jej prípadnú návratovú hodnotu"""
+        if self._code is None:
+            self.verify()
+        if self.program_counter >= len(self._code):
+            return 0
+
+        handler, operands = self._code[self.program_counter]
+        retcode = handler(*operands)
         self.program_counter += 1
         return retcode
+
+    def run(self) -> int:
+        """
+        Vykoná program od aktuálnej inštrukcie až po jeho koniec alebo EXIT
+        a vráti návratový kód. Výnimky z inštrukcií sa nezachytávajú,
+        ich preklad na návratový kód (EXCEPTMAP) rieši volajúci.
+        """
+        if self._code is None:
+            self.verify()
+        if self.profiler is not None:
+            return self._run_profiled()
+        if self.checkpoints is not None:
+            return self._run_checkpointed()
+        if self._engine == "compile" and self.tracer is None:
+            return self._run_compiled()
+
+        code = self._code
+        while True:
+            end = len(code)
+            while self.program_counter < end:
+                handler, operands = code[self.program_counter]
+                retcode = handler(*operands)
+                if retcode is not None:
+                    return retcode
+                self.program_counter += 1
+            if not self._load_more():
+                return RETCODE["OK"]
+
+    def _run_profiled(self) -> int:
+        """Vykoná program ako run() a meria čas obsluhy každej inštrukcie"""
+        profiler, code, clock = self.profiler, self._code, time.perf_counter_ns
+        counts, times, transfers = profiler.counts, profiler.times, profiler.transfers
+        elapsed = 0  # Celkový čas v obsluhách (hodiny pre čas volaní)
+        try:
+            while True:
+                end = len(code)
+                profiler.grow()
+                while self.program_counter < end:
+                    index = self.program_counter
+                    handler, operands = code[index]
+                    start = clock()
+                    try:
+                        retcode = handler(*operands)
+                    finally:
+                        duration = clock() - start
+                        counts[index] += 1
+                        times[index] += duration
+                        elapsed += duration
+                    if index in transfers:
+                        if transfers[index] == "CALL":
+                            profiler.enter(operands[0], elapsed)
+                        else:
+                            profiler.leave(elapsed)
+                    if retcode is not None:
+                        return retcode
+                    self.program_counter += 1
+                if not self._load_more():
+                    return RETCODE["OK"]
+        finally:
+            profiler.finish(elapsed)
+
+    def _run_checkpointed(self) -> int:
+        """Vykoná program ako run() a pravidelne volá kontrolné body"""
+        checkpoints, code = self.checkpoints, self._code
+        countdown = checkpoints.interval
+        while True:
+            end = len(code)
+            while self.program_counter < end:
+                handler, operands = code[self.program_counter]
+                retcode = handler(*operands)
+                if retcode is not None:
+                    return retcode
+                self.program_counter += 1
+                countdown -= 1
+                if not countdown:
+                    countdown = checkpoints.interval
+                    try:
+                        checkpoints.reached()
+                    except OSError as error:
+                        self.checkpoint_error = error
+                        raise
+            if not self._load_more():
+                return RETCODE["OK"]
+
+    def _run_compiled(self) -> int:
+        """Vykoná program preložený po základných blokoch (viď BlockCompiler)"""
+        blocks = BlockCompiler(self).compile(self.program_counter)
+        pc = self.program_counter
+        end = len(blocks)
+        while 0 <= pc < end:
+            pc = blocks[pc]()
+        if pc < 0:  # EXIT vracia ~kód
+            return ~pc
+        self.program_counter = pc
+        return RETCODE["OK"]
+
+    def execute_INVALID(self, error: Exception):
+        """Inštrukcia s chybou operandu nájdenou pri verify() (viď decode())"""
+        raise error
+
+    def execute_MOVE(self, targ, val):
+        """MOVE (var)targ (symb)val"""
+        val = share(val.get())
+        targ.set(val)
+
+    def execute_CREATEFRAME(self):
+        """CREATEFRAME"""
+        frames = self.frames
+        frame = frames["temporary"]
+        if frame is None:
+            frames["temporary"] = self.frame_pool.acquire()
+        else:
+            self.frame_pool.reset(frame)  # Pôvodný TF už nie je dostupný
+
+    def execute_PUSHFRAME(self):
+        """PUSHFRAME"""
+        frames = self.frames
+        frame = frames["temporary"]
+        if frame is None:
+            raise MemoryError("Attempt to push non-existent TF")
+        self._local_frames.append(frame)
+        frames["temporary"] = None
+
+    def execute_POPFRAME(self):
+        """POPFRAME"""
+        local_frames = self._local_frames
+        if not local_frames:
+            raise MemoryError("Attempt to pop non-existent LF")
+        frames = self.frames
+        frame = frames["temporary"]
+        frames["temporary"] = local_frames.pop()
+        if frame is not None:
+            self.frame_pool.release(frame)
+
+    def execute_DEFVAR(self, var):
+        """DEFVAR (var)var"""
+        self.get_frame(var.frame).define_variable(var.slot)
+
+    def execute_CALL(self, target):
+        """CALL (label)label"""
+        return_indices = self._return_indices
+        if len(return_indices) >= self.call_limit:
+            raise RecursionError(f"Call depth limit {self.call_limit} exceeded")
+        return_indices.append(self.program_counter + 1)
+        self.program_counter = target
+
+    def execute_RETURN(self):
+        """RETURN"""
+        return_indices = self._return_indices
+        if not return_indices:
+            raise IndexError("Empty call stack, nothing to return to")
+        self.program_counter = return_indices.pop() - 1
+
+    def execute_PUSHS(self, val):
+        """PUSHS (symb)val"""
+        self.data_stack.push(share(val.get()))
+
+    def execute_POPS(self, targ):
+        """POPS (var)targ"""
+        self._check_stacklen(1)
+        val = self.data_stack.pop()
+        targ.set(val)
+
+    def execute_CLEARS(self):
+        """CLEARS"""
+        self.data_stack.clear()
+
+    def execute_ADD(self, targ, val1, val2, cache):
+        """ADD (var)targ (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            result = cache.fast(val1, val2)
+        else:
+            result = cache.miss(val1, val2)
+        targ.set(result)
+
+    def execute_SUB(self, targ, val1, val2, cache):
+        """SUB (var)targ (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            result = cache.fast(val1, val2)
+        else:
+            result = cache.miss(val1, val2)
+        targ.set(result)
+
+    def execute_MUL(self, targ, val1, val2, cache):
+        """MUL (var)targ (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            result = cache.fast(val1, val2)
+        else:
+            result = cache.miss(val1, val2)
+        targ.set(result)
+
+    def execute_DIV(self, targ, val1, val2, cache):
+        """DIV (var)targ (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            result = cache.fast(val1, val2)
+        else:
+            result = cache.miss(val1, val2)
+        targ.set(result)
+
+    def execute_IDIV(self, targ, val1, val2, cache):
+        """IDIV (var)targ (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            result = cache.fast(val1, val2)
+        else:
+            result = cache.miss(val1, val2)
+        targ.set(result)
+
+    def execute_ADDS(self):
+        """ADDS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 + val2)
+
+    def execute_SUBS(self):
+        """SUBS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 - val2)
+
+    def execute_MULS(self):
+        """MULS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 * val2)
+
+    def execute_DIVS(self):
+        """DIVS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 / val2)
+
+    def execute_IDIVS(self):
+        """IDIVS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 // val2)
+
+    def execute_LT(self, targ, val1, val2, cache):
+        """LT (var)targ (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            result = cache.fast(val1, val2)
+        else:
+            result = cache.miss(val1, val2)
+        targ.set(result)
+
+    def execute_GT(self, targ, val1, val2, cache):
+        """GT (var)targ (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            result = cache.fast(val1, val2)
+        else:
+            result = cache.miss(val1, val2)
+        targ.set(result)
+
+    def execute_EQ(self, targ, val1, val2, cache):
+        """EQ (var)targ (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            result = cache.fast(val1, val2)
+        else:
+            result = cache.miss(val1, val2)
+        targ.set(result)
+
+    def execute_LTS(self):
+        """LTS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 < val2)
+
+    def execute_GTS(self):
+        """GTS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 > val2)
+
+    def execute_EQS(self):
+        """EQS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 == val2)
+
+    def execute_AND(self, targ, val1, val2):
+        """AND (var)targ (symb)val1 (symb)val2"""
+        result = self._check_type(val1.get(), "bool") & self._check_type(val2.get(), "bool")
+        targ.set(result)
+
+    def execute_OR(self, targ, val1, val2):
+        """OR (var)targ (symb)val1 (symb)val2"""
+        result = self._check_type(val1.get(), "bool") | self._check_type(val2.get(), "bool")
+        targ.set(result)
+
+    def execute_NOT(self, targ, val):
+        """NOT (var)targ (symb)val"""
+        result = ~self._check_type(val.get(), "bool")
+        targ.set(result)
+
+    def execute_ANDS(self):
+        """ANDS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 & val2)
+
+    def execute_ORS(self):
+        """ORS"""
+        self._check_stacklen(2)
+        val2, val1 = self.data_stack.pop(), self.data_stack.pop()
+        self.data_stack.push(val1 | val2)
+
+    def execute_NOTS(self):
+        """NOTS"""
+        self._check_stacklen(1)
+        val = self.data_stack.pop()
+        self.data_stack.push(~val)
+
+    def execute_INT2FLOAT(self, targ, val):
+        """INT2FLOAT (var)targ (symb)val"""
+        val = self._check_type(val.get(), "int").to_type("float")
+        targ.set(val)
+
+    def execute_FLOAT2INT(self, targ, val):
+        """FLOAT2INT (var)targ (symb)val"""
+        val = self._check_type(val.get(), "float").to_type("int")
+        targ.set(val)
+
+    def execute_INT2CHAR(self, targ, val):
+        """INT2CHAR (var)targ (symb)val"""
+        val = self._check_type(val.get(), "int").to_type("string")
+        targ.set(val)
+
+    def execute_STRI2INT(self, targ, val, idx):
+        """STRI2INT (var)targ (symb)val (symb)idx"""
+        idx = self._check_type(idx.get(), "int")
+        val = self._check_type(val.get(), "string").to_type("int", idx.pyv())
+        targ.set(val)
+
+    def execute_INT2FLOATS(self):
+        """INT2FLOATS"""
+        self._check_stacklen(1)
+        val = self.data_stack.pop()
+        self._check_type(val, "int")
+        val = val.to_type("float")
+        self.data_stack.push(val)
+
+    def execute_FLOAT2INTS(self):
+        """FLOAT2INTS"""
+        self._check_stacklen(1)
+        val = self.data_stack.pop()
+        self._check_type(val, "float")
+        val = val.to_type("int")
+        self.data_stack.push(val)
+
+    def execute_INT2CHARS(self):
+        """INT2CHARS"""
+        self._check_stacklen(1)
+        val = self.data_stack.pop()
+        self._check_type(val, "int")
+        val = val.to_type("string")
+        self.data_stack.push(val)
+
+    def execute_STRI2INTS(self):
+        """STRI2INTS"""
+        self._check_stacklen(2)
+        idx, val = self.data_stack.pop(), self.data_stack.pop()
+        self._check_type(val, "string")
+        self._check_type(idx, "int")
+        val = val.to_type("int", idx.pyv())
+        self.data_stack.push(val)
+
+    def execute_READ(self, targ, ttype):
+        """READ (var)targ (type)ttype"""
+        try:
+            line = self.input_cursor.readline()
+            val = NIL if line is None else Value.parse(ttype.pyv(), line)
+        except Exception:  # skipcq: PYL-W0703
+            val = NIL
+        targ.set(val)
+
+    def execute_WRITE(self, val):
+        """WRITE (symb)val"""
+        self.output.write(str(val.get()))
+
+    def execute_CONCAT(self, targ, val1, val2):
+        """CONCAT (var)targ (symb)val1 (symb)val2"""
+        value1 = self._check_type(val1.get(), "string")
+        value2 = self._check_type(val2.get(), "string")
+        content = value1.content
+        if targ is val1:
+            # Pripájanie do tej istej premennej: na mieste, ak buffer vlastní
+            if content.__class__ is StringBuffer and not content.shared:
+                content.extend(str(value2.content))
+                result = value1
+            else:
+                result = Value("string", StringBuffer(content + value2.content))
+        else:
+            result = Value("string", content + value2.content)
+        targ.set(result)
+
+    def execute_STRLEN(self, targ, val):
+        """STRLEN (var)targ (symb)val"""
+        result = Value("int", len(self._check_type(val.get(), "string").content))
+        targ.set(result)
+
+    def execute_GETCHAR(self, targ, val1, val2):
+        """GETCHAR (var)targ (symb)val1 (symb)val2"""
+        val1, val2 = self._check_type(val1.get(), "string"), self._check_type(val2.get(), "int")
+        result = val1.to_type("string", val2.pyv())
+        targ.set(result)
+
+    def execute_SETCHAR(self, targ, val1, val2):
+        """SETCHAR (var)targ (symb)val1 (symb)val2"""
+        tval = self._check_type(targ.get(), "string")
+        val1, val2 = self._check_type(val1.get(), "int"), self._check_type(val2.get(), "string")
+        tval.to_type("string", val1.pyv())  # Overí index
+        if not val2.content:
+            raise NameError("Invalid index")
+        content = tval.content
+        if content.__class__ is StringBuffer and not content.shared:
+            content.setchar(val1.content, val2.content[0])  # Na mieste
+            result = tval
+        else:
+            result = Value("string", StringBuffer(str(content)))
+            result.content.setchar(val1.content, val2.content[0])
+        targ.set(result)
+
+    def execute_TYPE(self, targ, val):
+        """TYPE (var)targ (symb)val"""
+        try:
+            result = TYPE_NAMES[val.get().type]
+        except IndexError:
+            result = TYPE_NAMES[None]
+        targ.set(result)
+
+    def execute_LABEL(self, label):
+        """LABEL (label)label"""  # Náveštie rieši XML parser
+
+    def execute_JUMP(self, target):
+        """JUMP (label)label"""
+        self.program_counter = target
+
+    def execute_JUMPIFEQ(self, target, val1, val2, cache):
+        """JUMPIFEQ (label)label (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            dojump = cache.fast(val1, val2)
+        else:
+            dojump = cache.miss(val1, val2)
+        if dojump:
+            self.program_counter = target
+
+    def execute_JUMPIFNEQ(self, target, val1, val2, cache):
+        """JUMPIFNEQ (label)label (symb)val1 (symb)val2"""
+        val1, val2 = val1.get(), val2.get()
+        if val1.type == cache.left and val2.type == cache.right:
+            dojump = not cache.fast(val1, val2)
+        else:
+            dojump = not cache.miss(val1, val2)
+        if dojump:
+            self.program_counter = target
+
+    def execute_JUMPIFEQS(self, target):
+        """JUMPIFEQS (label)label"""
+        self._check_stacklen(2)
+        dojump = self.data_stack.pop().equals(self.data_stack.pop())
+        if dojump:
+            self.program_counter = target
+
+    def execute_JUMPIFNEQS(self, target):
+        """JUMPIFNEQS (label)label"""
+        self._check_stacklen(2)
+        dojump = not self.data_stack.pop().equals(self.data_stack.pop())
+        if dojump:
+            self.program_counter = target
+
+    def execute_EXIT(self, val):
+        """EXIT (symb)val"""
+        val = self._check_type(val.get(), "int")
+        if 0 <= val.pyv() <= 49:
+            return val.content
+        raise ValueError("Invalid exit code")
+
+    # Superinštrukcie (viď Peephole), nedostupné zo zdrojového programu
+
+    def execute_CMPJUMP(self, compare, targ, val1, val2, target, expected: bool):
+        """LT/GT/EQ (var)targ (symb)val1 (symb)val2 + JUMPIF(N)EQ (label) targ bool"""
+        result = compare(val1.get(), val2.get())
+        targ.set(result)
+        if result.content == expected:
+            self.program_counter = target
+        else:
+            self.program_counter += 1
+
+    def execute_STACKSEQ(self, block):
+        """PUSHS (symb) + ... + POPS (var) alebo JUMPIF(N)EQS (label)"""
+        # Preložený úsek vráti index pokračovania, pri chybe nastaví
+        # program_counter na zlyhanú inštrukciu
+        self.program_counter = block() - 1
+
+    def execute_STEPJUMP(self, operation, targ, val1, val2, target):
+        """ADD/SUB (var)targ (symb)val1 (symb)val2 + JUMP (label)label"""
+        targ.set(operation(val1.get(), val2.get()))
+        self.program_counter = target
+
+    def execute_MEMOCALL(self, target, function, memoizer):
+        """CALL (label)label čistej funkcie s memoizáciou (viď Memoizer)"""
+        if len(self._return_indices) >= self.call_limit:
+            raise RecursionError(f"Call depth limit {self.call_limit} exceeded")
+        if not memoizer.enter(function):
+            self.execute_CALL(target)
+
+    def execute_MEMORETURN(self, memoizer):
+        """RETURN čistej funkcie, uloží výsledok memoizovaného volania"""
+        self.execute_RETURN()
+        if memoizer.pending:
+            memoizer.returned()
+
+    def execute_DPRINT(self, val):
+        """DPRINT (symb)val"""
+        val = val.get()
+        if self.output.sync:
+            self.output.flush()
+        print(str(val), file=sys.stderr, end="", flush=self.output.sync)
+
+    def execute_BREAK(self):
+        """BREAK"""
+        self.output.flush()
+        print(repr(self), file=sys.stderr)
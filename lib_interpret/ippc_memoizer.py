@@ -0,0 +1,396 @@
+"""
+Memoizácia volaní čistých funkcií (--memoize): statická analýza cieľov CALL
+a ohraničená LRU vyrovnávacia pamäť ich výsledkov.
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+from collections import OrderedDict
+from lib_interpret.ippc_utils import *
+
+# Inštrukcie s vedľajším efektom mimo rámcov a zásobníka funkcie
+IMPURE = {
+    "READ": "reads input (READ)",
+    "WRITE": "writes output (WRITE)",
+    "DPRINT": "writes to standard error (DPRINT)",
+    "BREAK": "prints the interpreter state (BREAK)",
+    "EXIT": "exits the program (EXIT)",
+    "CLEARS": "clears the caller's data stack (CLEARS)",
+}
+
+# Zásobníkové inštrukcie: (počet odobraných, počet pridaných hodnôt)
+STACK_ARITY = {
+    "PUSHS": (0, 1),
+    "POPS": (1, 0),
+    "ADDS": (2, 1),
+    "SUBS": (2, 1),
+    "MULS": (2, 1),
+    "DIVS": (2, 1),
+    "IDIVS": (2, 1),
+    "LTS": (2, 1),
+    "GTS": (2, 1),
+    "EQS": (2, 1),
+    "ANDS": (2, 1),
+    "ORS": (2, 1),
+    "NOTS": (1, 1),
+    "INT2FLOATS": (1, 1),
+    "FLOAT2INTS": (1, 1),
+    "INT2CHARS": (1, 1),
+    "STRI2INTS": (2, 1),
+    "JUMPIFEQS": (2, 0),
+    "JUMPIFNEQS": (2, 0),
+}
+
+# Najväčší počet zapamätaných volaní (všetkých funkcií spolu)
+MEMO_CAPACITY = 1 << 14
+
+# Najväčší počet opakovaní analýzy (rekurzívne funkcie)
+MAX_ROUNDS = 16
+
+
+def value_key(value):
+    """Kľúč hodnoty pre vyrovnávaciu pamäť (typ a nemenný obsah)"""
+    if value is None or value is UNDEFINED:
+        return value
+    content = value.content
+    if content.__class__ is float:
+        content = content.hex()  # Rozlíši -0.0 a nan
+    elif content.__class__ is StringBuffer:
+        content = str(content)
+    return value.type, content
+
+
+class _Rejected(Exception):
+    """Funkcia nie je čistá (dôvod v správe)"""
+
+
+class MemoFunction:
+    """
+    Cieľ inštrukcie CALL a výsledok jeho analýzy
+
+    Atribúty:
+        target (int): index náveštia funkcie
+        name (str): názov náveštia
+        reason (str): dôvod odmietnutia (None = prijatá, čistá funkcia)
+        stack_in (int): počet hodnôt zásobníka, ktoré funkcia číta (vstupy)
+        stack_out (int): počet hodnôt, ktoré na ich mieste zanechá (výstupy)
+        uses_tf (bool): dotaz, či je TF pri volaní vstupom funkcie
+        returns_tf (bool): dotaz, či po návrate existuje TF (výstup)
+        returns (list): indexy inštrukcií RETURN, ktorými sa funkcia vracia
+        calls (int): počet volaní počas behu
+        hits (int): počet volaní vybavených z vyrovnávacej pamäte
+    """
+
+    def __init__(self, target: int, name: str):
+        self.target = target
+        self.name = name
+        self.reason = None
+        self.stack_in = 0
+        self.stack_out = 0
+        self.uses_tf = False
+        self.returns_tf = False
+        self.returns: list[int] = []
+        self.calls = 0
+        self.hits = 0
+
+    def summary(self) -> tuple:
+        """Efekt volania pre volajúcu funkciu (analýza)"""
+        return self.stack_in, self.stack_out, self.uses_tf, self.returns_tf
+
+
+class Memoizer:
+    """
+    Vyhľadá čisté funkcie (ciele CALL) a ich volania nahradí volaniami
+    s memoizáciou (Interpreter.execute_MEMOCALL). Funkcia je čistá, ak na
+    všetkých cestách od náveštia po RETURN číta a zapisuje len svoje LF,
+    TF a hodnoty zásobníka nad hĺbkou svojich vstupov, nesiaha na GF ani
+    LF volajúceho, nevykonáva vstup/výstup, BREAK, EXIT ani CLEARS, vracia
+    sa s vyváženými rámcami a rovnakou hĺbkou zásobníka a volá len čisté
+    funkcie (aj seba). Vstupmi volania sú hodnoty zásobníka, ktoré funkcia
+    číta, a TF pri volaní, ak ho používa; výstupmi hodnoty zásobníka
+    a TF po návrate.
+
+    Pri prvom volaní s danými vstupmi sa funkcia vykoná a jej RETURN
+    (Interpreter.execute_MEMORETURN) výstupy uloží. Ďalšie volanie s rovnakými
+    vstupmi len nahradí vstupy na zásobníku výstupmi a nastaví TF. Volanie,
+    ktoré skončí chybou, sa neuloží, chyba sa teda zopakuje pri každom volaní.
+
+    Atribúty:
+        interpreter (Interpreter): overený interpret
+        functions (dict): analyzované funkcie podľa indexu náveštia
+        capacity (int): najväčší počet zapamätaných volaní
+        cache (OrderedDict): vstupy volania -> (výstupy, hodnoty TF), od najstaršieho
+        evictions (int): počet volaní vyradených z plnej pamäte
+        pending (list): rozpracované volania (funkcia, kľúč, dno vstupov, hĺbka)
+        applied (bool): dotaz, či sa memoizácia použila (viď Interpreter.memoize())
+    """
+
+    def __init__(self, interpreter, capacity: int = MEMO_CAPACITY):
+        self.interpreter = interpreter
+        self.functions: dict[int, MemoFunction] = {}
+        self.capacity = capacity
+        self.cache: OrderedDict = OrderedDict()
+        self.evictions = 0
+        self.pending: list[tuple] = []
+        self.applied = False
+
+    def run(self) -> dict[int, MemoFunction]:
+        """Analyzuje ciele CALL, nahradí volania čistých funkcií a vráti funkcie"""
+        interp = self.interpreter
+        instructions, labels = interp.instructions, interp.labels
+        code, invalid = interp._code, interp.execute_INVALID
+        for index, instr in enumerate(instructions):
+            if instr.opcode == "CALL" and code[index][0] != invalid:
+                name = instr.operands[0].name
+                if labels[name] not in self.functions:
+                    self.functions[labels[name]] = MemoFunction(labels[name], name)
+        self._analyze()
+
+        returns = set()
+        for function in self.functions.values():
+            if function.reason is None:
+                returns.update(function.returns)
+        for index, instr in enumerate(instructions):
+            if instr.opcode == "CALL" and code[index][0] != invalid:
+                function = self.functions[labels[instr.operands[0].name]]
+                if function.reason is None:
+                    code[index] = (
+                        interp.execute_MEMOCALL,
+                        (function.target, function, self),
+                    )
+            elif index in returns:
+                code[index] = (interp.execute_MEMORETURN, (self,))
+        self.applied = True
+        return self.functions
+
+    def enter(self, function: MemoFunction) -> bool:
+        """
+        Volanie funkcie: pri zapamätaných vstupoch vykoná jeho efekt a vráti
+        True, inak si volanie poznačí (viď returned()) a vráti False
+        """
+        interp = self.interpreter
+        items = interp.data_stack.items
+        base = len(items) - function.stack_in
+        function.calls += 1
+        if base < 0:
+            return False  # Volanie skončí podtečením zásobníka
+        key = (function.target, *map(value_key, items[base:]))
+        if function.uses_tf:
+            frame = interp.frames["temporary"]
+            key += (None if frame is None else tuple(map(value_key, frame.values)),)
+
+        entry = self.cache.get(key)
+        if entry is None:
+            self.pending.append((function, key, base, interp.call_stack.size()))
+            return False
+        self.cache.move_to_end(key)
+        function.hits += 1
+        outputs, frame_values = entry
+        del items[base:]
+        items.extend(outputs)
+        frames, pool = interp.frames, interp.frame_pool
+        frame = frames["temporary"]
+        if frame_values is None:
+            if frame is not None:
+                pool.release(frame)
+            frames["temporary"] = None
+        else:
+            if frame is None:
+                frame = frames["temporary"] = pool.acquire()
+            frame.values[:] = frame_values
+        return True
+
+    def returned(self):
+        """Po RETURN: uloží výstupy poznačeného volania, ak sa práve skončilo"""
+        interp = self.interpreter
+        function, key, base, depth = self.pending[-1]
+        if interp.call_stack.size() != depth:
+            return
+        self.pending.pop()
+        outputs = tuple(share(value) for value in interp.data_stack.items[base:])
+        frame = interp.frames["temporary"]
+        frame_values = None
+        if frame is not None:
+            frame_values = tuple(
+                share(value) if isinstance(value, Value) else value
+                for value in frame.values
+            )
+        self.cache[key] = (outputs, frame_values)
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+    def report(self) -> str:
+        """Textový prehľad prijatých a odmietnutých funkcií a úspešnosti pamäte"""
+        if not self.applied:
+            return "not applied (needs the interpret engine without -d/--profile)\n"
+        lines = []
+        calls = hits = 0
+        for function in self.functions.values():
+            if function.reason is not None:
+                lines.append(f"rejected {function.name}: {function.reason}")
+                continue
+            calls += function.calls
+            hits += function.hits
+            tf_in = ", TF" if function.uses_tf else ""
+            tf_out = ", TF" if function.returns_tf else ""
+            lines.append(
+                f"accepted {function.name} (stack {function.stack_in}{tf_in}"
+                f" -> {function.stack_out}{tf_out}): {function.calls} calls,"
+                f" {function.hits} hits ({self._rate(function.hits, function.calls)})"
+            )
+        accepted = sum(1 for f in self.functions.values() if f.reason is None)
+        lines.append(
+            f"functions: {accepted} accepted,"
+            f" {len(self.functions) - accepted} rejected"
+        )
+        lines.append(
+            f"cache: {len(self.cache)} of {self.capacity} entries,"
+            f" {self.evictions} evicted, hit rate {self._rate(hits, calls)}"
+        )
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _rate(hits: int, calls: int) -> str:
+        return f"{100 * hits / calls:.1f} %" if calls else "-"
+
+    def _analyze(self):
+        """
+        Analyzuje všetky funkcie opakovane, kým sa ich efekty menia (efekt
+        rekurzívneho volania je pred prvým návratom neznámy a cesta za ním
+        sa zatiaľ nesleduje). Odmietnutie funkcie odmietne aj volajúce.
+        """
+        summaries = {target: None for target in self.functions}
+        for _ in range(MAX_ROUNDS):
+            changed = False
+            for target, function in self.functions.items():
+                if function.reason is not None:
+                    continue
+                try:
+                    summary = self._analyze_function(function, summaries)
+                except _Rejected as rejected:
+                    function.reason = str(rejected)
+                    summaries[target] = None
+                    changed = True
+                    continue
+                if summary != summaries[target]:
+                    summaries[target] = summary
+                    changed = True
+            if not changed:
+                break
+        else:
+            for function in self.functions.values():
+                if function.reason is None:
+                    function.reason = "analysis did not converge"
+        for target, function in self.functions.items():
+            if function.reason is None and summaries[target] is None:
+                function.reason = "never returns"
+
+    def _analyze_function(self, function: MemoFunction, summaries: dict):
+        """
+        Prejde všetky cesty funkcie so stavom (hĺbka zásobníka, pôvod rámcov
+        na zásobníku rámcov, pôvod TF); pôvod je entry (TF pri volaní),
+        own (vytvorený funkciou) alebo None (TF neexistuje). Vráti efekt
+        funkcie (MemoFunction.summary()), alebo None, ak sa ešte nevracia.
+
+        Vyvolá:
+            _Rejected: funkcia nie je čistá
+        """
+        interp = self.interpreter
+        instructions, labels = interp.instructions, interp.labels
+        code, invalid = interp._code, interp.execute_INVALID
+        states = {function.target: (0, (), "entry")}
+        work = [function.target]
+        lowest, uses_tf, exit_state, returns = 0, False, None, []
+
+        while work:
+            index = work.pop()
+            depth, frames, tf = states[index]
+            instr = instructions[index]
+            opcode = instr.opcode
+            if code[index][0] == invalid:
+                continue  # Chyba operandu (viď Interpreter.decode()), cesta končí
+            if opcode in IMPURE:
+                raise _Rejected(IMPURE[opcode])
+
+            failed = False  # Inštrukcia na tejto ceste vždy skončí chybou
+            for operand in instr.operands:
+                if not isinstance(operand, UnresolvedVariable):
+                    continue
+                if operand.frame == "GF":
+                    raise _Rejected(f"accesses {operand!r}")
+                if operand.frame == "LF":
+                    if not frames:
+                        raise _Rejected(f"accesses the caller's LF ({operand!r})")
+                    uses_tf |= frames[-1] == "entry"
+                elif tf is None:
+                    failed = True
+                else:
+                    uses_tf |= tf == "entry"
+            if failed:
+                continue
+
+            successors = [index + 1]
+            if opcode in STACK_ARITY:
+                pops, pushes = STACK_ARITY[opcode]
+                lowest = min(lowest, depth - pops)
+                depth += pushes - pops
+            if opcode == "CREATEFRAME":
+                tf = "own"
+            elif opcode == "PUSHFRAME":
+                if tf is None:
+                    continue
+                uses_tf |= tf == "entry"
+                frames, tf = frames + (tf,), None
+            elif opcode == "POPFRAME":
+                if not frames:
+                    raise _Rejected("pops the caller's LF")
+                frames, tf = frames[:-1], frames[-1]
+            elif opcode == "JUMP":
+                successors = [labels[instr.operands[0].name]]
+            elif opcode.startswith("JUMPIF"):
+                successors.append(labels[instr.operands[0].name])
+            elif opcode == "RETURN":
+                if frames:
+                    raise _Rejected("returns with its own LF still pushed")
+                uses_tf |= tf == "entry"
+                state = (depth, tf is not None)
+                if exit_state not in (None, state):
+                    raise _Rejected("returns with different stack depths or TF")
+                exit_state = state
+                returns.append(index)
+                continue
+            elif opcode == "CALL":
+                callee = self.functions[labels[instr.operands[0].name]]
+                if callee.reason is not None:
+                    raise _Rejected(f"calls {callee.name}, which is not pure")
+                summary = summaries[callee.target]
+                if summary is None:
+                    continue  # Efekt zatiaľ neznámy (rekurzia)
+                stack_in, stack_out, callee_uses_tf, returns_tf = summary
+                lowest = min(lowest, depth - stack_in)
+                depth += stack_out - stack_in
+                uses_tf |= callee_uses_tf and tf == "entry"
+                tf = "own" if returns_tf else None
+
+            state = (depth, frames, tf)
+            for successor in successors:
+                if successor >= len(instructions):
+                    raise _Rejected("runs past the end of the program")
+                known = states.get(successor)
+                if known is None:
+                    states[successor] = state
+                    work.append(successor)
+                elif known != state:
+                    raise _Rejected(
+                        f"reaches {instructions[successor]} with different"
+                        " stack depths or frames"
+                    )
+
+        if exit_state is None:
+            return None
+        function.stack_in = -lowest
+        function.stack_out = exit_state[0] - lowest
+        function.uses_tf = uses_tf
+        function.returns_tf = exit_state[1]
+        function.returns = returns
+        return function.summary()
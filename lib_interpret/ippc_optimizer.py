@@ -0,0 +1,385 @@
+"""
+Optimalizácia overeného programu (-O): skladanie konštánt, šírenie kópií,
+odstránenie nedosiahnuteľného kódu a mŕtvych zápisov do pomocných
+premenných globálneho rámca.
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+from lib_interpret.ippc_utils import *
+
+# Inštrukcie, ktorých výsledok závisí len od operandov (skladajú sa)
+FOLDABLE = (
+    "ADD",
+    "SUB",
+    "MUL",
+    "DIV",
+    "IDIV",
+    "LT",
+    "GT",
+    "EQ",
+    "AND",
+    "OR",
+    "NOT",
+    "INT2FLOAT",
+    "FLOAT2INT",
+    "INT2CHAR",
+    "STRI2INT",
+    "CONCAT",
+    "STRLEN",
+    "GETCHAR",
+    "TYPE",
+)
+
+# Podmienené skoky s dvoma symbolmi a podmienka skoku
+BRANCHES = {"JUMPIFEQ": True, "JUMPIFNEQ": False}
+
+# Inštrukcie, po ktorých nasleduje nový základný blok
+BLOCK_ENDS = (
+    "JUMP",
+    "JUMPIFEQ",
+    "JUMPIFNEQ",
+    "JUMPIFEQS",
+    "JUMPIFNEQS",
+    "CALL",
+    "RETURN",
+    "EXIT",
+)
+
+# Rámcové inštrukcie a rámce, ktorých premenné po nich označujú iné hodnoty
+FRAME_CHANGES = {
+    "CREATEFRAME": ("TF",),
+    "PUSHFRAME": ("TF", "LF"),
+    "POPFRAME": ("TF", "LF"),
+}
+
+# Najväčší počet opakovaní celého postupu optimalizácií
+MAX_ROUNDS = 8
+
+
+def variable_key(var: UnresolvedVariable) -> tuple:
+    """Kľúč premennej (rámec, názov) nezávislý od objektu operandu"""
+    return var.frame, var.name
+
+
+def symbol_positions(instr: Instruction):
+    """Indexy operandov, ktoré inštrukcia len číta (symboly)"""
+    signature = INSTRUCTIONS[instr.opcode]
+    return [
+        index
+        for index, kind in enumerate(signature)
+        if kind not in ("var", "label", "type")
+    ]
+
+
+def written_variable(instr: Instruction):
+    """Premenná, do ktorej inštrukcia zapisuje (alebo ju definuje), inak None"""
+    signature = INSTRUCTIONS[instr.opcode]
+    if signature and signature[0] == "var":
+        if isinstance(instr.operands[0], UnresolvedVariable):
+            return instr.operands[0]
+    return None
+
+
+class _Result:
+    """Cieľ inštrukcie vyhodnotenej pri skladaní konštánt (zachytí výsledok)"""
+
+    frame, name = "GF", "(folded)"
+
+    def __init__(self):
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+
+class Optimizer:
+    """
+    Optimalizuje overený program (Interpreter.instructions) a program potom
+    znova dekóduje. Optimalizácie nemenia pozorovateľné správanie: výstup,
+    vstup ani návratový kód (vrátane chýb behu). Inštrukcia, ktorej
+    vyhodnotenie pri optimalizácii zlyhá (napr. delenie nulou), ostáva
+    v programe a chybu ohlási až pri behu.
+
+    Optimalizácie (vykonávajú sa opakovane, kým program mení):
+        constant-folding: inštrukcia nad konštantami -> MOVE výsledku,
+            podmienený skok nad konštantami -> JUMP alebo nič
+        copy-propagation: v rámci základného bloku nahradí čítanie premennej
+            jej známou hodnotou (konštantou alebo zdrojovou premennou MOVE)
+        unreachable-code: odstráni inštrukcie nedosiahnuteľné zo začiatku
+        dead-stores: odstráni DEFVAR a zápisy (MOVE) pomocných premenných GF,
+            ktoré sa nikde nečítajú, ak tieto inštrukcie nemôžu zlyhať;
+            program s BREAK (výpis rámcov) sa nemení
+
+    Atribúty:
+        interpreter (Interpreter): overený interpret
+        stats (dict): počet aplikovaných úprav podľa optimalizácie
+        size (tuple): počet inštrukcií programu (pred, po) optimalizácii
+    """
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.stats: dict[str, int] = {
+            "constant-folding": 0,
+            "copy-propagation": 0,
+            "unreachable-code": 0,
+            "dead-stores": 0,
+        }
+        self.size = (len(interpreter.instructions), len(interpreter.instructions))
+
+    def run(self) -> dict[str, int]:
+        """Optimalizuje program, znova ho dekóduje a vráti štatistiku"""
+        interp = self.interpreter
+        program = list(interp.instructions)
+        for _ in range(MAX_ROUNDS):
+            applied = sum(self.stats.values())
+            program = self._fold_and_propagate(program)
+            program = self._remove_unreachable(program)
+            program = self._remove_dead_stores(program)
+            if sum(self.stats.values()) == applied:
+                break
+
+        # Nové dekódovanie; premenné ostávajú naviazané na existujúce rámce
+        interp.instructions = program
+        interp.labels = self._label_index(program)
+        interp._code = []
+        interp._decode_loaded()
+        self.size = (self.size[0], len(program))
+        return self.stats
+
+    def report(self) -> str:
+        """Textový prehľad aplikovaných optimalizácií"""
+        lines = [f"{name}: {count}" for name, count in self.stats.items()]
+        lines.append(f"instructions: {self.size[0]} -> {self.size[1]}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _label_index(program: list) -> dict[str, int]:
+        return {
+            instr.operands[0].name: index
+            for index, instr in enumerate(program)
+            if instr.opcode == "LABEL"
+        }
+
+    def _evaluate(self, instr: Instruction):
+        """Výsledok inštrukcie nad konštantami alebo None (zlyhala by)"""
+        result = _Result()
+        handler, operands = self.interpreter.decode(instr)
+        if handler == self.interpreter.execute_INVALID:
+            return None
+        try:
+            handler(result, *operands[1:])
+        except Exception:  # skipcq: PYL-W0703
+            return None
+        return result.value
+
+    def _fold_and_propagate(self, program: list) -> list:
+        """Skladanie konštánt a šírenie kópií v rámci základných blokov"""
+        optimized = []
+        known: dict[tuple, object] = {}  # Premenná -> konštanta/premenná
+        for instr in program:
+            if instr.opcode == "LABEL":
+                known.clear()
+            operands = list(instr.operands)
+            signature = INSTRUCTIONS[instr.opcode]
+            for index in symbol_positions(instr):
+                operand = operands[index]
+                if not isinstance(operand, UnresolvedVariable):
+                    continue
+                if instr.opcode == "CONCAT" and operand is operands[0]:
+                    continue  # Pripájanie na mieste (viď execute_CONCAT)
+                value = known.get(variable_key(operand))
+                if value is None:
+                    continue
+                if isinstance(value, Value) and signature[index] not in (
+                    "symb",
+                    value.type,
+                ):
+                    continue  # Chyba typu má nastať až pri behu
+                operands[index] = value
+                self.stats["copy-propagation"] += 1
+            instr = instr.rebuilt(operands)
+
+            positions = symbol_positions(instr)
+            constant = all(isinstance(operands[i], Value) for i in positions)
+            if constant and instr.opcode in FOLDABLE:
+                result = self._evaluate(instr)
+                if result is not None:
+                    instr = Instruction("MOVE", [operands[0], result])
+                    self.stats["constant-folding"] += 1
+            elif (
+                constant
+                and instr.opcode in BRANCHES
+                and isinstance(operands[0], LabelArg)
+            ):
+                try:
+                    equal = operands[1].equals(operands[2])
+                except Exception:  # skipcq: PYL-W0703
+                    equal = None
+                if equal is not None:
+                    self.stats["constant-folding"] += 1
+                    if equal != BRANCHES[instr.opcode]:
+                        continue  # Skok sa nikdy nevykoná
+                    instr = Instruction("JUMP", [operands[0]])
+
+            self._update_known(known, instr)
+            optimized.append(instr)
+            if instr.opcode in BLOCK_ENDS:
+                known.clear()
+        return optimized
+
+    @staticmethod
+    def _update_known(known: dict, instr: Instruction):
+        """Zabudne hodnoty prepísané inštrukciou, zapamätá si hodnotu MOVE"""
+        frames = FRAME_CHANGES.get(instr.opcode)
+        if frames is not None:
+            for key, value in list(known.items()):
+                if key[0] in frames or (
+                    isinstance(value, UnresolvedVariable) and value.frame in frames
+                ):
+                    del known[key]
+            return
+
+        target = written_variable(instr)
+        if target is None:
+            return
+        key = variable_key(target)
+        known.pop(key, None)
+        for other, value in list(known.items()):
+            if isinstance(value, UnresolvedVariable) and variable_key(value) == key:
+                del known[other]
+        if instr.opcode == "MOVE":
+            source = instr.operands[1]
+            if isinstance(source, Value) or variable_key(source) != key:
+                known[key] = source
+
+    @staticmethod
+    def _successors(program: list, labels: dict, index: int, returns=()):
+        """Nasledovníci inštrukcie (RETURN pokračuje na returns)"""
+        instr = program[index]
+        opcode = instr.opcode
+        if opcode == "RETURN":
+            return returns
+        if opcode == "EXIT":
+            return ()
+        following = (index + 1,) if index + 1 < len(program) else ()
+        if opcode in ("JUMP", "CALL", *BRANCHES, "JUMPIFEQS", "JUMPIFNEQS"):
+            if not isinstance(instr.operands[0], LabelArg):
+                return ()  # Inštrukcia vždy skončí chybou operandu
+        if opcode == "JUMP":
+            return (labels[instr.operands[0].name],)
+        if opcode in ("CALL", *BRANCHES, "JUMPIFEQS", "JUMPIFNEQS"):
+            return (labels[instr.operands[0].name], *following)
+        return following
+
+    def _remove_unreachable(self, program: list) -> list:
+        """Odstráni inštrukcie nedosiahnuteľné zo začiatku programu"""
+        if not program:
+            return program
+        labels = self._label_index(program)
+        reachable = {0}
+        pending = [0]
+        while pending:
+            for successor in self._successors(program, labels, pending.pop()):
+                if successor not in reachable:
+                    reachable.add(successor)
+                    pending.append(successor)
+        self.stats["unreachable-code"] += len(program) - len(reachable)
+        return [instr for index, instr in enumerate(program) if index in reachable]
+
+    def _flow(self, program: list, transfer, meet, returns=()) -> list:
+        """
+        Dopredná analýza toku dát nad inštrukciami programu, vráti stav
+        pred každou inštrukciou (None = nedosiahnuteľná)
+        """
+        labels = self._label_index(program)
+        states = [None] * len(program)
+        if not program:
+            return states
+        states[0] = frozenset()
+        pending = [0]
+        while pending:
+            index = pending.pop()
+            state = transfer(program[index], states[index])
+            for successor in self._successors(program, labels, index, returns):
+                previous = states[successor]
+                merged = state if previous is None else meet(previous, state)
+                if merged != previous:
+                    states[successor] = merged
+                    pending.append(successor)
+        return states
+
+    def _remove_dead_stores(self, program: list) -> list:
+        """Odstráni zápisy a definície nikde nečítaných premenných GF"""
+        while True:
+            dead = self._dead_stores(program)
+            if not dead:
+                return program
+            self.stats["dead-stores"] += len(dead)
+            program = [instr for i, instr in enumerate(program) if i not in dead]
+
+    def _dead_stores(self, program: list) -> set:
+        """Indexy inštrukcií, ktorých odstránenie nie je pozorovateľné"""
+        if any(instr.opcode == "BREAK" for instr in program):
+            return set()
+
+        read, written = set(), {}
+        for index, instr in enumerate(program):
+            for position in symbol_positions(instr):
+                if isinstance(instr.operands[position], UnresolvedVariable):
+                    read.add(variable_key(instr.operands[position]))
+            target = written_variable(instr)
+            if target is None:
+                continue
+            if instr.opcode == "SETCHAR":
+                read.add(variable_key(target))  # Mení časť pôvodnej hodnoty
+            written.setdefault(variable_key(target), []).append(index)
+        candidates = {
+            key: indices
+            for key, indices in written.items()
+            if key[0] == "GF" and key not in read
+        }
+        if not candidates:
+            return set()
+
+        def defined(instr, state):
+            """Premenné GF definované (a inicializované: ("init", kľúč))"""
+            target = written_variable(instr)
+            if target is None or target.frame != "GF":
+                return state
+            key = variable_key(target)
+            if instr.opcode == "DEFVAR":
+                return (state - {("init", key)}) | {key}
+            return state | {key, ("init", key)}
+
+        def maybe_defined(instr, state):
+            if instr.opcode == "DEFVAR" and instr.operands[0].frame == "GF":
+                return state | {variable_key(instr.operands[0])}
+            return state
+
+        returns = tuple(
+            index + 1 for index, instr in enumerate(program) if instr.opcode == "CALL"
+        )
+        must = self._flow(program, defined, frozenset.intersection)
+        may = self._flow(program, maybe_defined, frozenset.union, returns)
+
+        dead = set()
+        for key, indices in candidates.items():
+            if all(
+                self._store_is_silent(program[i], must[i], may[i], key) for i in indices
+            ):
+                dead.update(indices)
+        return dead
+
+    @staticmethod
+    def _store_is_silent(instr: Instruction, must, may, key: tuple) -> bool:
+        """Dotaz, či zápis/definícia premennej key nemôže zlyhať"""
+        if must is None or may is None:
+            return False
+        if instr.opcode == "DEFVAR":
+            return key not in may  # Redefinícia by bola chybou
+        if instr.opcode != "MOVE" or key not in must:
+            return False
+        source = instr.operands[1]
+        if isinstance(source, Value):
+            return True
+        return source.frame == "GF" and ("init", variable_key(source)) in must
@@ -0,0 +1,184 @@
+"""
+Peephole optimalizácia dekódovaného programu (--peephole): spájanie častých
+postupností inštrukcií do vnútorných superinštrukcií.
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+from lib_interpret.ippc_utils import *
+from lib_interpret.ippc_compiler import BlockCompiler
+
+# Relačné inštrukcie a im zodpovedajúca operácia nad hodnotami
+COMPARISONS = {"LT": Value.__lt__, "GT": Value.__gt__, "EQ": Value.__eq__}
+
+# Zásobníkové inštrukcie a ich zmena hĺbky zásobníka
+STACK_EFFECTS = {
+    "PUSHS": 1,
+    "POPS": -1,
+    "ADDS": -1,
+    "SUBS": -1,
+    "MULS": -1,
+    "DIVS": -1,
+    "IDIVS": -1,
+    "LTS": -1,
+    "GTS": -1,
+    "EQS": -1,
+    "ANDS": -1,
+    "ORS": -1,
+    "NOTS": 0,
+    "INT2FLOATS": 0,
+    "FLOAT2INTS": 0,
+    "INT2CHARS": 0,
+    "STRI2INTS": -1,
+    "JUMPIFEQS": -2,
+    "JUMPIFNEQS": -2,
+}
+
+# Aritmetika, ktorú je možné spojiť s nasledujúcim skokom
+LOOP_STEPS = {"ADD": Value.__add__, "SUB": Value.__sub__}
+
+
+def same_variable(var1, var2) -> bool:
+    """Dotaz, či dva operandy označujú tú istú premennú"""
+    return (
+        isinstance(var1, UnresolvedVariable)
+        and isinstance(var2, UnresolvedVariable)
+        and var1.frame == var2.frame
+        and var1.name == var2.name
+    )
+
+
+class Peephole:
+    """
+    Nahrádza v dekódovanom programe (Interpreter._code) známe postupnosti
+    inštrukcií superinštrukciou. Superinštrukcia sa dekóduje na mieste prvej
+    inštrukcie postupnosti, vykoná celú postupnosť (vrátane zápisov do
+    pomocných premenných) a pokračuje za ňou. Ostatné inštrukcie postupnosti
+    ostávajú v programe nezmenené, indexy inštrukcií a náveští sa teda
+    nemenia a chyba sa hlási na tej inštrukcii postupnosti, ktorá zlyhala.
+
+    Superinštrukcie:
+        compare-and-branch: LT/GT/EQ t a b + JUMPIFEQ/JUMPIFNEQ l t bool@x
+        stack-to-register: postupnosť zásobníkových inštrukcií od PUSHS, ktorá
+            zásobník vráti do pôvodného stavu (POPS alebo JUMPIFEQS/JUMPIFNEQS)
+            a nesiaha pod jeho pôvodný vrchol, napr. PUSHS a + PUSHS b +
+            ADDS + POPS x; preloží sa (BlockCompiler) na prácu s lokálnymi
+            premennými bez dátového zásobníka
+        increment-and-loop: ADD/SUB x a b + JUMP l
+
+    Atribúty:
+        interpreter (Interpreter): overený interpret
+        stats (dict): počet aplikovaných spojení podľa druhu superinštrukcie
+    """
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.stats: dict[str, int] = {
+            "compare-and-branch": 0,
+            "stack-to-register": 0,
+            "increment-and-loop": 0,
+        }
+
+    def run(self) -> dict[str, int]:
+        """Aplikuje spojenia na celý program a vráti štatistiku"""
+        interp = self.interpreter
+        instructions, code = interp.instructions, interp._code
+        sequences = []
+        index = 0
+        while index < len(instructions):
+            window = instructions[index : index + 4]
+            length = self._stack_sequence(index)
+            if length and self._decoded(index, index + length):
+                sequences.append((index, index + length))
+                self.stats["stack-to-register"] += 1
+                index += length
+                continue
+            fused = (
+                self._compare_and_branch(index, window)
+                or self._increment_and_loop(index, window)
+            )
+            if fused is None or not self._decoded(index, index + fused[1]):
+                index += 1
+                continue
+            kind, length, handler, operands = fused
+            code[index] = (handler, operands)
+            self.stats[kind] += 1
+            index += length
+
+        if sequences:
+            blocks = BlockCompiler(interp).compile_ranges(sequences)
+            for start, _ in sequences:
+                code[start] = (interp.execute_STACKSEQ, (blocks[start],))
+        return self.stats
+
+    def report(self) -> str:
+        """Textový prehľad aplikovaných spojení"""
+        lines = [f"{kind}: {count}" for kind, count in self.stats.items()]
+        lines.append(f"total: {sum(self.stats.values())}")
+        return "\n".join(lines) + "\n"
+
+    def _decoded(self, start: int, stop: int) -> bool:
+        """Dotaz, či žiadna inštrukcia úseku nemá chybu operandu (viď decode())"""
+        invalid = self.interpreter.execute_INVALID
+        return all(
+            handler != invalid for handler, _ in self.interpreter._code[start:stop]
+        )
+
+    def _jump_target(self, index: int) -> int:
+        """Index cieľa skokovej inštrukcie (prepojený pri verify())"""
+        return self.interpreter._code[index][1][0]
+
+    def _compare_and_branch(self, index: int, window):
+        if len(window) < 2:
+            return None
+        compare, branch = window[0], window[1]
+        if compare.opcode not in COMPARISONS or branch.opcode not in (
+            "JUMPIFEQ",
+            "JUMPIFNEQ",
+        ):
+            return None
+
+        targ = compare.operands[0]
+        _, val1, val2 = branch.operands
+        if same_variable(targ, val1) and isinstance(val2, Value):
+            const = val2
+        elif same_variable(targ, val2) and isinstance(val1, Value):
+            const = val1
+        else:
+            return None
+        if const.type != "bool":
+            return None
+
+        expected = const.content if branch.opcode == "JUMPIFEQ" else not const.content
+        target = self._jump_target(index + 1)
+        operands = (COMPARISONS[compare.opcode], *compare.operands, target, expected)
+        return "compare-and-branch", 2, self.interpreter.execute_CMPJUMP, operands
+
+    def _stack_sequence(self, index: int) -> int:
+        """Dĺžka postupnosti stack-to-register začínajúcej na index (inak 0)"""
+        instructions = self.interpreter.instructions
+        if instructions[index].opcode != "PUSHS":
+            return 0
+        depth = 0
+        for end in range(index, len(instructions)):
+            effect = STACK_EFFECTS.get(instructions[end].opcode)
+            if effect is None:
+                return 0  # Náveštie, BREAK, CLEARS, iná inštrukcia
+            depth += effect
+            if depth < 0:
+                return 0
+            if depth == 0:
+                return end - index + 1
+            if effect == -2:
+                return 0  # Podmienený skok by nechal hodnoty na zásobníku
+        return 0
+
+    def _increment_and_loop(self, index: int, window):
+        if len(window) < 2:
+            return None
+        step, jump = window[0], window[1]
+        if step.opcode not in LOOP_STEPS or jump.opcode != "JUMP":
+            return None
+
+        target = self._jump_target(index + 1)
+        operands = (LOOP_STEPS[step.opcode], *step.operands, target)
+        return "increment-and-loop", 2, self.interpreter.execute_STEPJUMP, operands
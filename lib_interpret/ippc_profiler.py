@@ -0,0 +1,238 @@
+"""
+Deterministický profiler behu programu (--profile): počty a čas vykonania
+podľa inštrukcií, operačných kódov, úsekov medzi náveštiami a volaní (CALL).
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import json
+from lib_interpret.ippc_utils import *
+
+# Názov úseku programu pred prvým náveštím
+ENTRY_REGION = "(entry)"
+
+
+class Profiler:
+    """
+    Zbiera počty vykonaní a čas (ns) strávený v obsluhe každej inštrukcie.
+    Čas sa meria len okolo obsluhy (Interpreter._run_profiled()), réžia
+    smyčky interpreta sa doň nezapočítava. Súhrny podľa operačného kódu
+    a úsekov medzi náveštiami sa počítajú až pri výstupe.
+
+    Čas volaní (CALL) sa počíta z času inštrukcií: inkluzívny zahŕňa všetky
+    inštrukcie vykonané od vstupu (CALL) po návrat (RETURN), exkluzívny
+    odpočíta vnorené volania. Pri rekurzii sa inkluzívny čas započíta len
+    najvonkajšiemu volaniu. Volania neukončené pred koncom programu
+    (EXIT) sa uzavrú pri finish().
+
+    Úspešnosť inline cache (InlineCache) aritmetických a relačných
+    inštrukcií sa počíta z počtu vykonaní inštrukcie a počtu nesplnených
+    podmienok cache, beh bez profilera teda zásahy do cache nepočíta.
+
+    Atribúty:
+        interpreter (Interpreter): profilovaný interpret
+        counts (list): počet vykonaní podľa indexu inštrukcie
+        times (list): čas v obsluhe (ns) podľa indexu inštrukcie
+        transfers (dict): index inštrukcie CALL/RETURN -> jej operačný kód
+        calls (dict): štatistika volaní podľa indexu cieľa
+    """
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.counts: list[int] = []
+        self.times: list[int] = []
+        self.transfers: dict[int, str] = {}
+        self.calls: dict[int, list[int]] = {}
+        self._stack: list[list[int]] = []
+        self._active: dict[int, int] = {}
+
+    def grow(self):
+        """Rozšíri tabuľky o novo dekódované inštrukcie (pipelined)"""
+        instructions = self.interpreter.instructions
+        start = len(self.counts)
+        end = len(self.interpreter._code)
+        self.counts.extend([0] * (end - start))
+        self.times.extend([0] * (end - start))
+        for index in range(start, end):
+            if instructions[index].opcode in ("CALL", "RETURN"):
+                self.transfers[index] = instructions[index].opcode
+
+    def enter(self, target: int, clock: int):
+        """Vstup do volania s cieľom target (clock = doterajší čas inštrukcií)"""
+        self._stack.append([target, clock, 0])
+        self._active[target] = self._active.get(target, 0) + 1
+
+    def leave(self, clock: int):
+        """Návrat z posledného volania"""
+        if not self._stack:
+            return
+        target, start, children = self._stack.pop()
+        inclusive = clock - start
+        self._active[target] -= 1
+        stats = self.calls.setdefault(target, [0, 0, 0])
+        stats[0] += 1
+        if not self._active[target]:
+            stats[1] += inclusive
+        stats[2] += inclusive - children
+        if self._stack:
+            self._stack[-1][2] += inclusive
+
+    def finish(self, clock: int):
+        """Uzavrie neukončené volania (koniec programu alebo chyba)"""
+        while self._stack:
+            self.leave(clock)
+
+    def _opcode(self, index: int) -> str:
+        """Operačný kód vykonanej obsluhy (aj superinštrukcie, viď Peephole)"""
+        return self.interpreter._code[index][0].__name__[len("execute_") :]
+
+    def _inline_caches(self) -> list[dict]:
+        """Úspešnosť inline cache podľa vykonanej inštrukcie"""
+        caches = []
+        for index, count in enumerate(self.counts):
+            operands = self.interpreter._code[index][1]
+            if not count or not operands or not isinstance(operands[-1], InlineCache):
+                continue
+            cache = operands[-1]
+            caches.append(
+                {
+                    "index": index,
+                    "opcode": self._opcode(index),
+                    "types": repr(cache),
+                    "count": count,
+                    "misses": cache.misses,
+                    "hit_rate": (count - cache.misses) / count,
+                }
+            )
+        return caches
+
+    def _label_names(self) -> dict[int, str]:
+        return {index: name for name, index in self.interpreter.labels.items()}
+
+    def results(self) -> dict:
+        """Výsledky profilovania ako slovník (podklad pre JSON)"""
+        label_names = self._label_names()
+        instructions, opcodes, regions = [], {}, {}
+        region = {"start": 0, "count": 0, "time_ns": 0}
+        regions[ENTRY_REGION] = region
+        for index, (count, elapsed) in enumerate(zip(self.counts, self.times)):
+            if index in label_names:
+                region = {"start": index, "count": 0, "time_ns": 0}
+                regions[label_names[index]] = region
+            region["count"] += count
+            region["time_ns"] += elapsed
+            if not count:
+                continue
+            opcode = self._opcode(index)
+            instructions.append(
+                {"index": index, "opcode": opcode, "count": count, "time_ns": elapsed}
+            )
+            stats = opcodes.setdefault(opcode, {"count": 0, "time_ns": 0})
+            stats["count"] += count
+            stats["time_ns"] += elapsed
+        if not regions[ENTRY_REGION]["count"]:
+            del regions[ENTRY_REGION]
+
+        calls = {
+            label_names.get(target, str(target)): {
+                "target": target,
+                "calls": count,
+                "inclusive_ns": inclusive,
+                "exclusive_ns": exclusive,
+            }
+            for target, (count, inclusive, exclusive) in self.calls.items()
+        }
+        caches = self._inline_caches()
+        lookups = sum(cache["count"] for cache in caches)
+        misses = sum(cache["misses"] for cache in caches)
+        return {
+            "instructions_executed": sum(self.counts),
+            "time_ns": sum(self.times),
+            "opcodes": opcodes,
+            "instructions": instructions,
+            "regions": regions,
+            "calls": calls,
+            "inline_cache_hit_rate": (lookups - misses) / lookups if lookups else None,
+            "inline_caches": caches,
+        }
+
+    def to_json(self) -> str:
+        """Výsledky profilovania vo formáte JSON"""
+        return json.dumps(self.results(), indent=2) + "\n"
+
+    def summary(self, limit: int = 20) -> str:
+        """Textový prehľad zoradený podľa času (najviac limit riadkov na tabuľku)"""
+        results = self.results()
+        total = results["time_ns"] or 1
+
+        def table(title: str, rows: list, header: str):
+            lines.append(f"{title}:")
+            lines.append(header)
+            for row in rows[:limit]:
+                lines.append(row)
+            lines.append("")
+
+        def by_time(item):
+            return -item[1]["time_ns"]
+
+        def share(elapsed: int) -> str:
+            return f"{elapsed / 1e6:12.3f} {100 * elapsed / total:6.1f}%"
+
+        lines = [
+            f"instructions executed: {results['instructions_executed']}",
+            f"time in handlers: {results['time_ns'] / 1e6:.3f} ms",
+        ]
+        if results["inline_cache_hit_rate"] is not None:
+            lines.append(
+                f"inline cache hit rate: {100 * results['inline_cache_hit_rate']:.1f}%"
+            )
+        lines.append("")
+        table(
+            "opcodes",
+            [
+                f"  {opcode:<12} {stats['count']:>12} {share(stats['time_ns'])}"
+                for opcode, stats in sorted(results["opcodes"].items(), key=by_time)
+            ],
+            f"  {'opcode':<12} {'count':>12} {'ms':>12} {'share':>7}",
+        )
+        table(
+            "instructions",
+            [
+                f"  {row['index']:>6} {row['opcode']:<12} {row['count']:>12}"
+                f" {share(row['time_ns'])}"
+                for row in sorted(results["instructions"], key=lambda r: -r["time_ns"])
+            ],
+            f"  {'index':>6} {'opcode':<12} {'count':>12} {'ms':>12} {'share':>7}",
+        )
+        table(
+            "regions",
+            [
+                f"  {name:<20} {stats['count']:>12} {share(stats['time_ns'])}"
+                for name, stats in sorted(results["regions"].items(), key=by_time)
+            ],
+            f"  {'label':<20} {'count':>12} {'ms':>12} {'share':>7}",
+        )
+        table(
+            "calls",
+            [
+                f"  {name:<20} {stats['calls']:>8} {share(stats['inclusive_ns'])}"
+                f" {share(stats['exclusive_ns'])}"
+                for name, stats in sorted(
+                    results["calls"].items(), key=lambda item: -item[1]["inclusive_ns"]
+                )
+            ],
+            f"  {'target':<20} {'calls':>8} {'incl. ms':>12} {'share':>7}"
+            f" {'excl. ms':>12} {'share':>7}",
+        )
+        table(
+            "inline caches",
+            [
+                f"  {row['index']:>6} {row['opcode']:<12} {row['types']:<15}"
+                f" {row['count']:>12} {row['misses']:>8} {100 * row['hit_rate']:6.1f}%"
+                for row in sorted(
+                    results["inline_caches"], key=lambda r: (r["hit_rate"], -r["count"])
+                )
+            ],
+            f"  {'index':>6} {'opcode':<12} {'types':<15} {'count':>12}"
+            f" {'misses':>8} {'hit %':>7}",
+        )
+        return "\n".join(lines)
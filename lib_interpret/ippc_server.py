@@ -0,0 +1,182 @@
+"""
+Server interprétu na lokálnom sokete (--serve): každá úloha beží v potomkovi
+vytvorenom cez fork() z procesu s už načítanými modulmi.
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import gc
+import json
+import os
+import select
+import signal
+import socket
+import stat
+import sys
+import traceback
+from lib_interpret.ippc_utils import RETCODE
+
+"""
+Protokol (jedno spojenie = jedna úloha):
+    klient -> server: JSON riadok {"argv": [...], "cwd": "..."} a spolu
+        s ním (SCM_RIGHTS) deskriptory svojho stdin, stdout a stderr
+    server -> klient: po skončení potomka JSON riadok
+        {"returncode": kód, "signal": číslo signálu alebo null}
+Potomok zapisuje výstup priamo do deskriptorov klienta, výstup teda
+prúdi klientovi priebežne a nie je ho nutné preposielať.
+"""
+
+# Najväčšia veľkosť požiadavky (JSON riadok)
+REQUEST_LIMIT = 1 << 20
+
+# Počet čakajúcich spojení
+BACKLOG = 64
+
+
+def send_response(conn: socket.socket, status: int):
+    """Odošle klientovi výsledok potomka (status z os.waitpid())"""
+    if os.WIFSIGNALED(status):
+        response = {"returncode": RETCODE["EINT"], "signal": os.WTERMSIG(status)}
+    else:
+        response = {"returncode": os.waitstatus_to_exitcode(status), "signal": None}
+    try:
+        conn.sendall(json.dumps(response).encode() + b"\n")
+    except OSError:
+        pass  # Klient už spojenie ukončil
+    conn.close()
+
+
+def receive_request(conn: socket.socket):
+    """Prijme požiadavku, vráti (slovník požiadavky, deskriptory)"""
+    data, fds = b"", []
+    while not data.endswith(b"\n"):
+        chunk, new_fds, _, _ = socket.recv_fds(conn, REQUEST_LIMIT, 3)
+        fds.extend(new_fds)
+        if not chunk or len(data) + len(chunk) > REQUEST_LIMIT:
+            raise ValueError("Incomplete request")
+        data += chunk
+    if len(fds) != 3:
+        raise ValueError("Request must carry stdin, stdout and stderr")
+    return json.loads(data), fds
+
+
+class Server:
+    """
+    Dlhodobo bežiaci server úloh interprétu. Rodič len prijíma spojenia,
+    pre každé vytvorí potomka (fork) a po jeho skončení pošle klientovi
+    návratový kód; chyba alebo pád jednej úlohy (aj signálom, napr. pri
+    prekročení limitu) teda ostatné úlohy ani server neovplyvní.
+
+    Atribúty:
+        path (str): cesta k Unix soketu
+        run (callable): vstupný bod úlohy (interpret.main), končí sys.exit()
+        script (str): cesta k interpret.py (sys.argv[0] potomka)
+    """
+
+    def __init__(self, path: str, run, script: str):
+        self.path = path
+        self.run = run
+        self.script = script
+        self._children: dict[int, socket.socket] = {}
+
+    def serve(self):
+        """Obsluhuje spojenia až do prerušenia (SIGINT/SIGTERM)"""
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            os.unlink(self.path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)  # Úlohy smie posielať len vlastník servera
+        try:
+            listener.bind(self.path)
+        finally:
+            os.umask(umask)
+        listener.listen(BACKLOG)
+
+        # Skončenie potomka prebudí select() cez zápis do rúry
+        wakeup_read, wakeup_write = os.pipe()
+        os.set_blocking(wakeup_write, False)
+        signal.set_wakeup_fd(wakeup_write)
+        signal.signal(signal.SIGCHLD, lambda *_: None)
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+        # Objekty servera sa v potomkoch už nemenia (zdieľané stránky pri fork)
+        gc.collect()
+        gc.freeze()
+        try:
+            while True:
+                readable, _, _ = select.select([listener, wakeup_read], [], [])
+                if wakeup_read in readable:
+                    os.read(wakeup_read, 512)
+                    self._reap()
+                if listener in readable:
+                    conn, _ = listener.accept()
+                    self._spawn(listener, conn, (wakeup_read, wakeup_write))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.set_wakeup_fd(-1)
+            listener.close()
+            os.unlink(self.path)
+
+    def _reap(self):
+        """Pošle výsledok každého skončeného potomka jeho klientovi"""
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            conn = self._children.pop(pid, None)
+            if conn is not None:
+                send_response(conn, status)
+
+    def _spawn(self, listener: socket.socket, conn: socket.socket, pipe: tuple):
+        pid = os.fork()
+        if pid:
+            self._children[pid] = conn
+            return
+
+        # Potomok: obnoví štandardné správanie signálov a vykoná úlohu
+        code = RETCODE["EINT"]
+        try:
+            signal.set_wakeup_fd(-1)
+            for signum in (signal.SIGCHLD, signal.SIGTERM):
+                signal.signal(signum, signal.SIG_DFL)
+            listener.close()
+            for fd in pipe:
+                os.close(fd)
+            for other in self._children.values():
+                other.close()
+            code = self._run_job(conn)
+        except BaseException:  # skipcq: PYL-W0703
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+
+    def _run_job(self, conn: socket.socket) -> int:
+        """Presmeruje štandardné prúdy na klienta a spustí úlohu"""
+        request, fds = receive_request(conn)
+        conn.close()
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.chdir(request["cwd"])
+        if any(arg.startswith("--serve") for arg in request["argv"]):
+            print("ERR! code EPARAM", file=sys.stderr)
+            print("ERR! --serve cannot be sent to a server", file=sys.stderr)
+            return RETCODE["EPARAM"]
+        sys.argv = [self.script, *request["argv"]]
+
+        try:
+            self.run()
+            code = RETCODE["OK"]
+        except SystemExit as exit_request:
+            code = exit_request.code if isinstance(exit_request.code, int) else 0
+        finally:
+            for stream in (sys.stdout, sys.stderr):
+                try:
+                    stream.flush()
+                except OSError:
+                    pass
+        return code
@@ -0,0 +1,261 @@
+"""
+Kontrolné body behu programu (--checkpoint-every, --resume): binárny formát
+stavu interprétu, jeho atomický zápis a obnovenie.
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import hashlib
+import os
+import struct
+import tempfile
+import time
+import zlib
+from lib_interpret.ippc_utils import *
+from lib_interpret.ippc_bytecode import constant_text, constant_type, constant_value
+
+"""
+Formát súboru (little endian):
+    hlavička (HEADER): magické číslo, verzia formátu, odtlačok vykonávaného
+        programu, CRC-32 zvyšku súboru, program_counter, počet prečítaných
+        riadkov vstupu, počet zapísaných znakov výstupu, pozícia v súbore
+        výstupu (-1 = nie je bežný súbor), príznak existencie TF a počty
+        LF, návratových adries a hodnôt dátového zásobníka
+    rámce: GF, TF (ak existuje) a LF od dna zásobníka rámcov, každý ako
+        počet definovaných premenných (COUNT) a pre každú názov a hodnotu
+    zásobník volaní: návratové indexy (RETURN_INDEX) od dna
+    dátový zásobník: hodnoty od dna
+Reťazec (názov, obsah hodnoty) je dĺžka (COUNT) a UTF-8 bajty, hodnota je
+číslo typu (TYPE, viď constant_type()) a reťazec s kanonickým tvarom obsahu,
+neinicializovaná premenná má len číslo typu UNINITIALISED. Zapisuje sa len
+živý stav, veľkosť súboru teda nezávisí od veľkosti programu.
+"""
+
+MAGIC = b"IPPC23CK"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sH32sIqqqq?III")
+COUNT = struct.Struct("<I")
+TYPE = struct.Struct("<B")
+RETURN_INDEX = struct.Struct("<q")
+
+# Číslo typu definovanej, ale neinicializovanej premennej
+UNINITIALISED = 0xFF
+
+# Počet inštrukcií medzi kontrolami času (kontrolné body v sekundách)
+CLOCK_STRIDE = 1 << 12
+
+
+def program_digest(instructions: list, labels: dict) -> bytes:
+    """Odtlačok vykonávaného programu (po prípadnej optimalizácii)"""
+    digest = hashlib.sha256()
+    for instr in instructions:
+        digest.update(repr(instr).encode("utf-8", "surrogatepass") + b"\n")
+    for name, index in labels.items():
+        digest.update(f"{name}={index}\n".encode("utf-8", "surrogatepass"))
+    return digest.digest()
+
+
+def dump_state(interpreter, digest: bytes) -> bytes:
+    """Zapíše stav interprétu medzi dvoma inštrukciami do binárneho formátu"""
+    body = bytearray()
+
+    def string(text: str):
+        data = text.encode("utf-8", "surrogatepass")
+        body.extend(COUNT.pack(len(data)))
+        body.extend(data)
+
+    def value(val):
+        if val is None:
+            body.extend(TYPE.pack(UNINITIALISED))
+            return
+        body.extend(TYPE.pack(constant_type(val)))
+        string(constant_text(val))
+
+    def frame(frm: Frame, slots: dict):
+        defined = [
+            (name, val)
+            for name, val in zip(slots, frm.values)
+            if val is not UNDEFINED
+        ]
+        body.extend(COUNT.pack(len(defined)))
+        for name, val in defined:
+            string(name)
+            value(val)
+
+    temporary = interpreter.frames["temporary"]
+    local_frames = interpreter.frame_stack.items
+    frame(interpreter.frames["global"], interpreter._global_slots)
+    for frm in ([temporary] if temporary is not None else []) + local_frames:
+        frame(frm, interpreter._local_slots)
+    for index in interpreter.call_stack.items:
+        body.extend(RETURN_INDEX.pack(index))
+    for val in interpreter.data_stack.items:
+        value(val)
+
+    output = interpreter.output
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        digest,
+        zlib.crc32(body),
+        interpreter.program_counter,
+        interpreter.input_cursor.lines_read,
+        output.offset,
+        output.position(),
+        temporary is not None,
+        len(local_frames),
+        interpreter.call_stack.size(),
+        interpreter.data_stack.size(),
+    )
+    return header + body
+
+
+def load_state(interpreter, buffer, digest: bytes):
+    """
+    Obnoví stav overeného interprétu z binárneho formátu: rámce, zásobníky,
+    program_counter, pozíciu vo vstupe (preskočí prečítané riadky) a výstupe
+
+    Vyvolá:
+        LookupError: súbor je z inej verzie formátu alebo iného programu
+        ValueError: súbor je poškodený
+    """
+    with memoryview(buffer) as view:
+        try:
+            magic, version, stored_digest, crc, *fields = HEADER.unpack_from(view)
+        except struct.error as error:
+            raise ValueError("Truncated header") from error
+        if magic != MAGIC:
+            raise ValueError("Not a snapshot")
+        if version != FORMAT_VERSION:
+            raise LookupError("Snapshot is from another format version")
+        if stored_digest != digest:
+            raise LookupError("Snapshot belongs to a different program")
+        if zlib.crc32(view[HEADER.size :]) != crc:
+            raise ValueError("Checksum mismatch")
+        state = _read_state(interpreter, view, fields)
+
+    pc, lines, offset, position, frames, tf, calls, stack = state
+    if not 0 <= pc <= len(interpreter.instructions):
+        raise ValueError(f"Invalid program counter {pc}")
+
+    # Pole hodnôt GF sa mení na mieste, naň sú naviazané premenné
+    interpreter.frames["global"].values[:] = frames[0].values
+    interpreter.frames["temporary"] = frames[1] if tf else None
+    interpreter.frame_stack.items[:] = frames[1 + tf :]
+    interpreter.call_stack.items[:] = calls
+    interpreter.data_stack.items[:] = stack
+    interpreter.program_counter = pc
+    interpreter.input_cursor.skip(lines)
+    interpreter.output.resume(offset, position)
+
+
+def _read_state(interpreter, view: memoryview, fields: list) -> tuple:
+    """Prečíta telo súboru (viď load_state()), stav interprétu nemení"""
+    pc, lines, offset, position, tf, n_frames, n_calls, n_stack = fields
+    cursor = HEADER.size
+
+    def take(size: int) -> memoryview:
+        nonlocal cursor
+        start, cursor = cursor, cursor + size
+        if cursor > len(view):
+            raise ValueError("Truncated snapshot")
+        return view[start:cursor]
+
+    def string() -> str:
+        (length,) = COUNT.unpack(take(COUNT.size))
+        return bytes(take(length)).decode("utf-8", "surrogatepass")
+
+    def value():
+        (type_id,) = TYPE.unpack(take(TYPE.size))
+        if type_id == UNINITIALISED:
+            return None
+        return constant_value(type_id, string())
+
+    def frame(slots: dict) -> Frame:
+        frm = Frame(slots)
+        (count,) = COUNT.unpack(take(COUNT.size))
+        for _ in range(count):
+            name = string()
+            if name not in slots:
+                raise ValueError(f"Unknown variable {name}")
+            frm.values[slots[name]] = value()
+        return frm
+
+    try:
+        frames = [frame(interpreter._global_slots)]
+        frames.extend(frame(interpreter._local_slots) for _ in range(tf + n_frames))
+        returns = take(RETURN_INDEX.size * n_calls)
+        calls = [index for (index,) in RETURN_INDEX.iter_unpack(returns)]
+        stack = [value() for _ in range(n_stack)]
+    except (IndexError, UnicodeDecodeError, struct.error) as error:
+        raise ValueError(f"Malformed snapshot: {error}") from error
+    if cursor != len(view):
+        raise ValueError("Trailing data in snapshot")
+    return pc, lines, offset, position, frames, tf, calls, stack
+
+
+def write_atomic(path: str, data: bytes):
+    """Zapíše súbor atomicky (dočasný súbor v rovnakom adresári, premenovanie)"""
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class Checkpointer:
+    """
+    Pravidelné kontrolné body behu programu. Beh s kontrolnými bodmi
+    (viď Interpreter.run()) volá reached() po každých interval inštrukciách;
+    pri kontrolných bodoch v sekundách sa tak len skontroluje čas. Pred
+    zápisom sa vyprázdni buffer výstupu, aby súbor výstupu obsahoval všetko,
+    čo kontrolný bod počíta ako zapísané.
+
+    Atribúty:
+        interpreter (Interpreter): overený interpret
+        path (str): súbor kontrolného bodu
+        instructions (int): počet inštrukcií medzi kontrolnými bodmi (alebo None)
+        seconds (float): čas medzi kontrolnými bodmi (alebo None)
+        interval (int): počet inštrukcií medzi volaniami reached()
+        written (int): počet zapísaných kontrolných bodov
+    """
+
+    def __init__(self, interpreter, path: str, instructions=None, seconds=None):
+        self.interpreter = interpreter
+        self.path = path
+        self.instructions = instructions
+        self.seconds = seconds
+        self.interval = CLOCK_STRIDE if seconds is not None else instructions
+        self.written = 0
+        self._digest = None
+        self._deadline = None if seconds is None else time.monotonic() + seconds
+
+    @property
+    def digest(self) -> bytes:
+        """Odtlačok programu (počíta sa raz, pri prvom použití)"""
+        if self._digest is None:
+            interpreter = self.interpreter
+            self._digest = program_digest(interpreter.instructions, interpreter.labels)
+        return self._digest
+
+    def reached(self):
+        """Zapíše kontrolný bod, ak už uplynul čas od predchádzajúceho"""
+        if self._deadline is not None:
+            now = time.monotonic()
+            if now < self._deadline:
+                return
+            self._deadline = now + self.seconds
+        self.write()
+
+    def write(self):
+        """Zapíše kontrolný bod aktuálneho stavu interprétu"""
+        self.interpreter.output.flush()
+        write_atomic(self.path, dump_state(self.interpreter, self.digest))
+        self.written += 1
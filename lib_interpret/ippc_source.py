@@ -0,0 +1,176 @@
+"""
+Lexikálny a syntaktický analyzátor zdrojového kódu IPPcode23
+(--source-format=ippc), zodpovedá analyzátoru lib_parse/ippc_parser.php.
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+import re
+from lib_interpret.ippc_utils import *
+
+# Hlavička programu (prvý neprázdny riadok)
+HEADER_RE = re.compile(r"^(?:\.IPPcode23|\.IFJcode22)$")
+
+# Biele znaky (PHP \s bez príznaku u zodpovedá ASCII)
+WHITESPACE_RE = re.compile(r"\s+", re.ASCII)
+
+# Identifikátor premennej a náveštia
+IDENTIFIER_RE = re.compile(r"^[$&%!a-zA-Z_\-\*\?][$&%!\w\-\*\?]*$", re.ASCII)
+
+# Kontrola hodnoty konštanty podľa typu (string sa kontroluje zvlášť)
+CONSTANT_RE = {
+    "int": re.compile(r"^[+-]?[0-9]+$"),
+    "bool": re.compile(r"^(true|false)$"),
+    "nil": re.compile(r"^nil$"),
+    "float": re.compile(r"^[+-]?0x[0-9a-fA-F]+(\.[0-9a-fA-F]+)?p[+-]?[0-9]+$"),
+}
+
+# Nepovolené znaky v reťazcovej konštante (biely znak, #, chybná escape sekvencia)
+STRING_INVALID_RE = re.compile(r"[\s#]|(\\(?!\d{3}))", re.ASCII)
+
+# Podporované formáty zdrojového súboru (--source-format)
+SOURCE_FORMATS = ("xml", "ippc")
+
+FRAMES = ("GF", "LF", "TF")
+TYPES = ("int", "bool", "string", "nil", "float")
+
+
+class SourceError(SyntaxError):
+    """
+    Chyba zdrojového kódu IPPcode23 (návratové kódy ako pri parse.php)
+
+    Atribúty:
+        ecode (str): kľúč návratového kódu (ENOHEAD, EOPCODE, EANLYS)
+        lineno (int): číslo riadku s chybou
+    """
+
+    def __init__(self, ecode: str, lineno: int, msg: str):
+        super().__init__(msg)
+        self.ecode = ecode
+        self.lineno = lineno
+
+
+def preparse(line: str):
+    """Odstráni komentár a nadbytočné biele znaky, prázdny riadok -> None"""
+    comment = line.find("#")
+    if comment != -1:
+        line = line[:comment]
+    line = WHITESPACE_RE.sub(" ", line).strip(" \0")
+    # PHP považuje reťazec "0" za nepravdivý, parse.php taký riadok preskočí
+    if line in ("", "0"):
+        return None
+    return line
+
+
+class SourceParser:
+    """
+    Prekladá zdrojový kód IPPcode23 priamo na inštrukcie a náveštia
+    interpreta (bez medzikroku cez XML reprezentáciu)
+
+    Atribúty:
+        instructions (list): zoznam inštrukcií
+        labels (dict): slovník náveští (názov -> index inštrukcie)
+        constants (ConstantPool): literály programu (dekódované pri načítaní)
+
+    Vyvolá:
+        SourceError: chýbajúca hlavička, neznáma inštrukcia, chybný operand
+        KeyError: duplicitné náveštie (ako pri XML reprezentácii)
+    """
+
+    def __init__(self, constants: ConstantPool = None):
+        self.instructions: list[Instruction] = []
+        self.labels: dict[str, int] = {}
+        self.constants = ConstantPool() if constants is None else constants
+        self._variables: dict[str, UnresolvedVariable] = {}
+        self._header = False
+
+    def parse(self, source: str):
+        """Spracuje celý zdrojový kód, vráti (inštrukcie, náveštia)"""
+        lineno = 0
+        for lineno, line in enumerate(source.split("\n"), 1):
+            self.parse_line(line, lineno)
+        if not self._header:
+            raise SourceError(
+                "ENOHEAD", lineno, "Missing .IPPcode23 header (empty file)"
+            )
+        return self.instructions, self.labels
+
+    def parse_line(self, line: str, lineno: int):
+        """Spracuje jeden riadok zdrojového kódu"""
+        line = preparse(line)
+        if line is None:
+            return
+
+        if not self._header:
+            if not HEADER_RE.match(line):
+                raise SourceError("ENOHEAD", lineno, "Missing .IPPcode23 header")
+            self._header = True
+            return
+
+        opcode, *args = line.split(" ")
+        opcode = opcode.upper()
+        signature = INSTRUCTIONS.get(opcode)
+        if signature is None:
+            raise SourceError("EOPCODE", lineno, f"Unknown instruction {opcode}")
+        if len(args) != len(signature):
+            raise SourceError(
+                "EANLYS",
+                lineno,
+                f"{opcode} expects {len(signature)} arguments, got {len(args)}",
+            )
+
+        operands = [
+            self._parse_operand(arg, kind, lineno) for arg, kind in zip(args, signature)
+        ]
+        spelling = [
+            arg if isinstance(operand, Value) else None
+            for arg, operand in zip(args, operands)
+        ]
+        self.instructions.append(Instruction(opcode, operands, spelling))
+        if opcode == "LABEL":
+            if args[0] in self.labels:
+                raise KeyError(f"Duplicate label {args[0]}")
+            self.labels[args[0]] = len(self.instructions) - 1
+
+    def _parse_operand(self, arg: str, kind: str, lineno: int):
+        if kind == "var":
+            operand = self._parse_var(arg)
+            if operand is None:
+                raise SourceError("EANLYS", lineno, f"Invalid variable {arg}")
+        elif kind == "label":
+            if not IDENTIFIER_RE.match(arg):
+                raise SourceError("EANLYS", lineno, f"Invalid label {arg}")
+            operand = LabelArg(arg)
+        elif kind == "type":
+            if arg not in TYPES:
+                raise SourceError("EANLYS", lineno, f"Invalid type {arg}")
+            operand = self.constants.get("type", arg)
+        else:
+            # Symbol (aj s predpísaným typom, ten overí až Interpreter.verify())
+            operand = self._parse_var(arg)
+            if operand is None:
+                operand = self._parse_const(arg)
+            if operand is None:
+                raise SourceError("EANLYS", lineno, f"Invalid symbol {arg}")
+        return operand
+
+    def _parse_var(self, arg: str):
+        """Premenná FRAME@ID alebo None (rovnaké premenné zdieľajú objekt)"""
+        frame, sep, name = arg.partition("@")
+        if not sep or frame not in FRAMES or not IDENTIFIER_RE.match(name):
+            return None
+        var = self._variables.get(arg)
+        if var is None:
+            var = self._variables[arg] = UnresolvedVariable(arg)
+        return var
+
+    def _parse_const(self, arg: str):
+        """Konštanta TYPE@VALUE alebo None"""
+        const_type, sep, const_val = arg.partition("@")
+        if not sep or const_type not in TYPES:
+            return None
+        if const_type == "string":
+            if STRING_INVALID_RE.search(const_val):
+                return None
+        elif not CONSTANT_RE[const_type].match(const_val):
+            return None
+        return self.constants.get(const_type, const_val)
@@ -0,0 +1,119 @@
+"""
+Sledovanie behu programu (Interpreter.use_tracer()): rozhranie udalostí
+a ladiace výpisy inštrukcií (-d) ako jedna jeho implementácia.
+@author: Onegen Something <xkrame00@vutbr.cz>
+"""
+
+from lib_interpret.ippc_utils import *
+
+# Inštrukcie, ktoré menia dátový zásobník
+STACK_OPCODES = (
+    "PUSHS",
+    "POPS",
+    "CLEARS",
+    "ADDS",
+    "SUBS",
+    "MULS",
+    "DIVS",
+    "IDIVS",
+    "LTS",
+    "GTS",
+    "EQS",
+    "ANDS",
+    "ORS",
+    "NOTS",
+    "INT2FLOATS",
+    "FLOAT2INTS",
+    "INT2CHARS",
+    "STRI2INTS",
+    "JUMPIFEQS",
+    "JUMPIFNEQS",
+)
+
+# Podmienené skoky (udalosť branch)
+BRANCH_OPCODES = ("JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS")
+
+# Vstupno-výstupné inštrukcie a druh ich udalosti io
+IO_OPCODES = {"READ": "read", "WRITE": "write", "DPRINT": "dprint"}
+
+
+class Tracer:
+    """
+    Rozhranie sledovania behu programu. Interpret pri zaregistrovanom
+    sledovaní vykonáva inštrukcie cez obalené obsluhy (viď
+    Interpreter.use_tracer()), ktoré po úspešnom vykonaní inštrukcie
+    volajú metódy tejto triedy; bez sledovania beh nič nestojí.
+    Predvolené metódy nerobia nič, podtrieda prepíše tie, ktoré potrebuje.
+
+    Poradie udalostí jednej inštrukcie: before, potom (ak inštrukcia
+    neskončila chybou) variable_write, stack_change, io, call/returned,
+    branch, exit a nakoniec after.
+    """
+
+    def before(self, index: int, instr: Instruction):
+        """Pred vykonaním inštrukcie na indexe index"""
+
+    def after(self, index: int, instr: Instruction):
+        """Po úspešnom vykonaní inštrukcie"""
+
+    def variable_write(self, var: UnresolvedVariable, value):
+        """Zápis hodnoty do premennej (None = definícia, DEFVAR)"""
+
+    def stack_change(self, stack: Stack):
+        """Zmena dátového zásobníka (stack je jeho aktuálny stav)"""
+
+    def io(self, kind: str, value: Value):
+        """Vstup/výstup: read (načítaná hodnota), write, dprint"""
+
+    def call(self, index: int, target: int):
+        """Volanie (CALL) náveštia na indexe target"""
+
+    def returned(self, index: int, target: int):
+        """Návrat (RETURN) na inštrukciu na indexe target"""
+
+    def branch(self, index: int, taken: bool):
+        """Vyhodnotenie podmieneného skoku"""
+
+    def exit(self, index: int, code: int):
+        """Ukončenie programu inštrukciou EXIT s daným kódom"""
+
+
+class VerboseTracer(Tracer):
+    """
+    Farebné ladiace výpisy (-d): každá inštrukcia, zapísané hodnoty
+    premenných, vrchol zásobníka a výsledky skokov do výstupu programu
+
+    Atribúty:
+        output (OutputWriter): výstup programu
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self._opcode = None
+
+    def before(self, index, instr):
+        self._opcode = instr.opcode
+        print(f"  \033[90m{instr}\033[0m", file=self.output)
+
+    def variable_write(self, var, value):
+        value = "[defined]" if value is None else value.pyv()
+        print(
+            f"    \033[32m{var.frame}@\033[0m{var.name} = \033[33m{value}\033[0m",
+            file=self.output,
+        )
+
+    def stack_change(self, stack):
+        if self._opcode in BRANCH_OPCODES:
+            return  # Skok vypisuje len svoj výsledok
+        top = stack.top().pyv() if not stack.is_empty() else "NULL"
+        print(f"    {{\033[33m{top}\033[0m}}", file=self.output)
+
+    def io(self, kind, value):
+        if kind == "write":
+            self.output.write("\n")
+
+    def branch(self, index, taken):
+        print(f"    \033[33m{str(taken).lower()}\033[0m", file=self.output)
+
+    def exit(self, index, code):
+        print(f"    \033[33m{code}\033[0m", file=self.output)
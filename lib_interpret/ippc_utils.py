@@ -3,7 +3,15 @@ Pomocné triedy a konštanty pre interpret.py
 @author: Onegen Something <xkrame00@vutbr.cz>
 """
 
-import re
+import gc
+import io
+import locale
+import mmap
+import os
+import stat
+import sys
+import time
+from contextlib import contextmanager
 
 
 RETCODE = {
@@ -12,6 +20,9 @@ RETCODE = {
     "ENOENT": 11,  # Chyba pri otváraní súboru
     "EWRITE": 12,  # Chyba pri zápise
     "EINT": 99,  # Interná chyba
+    "ENOHEAD": 21,  # Chýbajúca hlavička zdrojového kódu (--source-format=ippc)
+    "EOPCODE": 22,  # Neznámy operačný kód v zdrojovom kóde
+    "EANLYS": 23,  # Lexikálna alebo syntaktická chyba v zdrojovom kóde
     "EXML": 31,  # Chyba XML formátovania
     "ESTRUC": 32,  # Chybná štruktúra XML
     "ESEM": 52,  # Semantická chyba
@@ -33,6 +44,92 @@ EXCEPTMAP = {
     NameError: "ESTR",
 }
 
+# Inštrukčná sada IPPcode23 (vrátane rozšírení STACK a FLOAT),
+# pre každú inštrukciu zoznam druhov jej operandov (var, symb, label,
+# type, alebo názov typu pre symbol, ktorý musí mať daný typ)
+INSTRUCTIONS = {
+    # Inštrukcie programových rámcov
+    "MOVE": ("var", "symb"),
+    "CREATEFRAME": (),
+    "PUSHFRAME": (),
+    "POPFRAME": (),
+    "DEFVAR": ("var",),
+    "CALL": ("label",),
+    "RETURN": (),
+    # Inštrukcie dátového zásobníka
+    "PUSHS": ("symb",),
+    "POPS": ("var",),
+    "CLEARS": (),
+    # Aritmetické, relačné, booleovské a konverzné inštrukcie
+    "ADD": ("var", "symb", "symb"),
+    "SUB": ("var", "symb", "symb"),
+    "MUL": ("var", "symb", "symb"),
+    "DIV": ("var", "symb", "symb"),
+    "IDIV": ("var", "symb", "symb"),
+    "ADDS": (),
+    "SUBS": (),
+    "MULS": (),
+    "DIVS": (),
+    "IDIVS": (),
+    "LT": ("var", "symb", "symb"),
+    "GT": ("var", "symb", "symb"),
+    "EQ": ("var", "symb", "symb"),
+    "LTS": (),
+    "GTS": (),
+    "EQS": (),
+    "AND": ("var", "bool", "bool"),
+    "OR": ("var", "bool", "bool"),
+    "NOT": ("var", "bool"),
+    "ANDS": (),
+    "ORS": (),
+    "NOTS": (),
+    "INT2FLOAT": ("var", "int"),
+    "FLOAT2INT": ("var", "float"),
+    "INT2CHAR": ("var", "int"),
+    "STRI2INT": ("var", "string", "int"),
+    "INT2FLOATS": (),
+    "FLOAT2INTS": (),
+    "INT2CHARS": (),
+    "STRI2INTS": (),
+    # Vstupno-výstupné inštrukcie
+    "READ": ("var", "type"),
+    "WRITE": ("symb",),
+    # Práca s reťazcami
+    "CONCAT": ("var", "string", "string"),
+    "STRLEN": ("var", "string"),
+    "GETCHAR": ("var", "string", "int"),
+    "SETCHAR": ("var", "int", "string"),
+    # Práca s typmi
+    "TYPE": ("var", "symb"),
+    # Inštrukcie pre riadenie toku programu
+    "LABEL": ("label",),
+    "JUMP": ("label",),
+    "JUMPIFEQ": ("label", "symb", "symb"),
+    "JUMPIFNEQ": ("label", "symb", "symb"),
+    "JUMPIFEQS": ("label",),
+    "JUMPIFNEQS": ("label",),
+    "EXIT": ("int",),
+    # Inštrukcie na ladenie
+    "DPRINT": ("symb",),
+    "BREAK": (),
+}
+
+
+# Hodnota slotu nedefinovanej premennej v rámci (viď Frame)
+UNDEFINED = object()
+
+
+@contextmanager
+def gc_paused():
+    """Pozastaví zber cyklického odpadu počas vytvárania mnohých trvalých objektov"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
 
 class Stack:
     """Zásobník (pre rámce a hodnoty)"""
@@ -69,92 +166,361 @@ class Stack:
 
     def clear(self):
         """Vyprázdni zásobník"""
-        self._items = []
+        self._items.clear()
+
+    @property
+    def items(self) -> list:
+        """Položky zásobníka (vrchol = posledná), pre priamy prístup"""
+        return self._items
 
     def size(self) -> int:
         """Vráti počet položiek v zásobníku"""
         return len(self._items)
 
 
-class Queue:
-    """Fronta (pre vstup)"""
+class InputCursor:
+    """
+    Kurzor po riadkoch vstupu programu (pre READ). Riadky sa čítajú až na
+    požiadanie z bufferovaného prúdu, bežný súbor sa mapuje do pamäte (mmap),
+    spotreba pamäte teda nezávisí od veľkosti vstupu. Riadky sa delia rovnako
+    ako pri str.splitlines().
+
+    Atribúty:
+        lines_read (int): počet prečítaných riadkov
+    """
+
+    def __init__(self, stream, size: int = None, encoding: str = None):
+        self._stream = stream
+        self._size = size
+        self._encoding = encoding
+        self._pending: list[str] = []
+        self.lines_read = 0
+
+    def __repr__(self):
+        remaining = self.remaining()
+        if remaining is None:
+            return "  > (unknown)\n"
+        unit = "bytes" if self._encoding is not None else "characters"
+        return f"  > {remaining} {unit} left\n"
+
+    @classmethod
+    def open(cls, path: str = None) -> "InputCursor":
+        """Otvorí vstup zo súboru (bežný súbor -> mmap) alebo zo stdin (None)"""
+        if path is None:
+            return cls(sys.stdin)
+        encoding = locale.getpreferredencoding(False)
+        file = open(path, "rb")
+        info = os.fstat(file.fileno())
+        if stat.S_ISREG(info.st_mode) and info.st_size > 0:
+            try:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                pass
+            else:
+                file.close()
+                return cls(mapped, info.st_size, encoding)
+        return cls(io.TextIOWrapper(file, encoding=encoding))
+
+    @classmethod
+    def from_text(cls, text: str) -> "InputCursor":
+        """Vytvorí kurzor nad vstupom, ktorý je už v pamäti"""
+        return cls(io.StringIO(text), len(text))
+
+    def readline(self):
+        """Vráti ďalší riadok bez znaku konca riadku (koniec vstupu -> None)"""
+        while not self._pending:
+            line = self._stream.readline()
+            if not line:
+                return None
+            if self._encoding is not None:
+                line = line.decode(self._encoding)
+            # Fyzický riadok môže obsahovať ďalšie oddeľovače (\v, \f, ...)
+            self._pending = line.splitlines()[::-1]
+        self.lines_read += 1
+        return self._pending.pop()
+
+    def skip(self, count: int):
+        """Preskočí count riadkov (pokračovanie behu z kontrolného bodu)"""
+        while self.lines_read < count and self.readline() is not None:
+            pass
+
+    def remaining(self):
+        """Zostávajúca veľkosť vstupu (neznáma, napr. stdin -> None)"""
+        if self._size is None:
+            return None
+        pending = sum(len(line) + 1 for line in self._pending)
+        return self._size - self._stream.tell() + pending
+
+    def close(self):
+        """Uzavrie zdroj vstupu (okrem stdin)"""
+        if self._stream is not sys.stdin:
+            self._stream.close()
+
+
+class OutputWriter:
+    """
+    Bufferovaný výstup programu (pre WRITE). Zápisy sa zhromažďujú v pamäti
+    a do prúdu sa kódujú a zapisujú naraz po dosiahnutí veľkosti bufferu,
+    uplynutí intervalu od posledného zápisu alebo pri explicitnom flush()
+    (koniec programu, chyba, BREAK). Na terminál sa zapisuje po riadkoch.
+
+    Atribúty:
+        limit (int): veľkosť bufferu v znakoch, po ktorej sa zapíše do prúdu
+        interval (float): max. doba v sekundách medzi zápismi (None -> bez)
+        sync (bool): dotaz, či sa má výstup zapísať pred každým výpisom na stderr
+        offset (int): počet znakov, ktoré program doteraz zapísal
+    """
+
+    def __init__(self, stream=None, limit: int = 1 << 16, interval=None, sync=False):
+        self._stream = sys.stdout if stream is None else stream
+        self.limit = limit
+        self.interval = interval
+        self.sync = sync
+        self._parts: list[str] = []
+        self._size = 0
+        self._flushed = 0
+        self._last = time.monotonic()
+        self._line_buffered = self._stream.isatty()
+
+    @property
+    def offset(self) -> int:
+        """Počet znakov zapísaných programom (vrátane bufferu)"""
+        return self._flushed + self._size
+
+    def write(self, text: str):
+        """Pridá text do bufferu (a prípadne buffer zapíše do prúdu)"""
+        self._parts.append(text)
+        self._size += len(text)
+        if (
+            self._size >= self.limit
+            or (self._line_buffered and "\n" in text)
+            or (
+                self.interval is not None
+                and time.monotonic() - self._last >= self.interval
+            )
+        ):
+            self.flush()
+
+    def flush(self):
+        """Zapíše obsah bufferu do prúdu"""
+        data = "".join(self._parts)
+        self._parts.clear()
+        self._flushed += self._size
+        self._size = 0
+        self._last = time.monotonic()
+        if data:
+            stream = self._stream
+            if hasattr(stream, "buffer"):
+                stream.flush()
+                stream.buffer.write(data.encode(stream.encoding, stream.errors))
+                stream.buffer.flush()
+            else:
+                stream.write(data)
+                stream.flush()
+
+    def _regular_fd(self):
+        """Deskriptor prúdu, ak je bežným súborom (inak None)"""
+        try:
+            fd = self._stream.fileno()
+            return fd if stat.S_ISREG(os.fstat(fd).st_mode) else None
+        except (OSError, ValueError):
+            return None
+
+    def position(self) -> int:
+        """Pozícia (v bajtoch) v bežnom súbore výstupu (iný prúd -> -1)"""
+        fd = self._regular_fd()
+        return -1 if fd is None else os.lseek(fd, 0, os.SEEK_CUR)
+
+    def resume(self, offset: int, position: int):
+        """
+        Pokračuje vo výstupe od kontrolného bodu s daným počtom zapísaných
+        znakov a pozíciou (viď position()). Bežný súbor dlhší ako pozícia
+        sa na ňu skráti, výstup zapísaný po kontrolnom bode sa tak zahodí.
+        """
+        self._flushed = offset
+        fd = self._regular_fd()
+        if fd is not None and 0 <= position < os.fstat(fd).st_size:
+            self._stream.flush()
+            os.ftruncate(fd, position)
+            os.lseek(fd, position, os.SEEK_SET)
+
+
+def decode_escapes(text: str) -> str:
+    """
+    Nahradí escape sekvencie \\ddd znakmi (ako re.sub(r"\\\\(\\d{3})", ...));
+    text bez spätného lomítka vráti bez zmeny a bez kopírovania
+    """
+    if "\\" not in text:
+        return text
+    parts = text.split("\\")
+    decoded = [parts[0]]
+    for part in parts[1:]:
+        code = part[:3]
+        if len(code) == 3 and code.isdecimal():
+            decoded.append(chr(int(code)))
+            decoded.append(part[3:])
+        else:
+            decoded.append("\\")
+            decoded.append(part)
+    return "".join(decoded)
+
+
+class ConstantPool:
+    """
+    Konštanty (literály) programu dekódované raz pri načítaní; rovnako
+    zapísané literály zdieľajú jednu hodnotu (Value)
+    """
 
     def __init__(self):
-        self._items = []
+        self._values: dict[tuple, Value] = {}
+
+    def get(self, value_type: str, value_raw) -> "Value":
+        """Hodnota literálu daného typu a zápisu (viď Value.parse())"""
+        key = (value_type, value_raw)
+        value = self._values.get(key)
+        if value is None:
+            value = self._values[key] = Value.parse(value_type, value_raw)
+        return value
+
+    def __len__(self):
+        return len(self._values)
+
+
+class StringBuffer:
+    """
+    Meniteľný obsah reťazcovej hodnoty (Value.content) pre SETCHAR a
+    opakovaný CONCAT do tej istej premennej: znak sa nahradí na mieste,
+    pripojenie je amortizovane konštantné a indexovanie (GETCHAR,
+    STRI2INT) priame. Navonok sa správa ako str (dĺžka, indexovanie,
+    porovnanie, spájanie), text sa zostaví až pri jeho pozorovaní
+    (WRITE, EQ, výpisy) a do ďalšej zmeny sa pamätá.
+
+    Buffer smie meniť len premenná, ktorej hodnota ho vlastní. Keď hodnotu
+    zdieľa aj iné miesto (MOVE, PUSHS), buffer sa označí ako zdieľaný
+    a nasledujúca zmena pracuje nad kópiou (copy-on-write).
+
+    Atribúty:
+        chars (list): znaky reťazca
+        shared (bool): dotaz, či hodnotu s bufferom odkazuje viac miest
+    """
+
+    __slots__ = ("chars", "shared", "_text")
+
+    def __init__(self, text: str):
+        self.chars: list[str] = list(text)
+        self.shared = False
+        self._text = text
+
+    def __str__(self):
+        if self._text is None:
+            self._text = "".join(self.chars)
+        return self._text
 
     def __repr__(self):
-        if self.is_empty():
-            return "  > (empty)\n"
-        return "  >  " + "\n     ".join(str(item) for item in self._items) + "\n"
+        return repr(str(self))
 
-    def is_empty(self) -> bool:
-        """Dotaz na prázdnosť fronty"""
-        return len(self._items) == 0
+    def __len__(self):
+        return len(self.chars)
 
-    def enqueue(self, item):
-        """Pridá položku na koniec fronty"""
-        self._items.append(item)
+    def __getitem__(self, index):
+        return self.chars[index]
 
-    def dequeue(self):
-        """Odoberie a vráti položku zo začiatku fronty (prázdny -> EINT)"""
-        if not self.is_empty():
-            return self._items.pop(0)
-        raise IndexError("Cannot access empty queue")
+    def __iter__(self):
+        return iter(self.chars)
 
-    def top(self):
-        """Vráti položku na začiatku fronty (prázdny -> None)"""
-        if not self.is_empty():
-            return self._items[0]
-        return None
+    def __eq__(self, other):
+        return str(self) == str(other)
 
-    def size(self) -> int:
-        """Vráti počet položiek v fronte."""
-        return len(self._items)
+    def __ne__(self, other):
+        return str(self) != str(other)
+
+    def __lt__(self, other):
+        return str(self) < str(other)
+
+    def __gt__(self, other):
+        return str(self) > str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __add__(self, other):
+        return str(self) + str(other)
+
+    def __radd__(self, other):
+        return str(other) + str(self)
+
+    def setchar(self, index: int, char: str):
+        """Nahradí znak na danom indexe"""
+        self.chars[index] = char
+        self._text = None
+
+    def extend(self, text: str):
+        """Pripojí text na koniec"""
+        self.chars.extend(text)
+        self._text = None
+
+
+def share(value):
+    """Označí reťazcový buffer hodnoty ako zdieľaný (hodnota má ďalší odkaz)"""
+    if value.content.__class__ is StringBuffer:
+        value.content.shared = True
+    return value
 
 
 class Value:
     """
     Trieda pre reprezentáciu hodnoty v IPPcode23.
 
+    Hodnota sa vytvára priamo z Python hodnoty (výsledky operácií), z
+    textového zápisu ju vytvára Value.parse(). Hodnoty true, false a nil
+    sú zdieľané inštancie (TRUE, FALSE, NIL), textová podoba (raw, str)
+    sa formátuje až pri výpise.
+
     Atribúty:
         type (str): typ hodnoty
-        value (any): hodnota
+        content (any): Python hodnota (nil -> None)
 
     Vyvolá:
         TypeError: pokiaľ je hodnota a typ nekompatibilné
     """
 
-    def __init__(self, value_type: str, value_raw):
-        self.type: str = value_type
-        self.raw: str = f"{value_type}@{value_raw}"
-        self.content: int | bool | str | float | None = value_raw
-
-        if value_type == "nil" or value_raw is None:
-            self.content = None
-        elif value_type == "int":
-            self.content = int(value_raw)
-        elif value_type == "bool":
-            if str(value_raw).lower() == "true":
-                self.content = True
-            else:
-                self.content = False
-        elif value_type == "string":
-            pattern = re.compile(r"\\(\d{3})")
-
-            def decode_esc(match):
-                char_code = int(match.group(1), 10)
-                return chr(char_code)
+    __slots__ = ("type", "content")
 
-            try:
-                self.content = pattern.sub(decode_esc, str(self.content)) or ""
-            except ValueError:
-                raise NameError(f"Invalid escape sequence: {self.content}")
-        elif value_type == "float":
-            self.content = float.fromhex(value_raw)
-        elif value_type == "type":
-            self.content = str(value_raw)
-        else:
-            raise TypeError(f"Invalid value type: {value_type}")
+    def __init__(self, value_type: str, content):
+        self.type: str = value_type
+        self.content: int | bool | str | float | None = content
+
+    @staticmethod
+    def parse(value_type: str, value_raw):
+        """Vytvorí hodnotu z jej textového zápisu (XML, vstup programu)"""
+        if value_type == "nil" or (value_raw is None and value_type != "string"):
+            return NIL if value_type == "nil" else Value(value_type, None)
+        if value_type == "int":
+            return Value("int", int(value_raw))
+        if value_type == "bool":
+            return TRUE if str(value_raw).lower() == "true" else FALSE
+        if value_type == "string":
+            if value_raw is None:
+                return Value("string", "")
+            return Value("string", decode_escapes(str(value_raw)))
+        if value_type == "float":
+            return Value("float", float.fromhex(value_raw))
+        if value_type == "type":
+            return Value("type", str(value_raw))
+        raise TypeError(f"Invalid value type: {value_type}")
+
+    @property
+    def raw(self) -> str:
+        """Zápis hodnoty v IPPcode23 (typ@hodnota)"""
+        if self.type == "string":
+            escaped = "".join(
+                f"\\{ord(char):03d}" if char in ESCAPED_CHARS or ord(char) <= 32 else char
+                for char in self.content
+            )
+            return f"string@{escaped}"
+        if self.type == "nil":
+            return "nil@nil"
+        return f"{self.type}@{self}"
 
     def __repr__(self):
         return repr(self.content)
@@ -168,6 +534,10 @@ class Value:
             return str(self.content).lower()
         return str(self.content)
 
+    def get(self):
+        """Hodnota symbolu (konštanta je hodnotou sama sebe)"""
+        return self
+
     def pyv(self):
         """Python hodnota premennej"""
         if self.type == "nil" or self.content is None:
@@ -186,18 +556,14 @@ class Value:
             if tx == "string":
                 if not isinstance(idx, int):
                     raise TypeError("Missing index")
-                sx = str(self)
-                if idx < 0 or idx >= len(sx):
+                if idx < 0 or idx >= len(x):
                     raise NameError("Index out of bounds")
-                try:
-                    return Value("int", str(ord(sx[idx])))
-                except IndexError:
-                    raise NameError("Invalid index")
+                return Value("int", ord(x[idx]))
             raise TypeError("Invalid type conversion")
 
         def _to_float():
             if tx == "int":
-                return Value("float", float(x).hex())
+                return Value("float", float(x))
             if tx == "float":
                 return self
             raise TypeError("Invalid type conversion")
@@ -211,13 +577,9 @@ class Value:
             if tx == "string":
                 if not isinstance(idx, int):
                     return self
-                sx = str(self)
-                if idx < 0 or idx >= len(sx):
+                if idx < 0 or idx >= len(x):
                     raise NameError("Index out of bounds")
-                try:
-                    return Value("string", sx[idx])
-                except IndexError:
-                    raise NameError("Invalid index")
+                return Value("string", x[idx])
             raise TypeError("Invalid type conversion")
 
         if ty == "int":
@@ -228,87 +590,195 @@ class Value:
             return _to_string()
         raise TypeError("Invalid type conversion")
 
-    def _operation(self, op, other):
+    def _check_numeric(self, other):
+        """Overí operandy aritmetickej operácie"""
         tx, ty = self.type, other.type
-        x, y = self.pyv(), other.pyv()
+        if tx not in ("int", "float") or ty == "nil":
+            raise TypeError("Unexpected operand type")
+        if tx != ty:
+            raise TypeError("Unequal operand types")
 
+    def _check_comparable(self, other):
+        """Overí operandy relačnej operácie (okrem rovnosti)"""
+        tx, ty = self.type, other.type
         if tx == "nil" or ty == "nil":
-            if op == "eq":
-                return Value("bool", str(tx == ty))
-            raise TypeError("Unexpected operand type")
-        if op in ("add", "sub", "mul", "div", "idiv") and (tx not in ("int", "float")):
-            raise TypeError("Unexpected operand type")
-        if op in ("and", "or", "not") and (tx != "bool"):
             raise TypeError("Unexpected operand type")
         if tx != ty:
             raise TypeError("Unequal operand types")
-        if op in ("div", "idiv") and y == 0:
-            raise ValueError("Zero division")
 
-        if op == "add":
-            result = x + y
-        elif op == "sub":
-            result = x - y
-        elif op == "mul":
-            result = x * y
-        elif op == "div":
-            result = x / y
-        elif op == "idiv":
-            result = x // y
-        elif op == "lt":
-            return Value("bool", str(x < y))
-        elif op == "gt":
-            return Value("bool", str(x > y))
-        elif op == "eq":
-            return Value("bool", str(x == y))
-        elif op == "and":
-            return Value("bool", str(x and y))
-        elif op == "or":
-            return Value("bool", str(x or y))
-        elif op == "not":
-            return Value("bool", str(not x))
-        else:
-            raise Exception("Invalid operation")
+    def _check_logical(self, other):
+        """Overí operandy booleovskej operácie"""
+        tx, ty = self.type, other.type
+        if tx != "bool" or ty == "nil":
+            raise TypeError("Unexpected operand type")
+        if tx != ty:
+            raise TypeError("Unequal operand types")
 
-        if self.type == "int" and op != "div":
-            return Value("int", str(result))
-        return Value("float", float(result).hex())
+    def equals(self, other) -> bool:
+        """Rovnosť hodnôt ako Python bool (nil je rovný len nil)"""
+        tx, ty = self.type, other.type
+        if tx == "nil" or ty == "nil":
+            return tx == ty
+        if tx != ty:
+            raise TypeError("Unequal operand types")
+        return self.content == other.content
 
     def __add__(self, other):
-        return self._operation("add", other)
+        self._check_numeric(other)
+        return Value(self.type, self.content + other.content)
 
     def __sub__(self, other):
-        return self._operation("sub", other)
+        self._check_numeric(other)
+        return Value(self.type, self.content - other.content)
 
     def __mul__(self, other):
-        return self._operation("mul", other)
+        self._check_numeric(other)
+        return Value(self.type, self.content * other.content)
 
     def __truediv__(self, other):
-        return self._operation("div", other)
+        self._check_numeric(other)
+        if other.content == 0:
+            raise ValueError("Zero division")
+        return Value("float", self.content / other.content)
 
     def __floordiv__(self, other):
-        return self._operation("idiv", other)
+        self._check_numeric(other)
+        if other.content == 0:
+            raise ValueError("Zero division")
+        return Value(self.type, self.content // other.content)
 
     def __lt__(self, other):
-        return self._operation("lt", other)
+        self._check_comparable(other)
+        return TRUE if self.content < other.content else FALSE
 
     def __gt__(self, other):
-        return self._operation("gt", other)
+        self._check_comparable(other)
+        return TRUE if self.content > other.content else FALSE
 
     def __eq__(self, other):
-        return self._operation("eq", other)
+        return TRUE if self.equals(other) else FALSE
 
     def __ne__(self, other):
-        return ~self._operation("eq", other)
+        return FALSE if self.equals(other) else TRUE
 
     def __and__(self, other):
-        return self._operation("and", other)
+        self._check_logical(other)
+        return TRUE if self.content and other.content else FALSE
 
     def __or__(self, other):
-        return self._operation("or", other)
+        self._check_logical(other)
+        return TRUE if self.content or other.content else FALSE
 
     def __invert__(self):
-        return self._operation("not", self)
+        self._check_logical(self)
+        return FALSE if self.content else TRUE
+
+
+# Zdieľané hodnoty
+TRUE = Value("bool", True)
+FALSE = Value("bool", False)
+NIL = Value("nil", None)
+
+# Zdieľané výsledky inštrukcie TYPE (None -> neinicializovaná premenná)
+TYPE_NAMES = {
+    value_type: Value("string", value_type or "")
+    for value_type in (None, "int", "bool", "string", "nil", "float")
+}
+
+# Znaky, ktoré zápis reťazca v IPPcode23 uvádza ako escape sekvenciu
+ESCAPED_CHARS = ("#", "\\")
+
+
+def _divide_floats(a: Value, b: Value) -> Value:
+    if b.content == 0:
+        raise ValueError("Zero division")
+    return Value("float", a.content / b.content)
+
+
+def _divide_ints(a: Value, b: Value) -> Value:
+    if b.content == 0:
+        raise ValueError("Zero division")
+    return Value("int", a.content // b.content)
+
+
+# Všeobecná operácia inštrukcie s inline cache (viď InlineCache)
+INLINE_CACHED = {
+    "ADD": Value.__add__,
+    "SUB": Value.__sub__,
+    "MUL": Value.__mul__,
+    "DIV": Value.__truediv__,
+    "IDIV": Value.__floordiv__,
+    "LT": Value.__lt__,
+    "GT": Value.__gt__,
+    "EQ": Value.__eq__,
+    "JUMPIFEQ": Value.equals,
+    "JUMPIFNEQ": Value.equals,
+}
+
+# Operácie špecializované na typy operandov: (operácia, typ, typ) -> funkcia.
+# Výsledok (aj chyba) je rovnaký ako pri všeobecnej operácii s kontrolami.
+FAST_PATHS = {
+    (Value.__add__, "int", "int"): lambda a, b: Value("int", a.content + b.content),
+    (Value.__sub__, "int", "int"): lambda a, b: Value("int", a.content - b.content),
+    (Value.__mul__, "int", "int"): lambda a, b: Value("int", a.content * b.content),
+    (Value.__floordiv__, "int", "int"): _divide_ints,
+    (Value.__add__, "float", "float"): (
+        lambda a, b: Value("float", a.content + b.content)
+    ),
+    (Value.__sub__, "float", "float"): (
+        lambda a, b: Value("float", a.content - b.content)
+    ),
+    (Value.__mul__, "float", "float"): (
+        lambda a, b: Value("float", a.content * b.content)
+    ),
+    (Value.__truediv__, "float", "float"): _divide_floats,
+}
+for _type in ("int", "float", "string", "bool"):
+    FAST_PATHS[Value.__lt__, _type, _type] = (
+        lambda a, b: TRUE if a.content < b.content else FALSE
+    )
+    FAST_PATHS[Value.__gt__, _type, _type] = (
+        lambda a, b: TRUE if a.content > b.content else FALSE
+    )
+    FAST_PATHS[Value.__eq__, _type, _type] = (
+        lambda a, b: TRUE if a.content == b.content else FALSE
+    )
+    FAST_PATHS[Value.equals, _type, _type] = lambda a, b: a.content == b.content
+
+
+class InlineCache:
+    """
+    Inline cache jedného miesta (inštrukcie) v programe. Obsluha inštrukcie
+    porovná typy operandov s typmi z cache (jediná podmienka) a pri zhode
+    zavolá operáciu špecializovanú na tieto typy (FAST_PATHS); inak zavolá
+    miss(), ktorá vykoná všeobecnú operáciu a cache prešpecializuje.
+
+    Atribúty:
+        generic (callable): všeobecná operácia nad hodnotami (s kontrolami)
+        left (str): typ ľavého operandu, pre ktorý platí fast
+        right (str): typ pravého operandu, pre ktorý platí fast
+        fast (callable): operácia pre typy left a right
+        misses (int): počet nesplnených podmienok (vrátane prvého vykonania)
+    """
+
+    __slots__ = ("generic", "left", "right", "fast", "misses")
+
+    def __init__(self, generic):
+        self.generic = generic
+        self.left = self.right = None
+        self.fast = generic
+        self.misses = 0
+
+    def __repr__(self):
+        return f"{self.left}/{self.right}"
+
+    def miss(self, a: Value, b: Value):
+        """Všeobecná operácia pri nesplnenej podmienke (deoptimalizácia)"""
+        self.misses += 1
+        result = self.generic(a, b)
+        self.left, self.right = a.type, b.type
+        self.fast = FAST_PATHS.get((self.generic, a.type, b.type), self.generic)
+        return result
 
 
 class UnresolvedVariable:
@@ -318,15 +788,22 @@ class UnresolvedVariable:
 
     Atribúty:
         varid (str): IPPcode23 premenná (formát xF@id)
+        slot (int): index premennej v rámci (prideľuje Interpreter.verify())
+        get (callable): získa hodnotu premennej (naviaže Interpreter.verify())
+        set (callable): nastaví hodnotu premennej (naviaže Interpreter.verify())
 
     Vyvolá:
         RuntimeError: pokiaľ je formát argumentu neplatný
     """
 
     def __init__(self, arg: str):
-        self.frame, self.name = arg.split("@", maxsplit=1)
-        if self.frame.upper() not in ("GF", "LF", "TF"):
+        frame, self.name = arg.split("@", maxsplit=1)
+        self.frame = frame.upper()
+        if self.frame not in ("GF", "LF", "TF"):
             raise RuntimeError(f"Invalid variable name: {arg}")
+        self.slot: int = -1
+        self.get = None
+        self.set = None
 
     def __repr__(self):
         return f"{self.frame}@{self.name}"
@@ -343,10 +820,21 @@ class LabelArg:
 
 
 class Frame:
-    """Trieda reprezentujúca dátový rámec združujúci premenné"""
+    """
+    Trieda reprezentujúca dátový rámec združujúci premenné
 
-    def __init__(self):
-        self._variables: dict[str, Value] = {}
+    Hodnoty premenných sú v poli indexovanom slotmi, ktoré prideľuje
+    Interpreter.verify(); všetky rámce rovnakého druhu (GF, resp. LF/TF)
+    zdieľajú tabuľku slotov. Nedefinovaná premenná má hodnotu UNDEFINED,
+    definovaná ale neinicializovaná None.
+
+    Atribúty:
+        values (list): hodnoty premenných podľa slotov
+    """
+
+    def __init__(self, slots: dict[str, int]):
+        self._slots = slots
+        self.values: list = [UNDEFINED] * len(slots)
 
     def __repr__(self):
         if self.size() == 0:
@@ -354,44 +842,97 @@ class Frame:
 
         rstr = "\n".join(
             f"    {k} = {str(v.raw) if isinstance(v, Value) else repr(v)}"
-            for k, v in self._variables.items()
+            for k, v in zip(self._slots, self.values)
+            if v is not UNDEFINED
         )
         return f"{rstr}\n"
 
+    def _name(self, slot: int) -> str:
+        return list(self._slots)[slot]
+
+    def grow(self):
+        """Rozšíri pole hodnôt o sloty pridelené po vytvorení rámca"""
+        missing = len(self._slots) - len(self.values)
+        if missing > 0:
+            self.values.extend([UNDEFINED] * missing)
+
     def size(self) -> int:
         """Získa počet premenných v rámci"""
-        return len(self._variables)
+        return sum(1 for value in self.values if value is not UNDEFINED)
 
-    def has_variable(self, name: str) -> bool:
+    def has_variable(self, slot: int) -> bool:
         """Dotaz na existenciu premennej v rámci"""
-        return name in self._variables
+        return self.values[slot] is not UNDEFINED
 
-    def get_variable(self, name: str) -> Value:
-        """Získa hodnotu premennej s daným názvom (neexistuje -> ENOVAR)"""
-        if self.has_variable(name):
-            return self._variables[name]
-        raise KeyError(f"Couldn't access non-existant variable {name}")
+    def get_variable(self, slot: int) -> Value:
+        """Získa hodnotu premennej v danom slote (neexistuje -> ENOVAR)"""
+        value = self.values[slot]
+        if value is UNDEFINED:
+            raise KeyError(f"Couldn't access non-existant variable {self._name(slot)}")
+        return value
 
-    def define_variable(self, name: str) -> Value:
+    def define_variable(self, slot: int):
         """Deklaruje novú premennú v rámci (redeklarácia -> ESEM)"""
-        if not self.has_variable(name):
-            self._variables[name] = None
-        else:
-            raise RuntimeError(f"Redefinition of variable {name}")
+        if self.values[slot] is not UNDEFINED:
+            raise RuntimeError(f"Redefinition of variable {self._name(slot)}")
+        self.values[slot] = None
 
-    def set_variable(self, name: str, value: Value):
+    def set_variable(self, slot: int, value: Value):
         """Nastaví hodnotu premennej v rámci (neexistuje -> ENOVAR)"""
-        if self.has_variable(name):
-            self._variables[name]: Value = value
-        else:
-            raise KeyError(f"Couldn't set non-existant variable {name}")
+        if self.values[slot] is UNDEFINED:
+            raise KeyError(f"Couldn't set non-existant variable {self._name(slot)}")
+        self.values[slot] = value
 
-    def delete_variable(self, name: str):
+    def delete_variable(self, slot: int):
         """Odstráni premennú z rámca (neexistuje -> ENOVAR)"""
-        if self.has_variable(name):
-            del self._variables[name]
-        else:
-            raise KeyError(f"Couldn't delete non-existant variable {name}")
+        if self.values[slot] is UNDEFINED:
+            raise KeyError(f"Couldn't delete non-existant variable {self._name(slot)}")
+        self.values[slot] = UNDEFINED
+
+
+class FramePool:
+    """
+    Zásoba uvoľnených rámcov LF/TF (prepísaný TF pri CREATEFRAME a POPFRAME)
+    na opätovné použitie. Rámec sa pri získaní vyprázdni jedným skopírovaním
+    vopred pripraveného poľa UNDEFINED na miesto jeho hodnôt, nevytvára sa
+    nový objekt ani pole.
+
+    Atribúty:
+        frames (list): uvoľnené rámce
+        limit (int): najväčší počet uchovávaných rámcov
+    """
+
+    def __init__(self, slots: dict[str, int], limit: int = 256):
+        self._slots = slots
+        self._blank: list = []
+        self.frames: list[Frame] = []
+        self.limit = limit
+
+    def grow(self):
+        """Pripraví prázdne pole pre sloty pridelené od posledného volania"""
+        if len(self._blank) != len(self._slots):
+            self._blank = [UNDEFINED] * len(self._slots)
+
+    def acquire(self) -> Frame:
+        """Vráti prázdny rámec (uvoľnený, alebo nový)"""
+        if self.frames:
+            frame = self.frames.pop()
+            frame.values[:] = self._blank
+            return frame
+        return Frame(self._slots)
+
+    def reset(self, frame: Frame):
+        """Vyprázdni rámec na mieste (CREATEFRAME pri existujúcom TF)"""
+        frame.values[:] = self._blank
+
+    def release(self, frame: Frame):
+        """Vráti rámec, na ktorý už nič neodkazuje, do zásoby"""
+        if len(self.frames) < self.limit:
+            self.frames.append(frame)
+
+    def clear(self):
+        """Zahodí uvoľnené rámce"""
+        self.frames.clear()
 
 
 class Instruction:
@@ -401,24 +942,37 @@ class Instruction:
     Atribúty:
         opcode (str): kód inštrukcie
         operands (Value|UnresolvedVariable): zoznam operandov
+        spelling (list): pôvodný zápis konštánt zo zdroja (inak None) pre výpisy
     """
 
-    def __init__(self, opcode, operands):
+    def __init__(self, opcode, operands, spelling=None):
         self.opcode: str = opcode
         self.operands = operands
+        self.spelling = spelling or [None] * len(operands)
 
     def __repr__(self):
         operands = " ".join(
             [
-                str(operand.raw) if isinstance(operand, Value) else repr(operand)
-                for operand in self.operands
+                spelling
+                if spelling is not None
+                else str(operand.raw) if isinstance(operand, Value) else repr(operand)
+                for operand, spelling in zip(self.operands, self.spelling)
             ]
         )
         return f"{self.opcode} {operands}"
 
+    def rebuilt(self, operands) -> "Instruction":
+        """Kópia inštrukcie s inými operandmi, zápis ponechá nezmeneným"""
+        spelling = [
+            text if new is old else None
+            for new, old, text in zip(operands, self.operands, self.spelling)
+        ]
+        return Instruction(self.opcode, operands, spelling)
+
     def replace_operand(self, index: int, value):
         """Nahradí operand inštrukcie na danom indexe"""
         self.operands[index] = value
+        self.spelling[index] = None
 
     def next_unresolved(self) -> int:
         """Získa index ďalšieho nedefinovaného operandu (žiadny -> -1)"""